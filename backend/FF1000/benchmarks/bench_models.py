@@ -0,0 +1,202 @@
+"""Benchmark the FF1000 models on synthetic catalogs.
+
+Runs each model over a grid of catalog sizes (N), embedding dimensions (d) and batch
+sizes, timing every stage of the request path separately:
+
+    encode     ItemIdOneHotEncoder.transform
+    score      ranker.transform (BayesianRecommender / SimilarityRecommender)
+    top_k      ScoresToDict.predict
+    serialize  server.serialization.dumps (JSON, orjson when installed)
+
+and records peak traced memory and rows/second. Results are written as JSON so runs
+can be compared over time:
+
+    python -m benchmarks.bench_models --n-items 2000,10000 --dims 128,1536 \\
+        --batch-sizes 1,16,256 --out bench.json
+    python -m benchmarks.bench_models ... --out new.json --compare bench.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import sklearn
+
+from machine_learning.datasets.synthetic import make_catalog
+from machine_learning.models.rfy import BayesianRecommender
+from machine_learning.models.similarity import SimilarityRecommender
+from machine_learning.transformers.item_encoder import ItemIdOneHotEncoder
+from machine_learning.transformers.scores_to_dict import ScoresToDict
+from server.serialization import dumps
+
+
+MODELS = {
+    "rfy": BayesianRecommender,
+    "similarity": SimilarityRecommender,
+}
+STAGES = ("encode", "score", "top_k", "serialize")
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def _environment():
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "scikit_learn": sklearn.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _run_once(encoder, ranker, to_dict, seeds, limit):
+    timings = {}
+
+    t0 = time.perf_counter()
+    encoded = encoder.transform(seeds)
+    t1 = time.perf_counter()
+    scores = ranker.transform(encoded)
+    t2 = time.perf_counter()
+    preds = to_dict.predict(scores, limit=limit, as_arrays=True)
+    t3 = time.perf_counter()
+    body = dumps({"model": "bench", "predictions": preds})
+    t4 = time.perf_counter()
+
+    timings["encode"] = t1 - t0
+    timings["score"] = t2 - t1
+    timings["top_k"] = t3 - t2
+    timings["serialize"] = t4 - t3
+    return timings, len(body)
+
+
+def bench_case(model_name, n_items, n_dimensions, batch_size, args):
+    catalog, embeddings = make_catalog(n_items, n_dimensions, seed=args.seed)
+    item_ids = catalog.item_id.tolist()
+
+    encoder = ItemIdOneHotEncoder(item_ids).fit([])
+    ranker = MODELS[model_name](embeddings).fit()
+    to_dict = ScoresToDict(item_ids, catalog.title, catalog.poster, catalog.premiere_year)
+
+    rng = np.random.default_rng(args.seed)
+    seeds = [
+        list(rng.choice(item_ids, size=args.seeds_per_row, replace=False))
+        for _ in range(batch_size)
+    ]
+
+    for _ in range(args.warmup):
+        _run_once(encoder, ranker, to_dict, seeds, args.limit)
+
+    runs = []
+    for _ in range(args.repeats):
+        timings, body_bytes = _run_once(encoder, ranker, to_dict, seeds, args.limit)
+        runs.append(timings)
+
+    # Peak memory is measured on a separate run; tracing slows the timed ones down
+    tracemalloc.start()
+    _run_once(encoder, ranker, to_dict, seeds, args.limit)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stages = {
+        stage: {
+            "median_ms": statistics.median(run[stage] for run in runs) * 1000,
+            "min_ms": min(run[stage] for run in runs) * 1000,
+        }
+        for stage in STAGES
+    }
+    total_s = statistics.median(sum(run.values()) for run in runs)
+
+    return {
+        "model": model_name,
+        "n_items": n_items,
+        "n_dimensions": n_dimensions,
+        "batch_size": batch_size,
+        "seeds_per_row": args.seeds_per_row,
+        "limit": args.limit,
+        "repeats": args.repeats,
+        "stages": stages,
+        "total_median_ms": total_s * 1000,
+        "throughput_rows_per_s": batch_size / total_s if total_s > 0 else None,
+        "peak_traced_memory_mb": peak_bytes / 2 ** 20,
+        "response_bytes": body_bytes,
+    }
+
+
+def _case_key(case):
+    return (case["model"], case["n_items"], case["n_dimensions"], case["batch_size"])
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {_case_key(c): c for c in json.load(f)["cases"]}
+
+    print(f"\nComparison against {baseline_path} (ratio > 1 means slower now)")
+    for case in results["cases"]:
+        old = baseline.get(_case_key(case))
+        if old is None:
+            continue
+        ratio = case["total_median_ms"] / old["total_median_ms"]
+        model, n_items, n_dimensions, batch_size = _case_key(case)
+        print(f"  {model:<10} N={n_items:<8} d={n_dimensions:<5} B={batch_size:<4} x{ratio:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", default=",".join(MODELS), help="comma-separated subset of %(default)s")
+    parser.add_argument("--n-items", type=_int_list, default=[2000, 10000])
+    parser.add_argument("--dims", type=_int_list, default=[128, 512])
+    parser.add_argument("--batch-sizes", type=_int_list, default=[1, 4, 16, 64, 256])
+    parser.add_argument("--seeds-per-row", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = {"environment": _environment(), "cases": []}
+    for model_name in args.models.split(","):
+        for n_items in args.n_items:
+            for n_dimensions in args.dims:
+                for batch_size in args.batch_sizes:
+                    case = bench_case(model_name, n_items, n_dimensions, batch_size, args)
+                    results["cases"].append(case)
+                    print(
+                        f"{model_name:<10} N={n_items:<8} d={n_dimensions:<5} B={batch_size:<4} "
+                        + " ".join(f"{s}={case['stages'][s]['median_ms']:.2f}ms" for s in STAGES)
+                        + f" rows/s={case['throughput_rows_per_s']:.1f}"
+                        + f" peak={case['peak_traced_memory_mb']:.1f}MB"
+                    )
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {len(results['cases'])} cases to {args.out}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Measure the reduced-dimension mode of the Bayesian ranker.
+
+For each target dimension, fits the projection on the catalog, then reports the
+fitting time, the per-request rfy scoring latency and how much of the full-dimension
+ranking is kept (top-k overlap and top-1 match over random single-seed requests):
+
+    python -m benchmarks.bench_projection --n-items 10000 --dims 1536 \\
+        --targets 64,128,256 --latent-rank 64
+    python -m benchmarks.bench_projection --catalog /path/to/catalog --targets 128,256
+
+Synthetic catalogs are isotropic unless --latent-rank is given, which makes agreement
+look far worse than on real embeddings; prefer --catalog for quality numbers.
+"""
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.bench_models import _environment, _int_list
+from machine_learning.datasets.synthetic import make_catalog
+from machine_learning.models.rfy import BayesianRecommender
+from machine_learning.transformers.projection import EmbeddingProjection, ranking_agreement
+
+
+def _score_ms(ranker, n_seeds, repeats, seed):
+    rng = np.random.default_rng(seed)
+    times = []
+    for _ in range(repeats):
+        X = np.zeros((n_seeds, ranker.N_))
+        X[np.arange(n_seeds), rng.choice(ranker.N_, size=n_seeds)] = 1.0
+        start = time.perf_counter()
+        ranker.transform(X)
+        times.append((time.perf_counter() - start) / n_seeds)
+    return statistics.median(times) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog", help="catalog to load (CSV or binary export) instead of a synthetic one")
+    parser.add_argument("--n-items", type=int, default=10000)
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--latent-rank", type=int, help="give the synthetic embeddings a low-rank structure")
+    parser.add_argument("--targets", type=_int_list, default=[64, 128, 256])
+    parser.add_argument("--methods", default=",".join(EmbeddingProjection.METHODS))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--agreement-seeds", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_projection.json")
+    args = parser.parse_args(argv)
+
+    if args.catalog:
+        from machine_learning.load_models import default_loader
+        _, embeddings = default_loader(args.catalog).load_arrays()
+        embeddings = np.asarray(embeddings, dtype=np.float64)
+    else:
+        _, embeddings = make_catalog(args.n_items, args.dims, seed=args.seed, latent_rank=args.latent_rank)
+
+    full = BayesianRecommender(embeddings)
+    full_ms = _score_ms(full, 1, args.repeats, args.seed)
+    print(f"full      d={full.d_:<5} score={full_ms:.2f}ms/request")
+
+    results = {
+        "environment": _environment(),
+        "n_items": int(full.N_),
+        "n_dimensions": int(full.d_),
+        "full_score_ms": full_ms,
+        "cases": [],
+    }
+    for method in args.methods.split(","):
+        for target in args.targets:
+            start = time.perf_counter()
+            projection = EmbeddingProjection(target, method, random_state=args.seed).fit(embeddings)
+            reduced = BayesianRecommender(embeddings, projection=projection)
+            fit_s = time.perf_counter() - start
+
+            score_ms = _score_ms(reduced, 1, args.repeats, args.seed)
+            agreement = ranking_agreement(full, reduced, n_seeds=args.agreement_seeds, k=args.k, random_state=args.seed)
+            case = {
+                "method": method,
+                "n_components": target,
+                "fit_s": fit_s,
+                "score_ms": score_ms,
+                "speedup": full_ms / score_ms if score_ms > 0 else None,
+                "explained_variance": projection.explained_variance_,
+                "agreement": agreement,
+            }
+            results["cases"].append(case)
+            print(
+                f"{method:<9} d={target:<5} fit={fit_s:.2f}s score={score_ms:.2f}ms/request x{case['speedup']:.1f} "
+                f"overlap@{agreement['k']}={agreement['overlap_mean']:.2f} (min {agreement['overlap_min']:.2f}) "
+                f"top1={agreement['top1_match']:.2f}"
+            )
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {len(results['cases'])} cases to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Check and time sharded scoring against the single-process rankers.
+
+Builds the similarity and Bayesian rankers once unsharded and once per shard count
+(local shard processes), then for random multi-seed requests verifies that the sharded
+top-k is the same as the unsharded one and reports the per-request scoring latency:
+
+    python -m benchmarks.bench_sharding --n-items 20000 --dims 768 --shards 2,4
+    python -m benchmarks.bench_sharding --catalog /path/to/catalog --shards 4 --k 100
+
+Exits non-zero when any sharded top-k differs from the unsharded one.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.bench_models import _environment, _int_list
+from machine_learning.datasets.synthetic import make_catalog
+from machine_learning.models.rfy import BayesianRecommender
+from machine_learning.models.sharded import ShardedBayesianRecommender, ShardedSimilarityRecommender
+from machine_learning.models.similarity import SimilarityRecommender
+
+
+def _requests(n_items, n_requests, seeds_per_request, seed):
+    # Seeds liked (+1) and, for every other request, one disliked (-1) as nfm sends
+    rng = np.random.default_rng(seed)
+    out = []
+    for r in range(n_requests):
+        X = np.zeros((1, n_items))
+        X[0, rng.choice(n_items, size=seeds_per_request, replace=False)] = 1.0
+        if r % 2:
+            X[0, rng.choice(np.flatnonzero(X[0] == 0))] = -1.0
+        out.append(X)
+    return out
+
+
+def _top_k(scores, k):
+    return [tuple(np.argsort(-row, kind="stable")[:k]) for row in scores]
+
+
+def _run(ranker, requests, k):
+    times, tops = [], []
+    for X in requests:
+        start = time.perf_counter()
+        scores = ranker.transform(X)
+        times.append(time.perf_counter() - start)
+        tops.extend(_top_k(scores, k))
+    return statistics.median(times) * 1000, tops
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog", help="catalog to load (CSV or binary export) instead of a synthetic one")
+    parser.add_argument("--n-items", type=int, default=20000)
+    parser.add_argument("--dims", type=int, default=768)
+    parser.add_argument("--shards", type=_int_list, default=[2, 4])
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=1000, help="local top-k each shard returns")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--seeds-per-request", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_sharding.json")
+    args = parser.parse_args(argv)
+
+    if args.catalog:
+        from machine_learning.load_models import default_loader
+        _, embeddings = default_loader(args.catalog).load_arrays()
+        embeddings = np.asarray(embeddings, dtype=np.float64)
+    else:
+        _, embeddings = make_catalog(args.n_items, args.dims, seed=args.seed)
+
+    requests = _requests(embeddings.shape[0], args.requests, args.seeds_per_request, args.seed)
+    rankers = {
+        "similarity": (SimilarityRecommender, ShardedSimilarityRecommender),
+        "rfy": (BayesianRecommender, ShardedBayesianRecommender),
+    }
+
+    results = {
+        "environment": _environment(),
+        "n_items": int(embeddings.shape[0]),
+        "n_dimensions": int(embeddings.shape[1]),
+        "k": args.k,
+        "cases": [],
+    }
+    mismatches = 0
+    for name, (single_cls, sharded_cls) in rankers.items():
+        single_ms, expected = _run(single_cls(embeddings), requests, args.k)
+        print(f"{name:<10} shards=1 score={single_ms:.2f}ms/request")
+        for n_shards in args.shards:
+            start = time.perf_counter()
+            sharded = sharded_cls(embeddings, n_shards, args.top_k)
+            start_s = time.perf_counter() - start
+            sharded_ms, tops = _run(sharded, requests, args.k)
+            sharded.shards_.close()
+
+            same = sum(a == b for a, b in zip(expected, tops))
+            mismatches += len(tops) - same
+            case = {
+                "ranker": name,
+                "shards": n_shards,
+                "start_s": start_s,
+                "score_ms": sharded_ms,
+                "single_score_ms": single_ms,
+                "speedup": single_ms / sharded_ms if sharded_ms > 0 else None,
+                "identical_top_k": same / len(tops),
+            }
+            results["cases"].append(case)
+            print(
+                f"{name:<10} shards={n_shards} start={start_s:.2f}s score={sharded_ms:.2f}ms/request "
+                f"x{case['speedup']:.2f} identical top-{args.k}={same}/{len(tops)}"
+            )
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {len(results['cases'])} cases to {args.out}")
+    if mismatches:
+        sys.exit(f"{mismatches} sharded rankings differ from the single-process ones")
+
+
+if __name__ == "__main__":
+    main()
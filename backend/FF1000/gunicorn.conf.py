@@ -0,0 +1,27 @@
+import gc
+import os
+
+bind = os.environ.get("FF1000_BIND", "0.0.0.0:8080")
+workers = int(os.environ.get("FF1000_WORKERS", "2"))
+threads = int(os.environ.get("FF1000_THREADS", "4"))
+timeout = 60
+
+# Load the catalog once in the master and fork the workers from it: startup costs one
+# load instead of one per worker, and the embedding matrices are shared copy-on-write
+# (they are only ever read). FF1000_PRELOAD=0 makes every worker load on its own, in the
+# background, answering /ready with 503 until it is done.
+preload_app = os.environ.get("FF1000_PRELOAD", "1") == "1"
+os.environ["FF1000_PRELOAD"] = "1" if preload_app else "0"
+
+
+def when_ready(server):
+    # Move everything loaded so far out of the garbage collector's reach, so collections
+    # in the workers don't write to (and so copy) the shared pages
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from server.api import start_background_tasks
+        start_background_tasks()
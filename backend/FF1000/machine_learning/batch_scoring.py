@@ -0,0 +1,401 @@
+"""Precompute single-seed rankings offline, for the server to answer from files.
+
+Scores every catalog item (or the items of a seed file) as a single seed with the rfy,
+nfm and similarity rankers, in chunks across a process pool. The embedding matrices are
+placed in shared memory once and mapped by every worker. The top-k of each seed is
+written to compact columnar files: catalog row numbers (uint32) and scores (float32),
+one (n_seeds, top_k) matrix per model.
+
+    python -m machine_learning.batch_scoring /data/ff1000/precomputed \\
+        --catalog /data/ff1000/catalog --top-k 200 --workers 8
+
+    # Only the seeds in a file (one item_id per line), for a quick nightly run
+    python -m machine_learning.batch_scoring /data/ff1000/precomputed --seeds popular.txt
+
+An interrupted run picks up where it stopped when started again with the same
+arguments. Point FF1000_PRECOMPUTED_PATH at the output directory to serve it.
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+import uuid
+import multiprocessing
+import numpy as np
+
+from multiprocessing import shared_memory
+
+from machine_learning.load_models import (
+    RFY_DIMENSIONS, RFY_PROJECTION, assemble_pipelines, build_bayesian, build_similarity, catalog_version,
+    default_loader, load_catalog,
+)
+from machine_learning.models.rfy import BayesianRecommender
+from machine_learning.transformers.item_encoder import ItemIdOneHotEncoder
+from machine_learning.transformers.projection import EmbeddingProjection
+from machine_learning.transformers.scores_to_dict import ScoresToDict
+
+
+# Output layout, one directory:
+#   manifest.json                        what was computed, for which catalog; written
+#                                        last, atomically, once every chunk is done
+#   seeds-<tag>.u32                      catalog row of each seed, (n_seeds,)
+#   <model>-rows-<tag>.u32               catalog rows of each seed's top-k, (n_seeds, top_k)
+#   <model>-scores-<tag>.f32             their scores, same shape, descending
+#   run.json / progress-<tag>.u8         the run in progress (one byte per finished chunk)
+# As with the binary catalog, a new run writes new files and only swaps the manifest,
+# so a server mapping the previous results keeps reading consistent files. The previous
+# run's files are kept (listed under "previous") until the next run, so a server that
+# read the old manifest just before the swap can still map them.
+MANIFEST = "manifest.json"
+RUN = "run.json"
+FORMAT = "ff1000-topk"
+FORMAT_VERSION = 1
+MODEL_NAMES = ("nfm", "rfy", "similarity")
+
+_BAYESIAN_DEFAULTS = {
+    name: inspect.signature(BayesianRecommender).parameters[name].default for name in ("lambda_reg", "sigma2", "z")
+}
+
+
+def read_seed_file(path):
+    # One item_id per line; blank lines and "#" comments are ignored
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT or manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{path}: not a {FORMAT} v{FORMAT_VERSION} manifest")
+    return manifest
+
+
+def projection_spec(projection):
+    # What has to match between the job's and the server's rfy ranker
+    return None if projection is None else {"method": projection.method, "n_components": projection.n_components}
+
+
+def _write_json(path, payload):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp, path)
+
+
+# --- scoring (runs in the workers) -------------------------------------------------------
+#
+# A single seed x is a rank-one posterior update, so the Bayesian ranker's posterior has a
+# closed form (Sherman-Morrison): with c = sigma2 * lambda + |x|^2,
+#   mu = x / c                            ->  m(e) = (e . x) / c
+#   invA = (I - x x^T / c) / lambda       ->  s(e)^2 = (|e|^2 - (e . x)^2 / c) / lambda
+# A chunk of seeds then costs one (chunk, d) x (d, N) product instead of a d x d inverse
+# and an N x d x d product per seed. nfm is the same posterior with y = -1: -m, same s.
+
+_W = {}
+
+
+def _attach(spec):
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    _W.setdefault("blocks", []).append(block)
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _init_worker(arrays, outputs, models, top_k, params):
+    # arrays: shared memory specs (or, inline, the arrays themselves); outputs: paths
+    # and shapes of the result files, opened once per worker
+    _W.update(models=models, top_k=top_k, **params)
+    for key, value in arrays.items():
+        _W[key] = value if isinstance(value, np.ndarray) else _attach(value)
+    _W["out"] = {
+        key: np.memmap(path, dtype=dtype, mode="r+", shape=shape) for key, (path, dtype, shape) in outputs.items()
+    }
+
+
+def _top_k(scores, k):
+    # Descending top-k per row
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-top, axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+
+def _store(model, start, stop, scores, seeds):
+    scores[np.arange(len(seeds)), seeds] = -np.inf  # the seed itself is never recommended
+    rows, top = _top_k(scores, _W["top_k"])
+    _W["out"][f"{model}-rows"][start:stop] = rows
+    _W["out"][f"{model}-scores"][start:stop] = top
+
+
+def score_chunk(chunk):
+    # Scores seeds [start, stop) for every model and writes them in place; returns the
+    # chunk once its rows are on disk
+    index, start, stop = chunk
+    seeds = _W["seeds"][start:stop].astype(np.intp)
+    models = _W["models"]
+
+    if "similarity" in models:
+        En = _W["normalized"]
+        _store("similarity", start, stop, En[seeds] @ En.T, seeds)
+
+    if "rfy" in models or "nfm" in models:
+        E, sq = _W["bayesian"], _W["sq_norms"]
+        G = E[seeds] @ E.T
+        c = (_W["sigma2"] * _W["lambda_reg"] + sq[seeds])[:, None]
+        m = G / c
+        s = np.sqrt(np.clip((sq[None, :] - G * G / c) / _W["lambda_reg"], 0.0, None))
+        del G
+        if "rfy" in models:
+            _store("rfy", start, stop, m + _W["z"] * s, seeds)
+        if "nfm" in models:
+            _store("nfm", start, stop, -m + _W["z"] * s, seeds)
+
+    for array in _W["out"].values():
+        array.flush()
+    return index, stop - start
+
+
+# --- the job ----------------------------------------------------------------------------
+
+def _shared(arrays):
+    # Copies each array into a new shared memory block; returns the blocks and the specs
+    # the workers attach by
+    blocks, specs = [], {}
+    for key, array in arrays.items():
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs[key] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+
+def _prepare_run(out, run):
+    # Resume the run in `out` if it was started with the same parameters, else start
+    # a new one (the stale run's files are removed). Returns (run with its tag, resumed).
+    os.makedirs(out, exist_ok=True)
+    run_path = os.path.join(out, RUN)
+    if os.path.exists(run_path):
+        with open(run_path) as f:
+            previous = json.load(f)
+        if {k: v for k, v in previous.items() if k != "tag"} == run:
+            return previous, True
+        for name in _files(previous).values():
+            _remove(os.path.join(out, name))
+
+    run = dict(run, tag=uuid.uuid4().hex[:12])
+    _write_json(run_path, run)
+    return run, False
+
+
+def _files(run):
+    tag = run["tag"]
+    names = {"seeds": f"seeds-{tag}.u32", "progress": f"progress-{tag}.u8"}
+    for model in run["models"]:
+        names[f"{model}-rows"] = f"{model}-rows-{tag}.u32"
+        names[f"{model}-scores"] = f"{model}-scores-{tag}.f32"
+    return names
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _open(path, dtype, shape, resumed):
+    return np.memmap(path, dtype=dtype, mode="r+" if resumed else "w+", shape=shape)
+
+
+def check_agreement(catalog, embeddings, run, rows_by_model, seed_rows, n_samples, projection):
+    # Share of each model's top-k the online pipelines agree with, on a sample of seeds
+    bayesian = build_bayesian(embeddings, *(
+        (projection.n_components, projection.method) if projection is not None else (0, "svd")
+    ))
+    models = assemble_pipelines(
+        ItemIdOneHotEncoder(catalog.item_id), bayesian, build_similarity(embeddings),
+        ScoresToDict(catalog.item_id, catalog.title),
+    )
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(seed_rows), size=min(n_samples, len(seed_rows)), replace=False)
+    item_ids = np.asarray(catalog.item_id)
+    agreement = {}
+    for model in run["models"]:
+        preds = models[model].predict([[item_ids[seed_rows[i]]] for i in sample], limit=run["top_k"], fields=["item_ids"])
+        overlaps = [
+            len(set(pred["item_ids"]) & set(item_ids[rows_by_model[model][i]])) / run["top_k"]
+            for i, pred in zip(sample, preds)
+        ]
+        agreement[model] = round(float(np.mean(overlaps)), 4)
+    return agreement
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out", help="output directory")
+    parser.add_argument("--catalog", help="binary catalog directory or embeddings CSV (default: FF1000_EMBEDDINGS_PATH)")
+    parser.add_argument("--models", default=",".join(MODEL_NAMES), help="comma-separated subset of nfm,rfy,similarity")
+    parser.add_argument("--seeds", help="file of seed item ids, one per line (default: every catalog item)")
+    parser.add_argument("--top-k", type=int, default=200, help="results kept per seed (the largest limit served)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes; 0 scores in this process")
+    parser.add_argument("--chunk-rows", type=int, default=0, help="seeds per task (default: ~8M scores per chunk)")
+    parser.add_argument("--rfy-dimensions", type=int, default=RFY_DIMENSIONS,
+                        help="reduced rfy/nfm dimensions, as FF1000_RFY_DIMENSIONS on the server")
+    parser.add_argument("--rfy-projection", default=RFY_PROJECTION, choices=EmbeddingProjection.METHODS)
+    parser.add_argument("--check", type=int, default=0, metavar="N",
+                        help="compare N sampled seeds against the online pipelines when done")
+    args = parser.parse_args(argv)
+
+    models = [m for m in MODEL_NAMES if m in args.models.split(",")]
+    if not models or set(args.models.split(",")) - set(MODEL_NAMES):
+        parser.error(f"--models must be a subset of {','.join(MODEL_NAMES)}")
+
+    start = time.perf_counter()
+    loader = default_loader(args.catalog)
+    if not os.path.exists(getattr(loader, "filepath", "") or ""):
+        parser.error("the catalog must be a file or a binary catalog directory")
+    version = catalog_version(loader.filepath)
+    catalog, embeddings = load_catalog(loader)
+    n_items = len(catalog)
+    print(f"catalog {version}: {n_items} x {embeddings.shape[1]} loaded in {time.perf_counter() - start:.1f}s",
+          file=sys.stderr)
+
+    if args.seeds:
+        index = {item_id: i for i, item_id in enumerate(catalog.item_id)}
+        seed_ids = list(dict.fromkeys(read_seed_file(args.seeds)))
+        unknown = [item_id for item_id in seed_ids if item_id not in index]
+        if unknown:
+            print(f"skipping {len(unknown)} seeds not in the catalog, e.g. {unknown[:5]}", file=sys.stderr)
+        seed_rows = np.array([index[item_id] for item_id in seed_ids if item_id in index], dtype=np.uint32)
+    else:
+        seed_rows = np.arange(n_items, dtype=np.uint32)
+    if not len(seed_rows):
+        parser.error("no seeds to score")
+
+    top_k = min(args.top_k, n_items - 1)
+    chunk_rows = args.chunk_rows or max(1, min(1024, 8_000_000 // n_items))
+    projection = None
+    if args.rfy_dimensions and args.rfy_dimensions < embeddings.shape[1] and {"rfy", "nfm"} & set(models):
+        projection = EmbeddingProjection(args.rfy_dimensions, args.rfy_projection).fit(embeddings)
+
+    run, resumed = _prepare_run(args.out, {
+        "catalog_version": version,
+        "n_items": n_items,
+        "n_seeds": int(len(seed_rows)),
+        "seeds_digest": hashlib.sha1(seed_rows.tobytes()).hexdigest()[:16],
+        "models": models,
+        "top_k": top_k,
+        "chunk_rows": chunk_rows,
+        "rfy_projection": projection_spec(projection),
+    })
+    names = _files(run)
+    paths = {key: os.path.join(args.out, name) for key, name in names.items()}
+    n_seeds = len(seed_rows)
+    chunks = [(i, lo, min(lo + chunk_rows, n_seeds)) for i, lo in enumerate(range(0, n_seeds, chunk_rows))]
+
+    seeds_file = _open(paths["seeds"], np.uint32, (n_seeds,), resumed)
+    seeds_file[:] = seed_rows
+    seeds_file.flush()
+    progress = _open(paths["progress"], np.uint8, (len(chunks),), resumed)
+    outputs = {}
+    for model in models:
+        for key, dtype in ((f"{model}-rows", "<u4"), (f"{model}-scores", "<f4")):
+            _open(paths[key], dtype, (n_seeds, top_k), resumed).flush()
+            outputs[key] = (paths[key], dtype, (n_seeds, top_k))
+
+    pending = [chunk for chunk in chunks if not progress[chunk[0]]]
+    if resumed:
+        print(f"resuming: {len(chunks) - len(pending)} of {len(chunks)} chunks already done", file=sys.stderr)
+
+    arrays = {"seeds": seed_rows}
+    if "similarity" in models:
+        E = np.asarray(embeddings, dtype=np.float64)
+        arrays["normalized"] = E / np.linalg.norm(E, axis=1, keepdims=True)
+    if "rfy" in models or "nfm" in models:
+        E = np.asarray(embeddings, dtype=np.float64) if projection is None else projection.transform(embeddings)
+        arrays["bayesian"] = np.ascontiguousarray(E)
+        arrays["sq_norms"] = np.einsum("ij,ij->i", E, E)
+    del E
+
+    blocks = []
+    done_seeds = sum(hi - lo for i, lo, hi in chunks if progress[i])
+    scoring_start = time.perf_counter()
+    last_report = 0.0
+
+    def report(finished, final=False):
+        nonlocal last_report
+        now = time.perf_counter()
+        if not final and (now - last_report < 2.0 or done_seeds == n_seeds):
+            return
+        last_report = now
+        elapsed = now - scoring_start
+        rate = finished / elapsed if elapsed > 0 else 0.0
+        eta = (n_seeds - done_seeds) / rate if rate > 0 else float("inf")
+        print(f"{done_seeds}/{n_seeds} seeds ({100 * done_seeds / n_seeds:.1f}%), {rate:.0f} seeds/s, "
+              f"eta {eta:.0f}s", file=sys.stderr)
+
+    try:
+        finished = 0
+        if args.workers > 0 and len(pending) > 1:
+            blocks, specs = _shared(arrays)
+            ctx = multiprocessing.get_context("spawn")
+            initargs = (specs, outputs, models, top_k, _BAYESIAN_DEFAULTS)
+            with ctx.Pool(min(args.workers, len(pending)), initializer=_init_worker, initargs=initargs) as pool:
+                for index, n in pool.imap_unordered(score_chunk, pending):
+                    progress[index] = 1
+                    progress.flush()
+                    done_seeds += n
+                    finished += n
+                    report(finished)
+        else:
+            _init_worker(arrays, outputs, models, top_k, _BAYESIAN_DEFAULTS)
+            for chunk in pending:
+                index, n = score_chunk(chunk)
+                progress[index] = 1
+                progress.flush()
+                done_seeds += n
+                finished += n
+                report(finished)
+        report(finished, final=True)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    manifest = {
+        "format": FORMAT,
+        "version": FORMAT_VERSION,
+        **{key: run[key] for key in ("catalog_version", "n_items", "n_seeds", "models", "top_k", "rfy_projection")},
+        "seeds": names["seeds"],
+        "files": {model: {"rows": names[f"{model}-rows"], "scores": names[f"{model}-scores"]} for model in models},
+        "created_at": time.time(),
+    }
+    previous = read_manifest(args.out) if os.path.exists(os.path.join(args.out, MANIFEST)) else None
+    if previous:
+        manifest["previous"] = [previous["seeds"]] + [
+            name for files in previous["files"].values() for name in files.values()
+        ]
+    if args.check:
+        rows_by_model = {model: np.memmap(paths[f"{model}-rows"], dtype="<u4", mode="r", shape=(n_seeds, top_k))
+                         for model in models}
+        manifest["agreement"] = check_agreement(catalog, embeddings, run, rows_by_model, seed_rows, args.check, projection)
+        print(f"top-{top_k} agreement with the online pipelines: {manifest['agreement']}", file=sys.stderr)
+
+    _write_json(os.path.join(args.out, MANIFEST), manifest)
+    _remove(paths["progress"])
+    _remove(os.path.join(args.out, RUN))
+    # The run before the previous one is no longer listed by any manifest
+    keep = set(names.values())
+    for name in previous.get("previous", []) if previous else []:
+        if name not in keep:
+            _remove(os.path.join(args.out, name))
+    print(f"{os.path.join(args.out, MANIFEST)}: top-{top_k} of {n_seeds} seeds x {len(models)} models "
+          f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
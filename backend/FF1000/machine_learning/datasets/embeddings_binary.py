@@ -0,0 +1,154 @@
+import json
+import os
+import uuid
+import numpy as np
+import pandas as pd
+
+
+# Binary catalog layout, one directory:
+#   manifest.json           shapes and file names; written last, atomically
+#   embeddings-<tag>.f32    contiguous little-endian float32 matrix, row-major (n_items, d)
+#   metadata-<tag>.csv      item_id, title and optional poster / premiere_year, same row order
+# Writing a new export into the same directory only swaps the manifest, so a reader (or
+# the catalog watcher, which polls manifest.json) never sees a half-written catalog. The
+# previous export's files are kept (listed under "previous") until the next export, so
+# a loader that read the old manifest just before the swap can still open them.
+MANIFEST = "manifest.json"
+FORMAT = "ff1000-catalog"
+FORMAT_VERSION = 1
+DTYPE = "<f4"
+
+
+def _embedding_matrix(column, n_dimensions=None):
+    # Arrow list / fixed-size-list column -> (rows, d) float32 without Python objects
+    values = column.flatten().to_numpy(zero_copy_only=False)
+    if len(column) == 0:
+        return np.empty((0, n_dimensions or 0), dtype=DTYPE)
+    d = len(values) // len(column)
+    if d * len(column) != len(values) or (n_dimensions is not None and d != n_dimensions):
+        raise ValueError(f"embeddings must all have {n_dimensions or d} dimensions")
+    return values.reshape(len(column), d).astype(DTYPE, copy=False)
+
+
+class CatalogWriter:
+    # Appends chunks to the data files and only publishes them on close(). Memory use is
+    # that of one chunk, whatever the size of the catalog.
+    def __init__(self, path: str, n_dimensions: int = None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.n_dimensions = n_dimensions
+        self.n_items = 0
+        tag = uuid.uuid4().hex[:12]
+        self._embeddings_name = f"embeddings-{tag}.f32"
+        self._metadata_name = f"metadata-{tag}.csv"
+        self._embeddings = open(os.path.join(path, self._embeddings_name), "wb")
+        self._metadata = open(os.path.join(path, self._metadata_name), "w", newline="")
+        self._columns = None
+
+    def write(self, metadata: pd.DataFrame, embeddings: np.ndarray):
+        embeddings = np.ascontiguousarray(embeddings, dtype=DTYPE)
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(metadata):
+            raise ValueError("need one embedding row per metadata row")
+        if self.n_dimensions is None:
+            self.n_dimensions = embeddings.shape[1]
+        elif embeddings.shape[1] != self.n_dimensions:
+            raise ValueError(f"embeddings must all have {self.n_dimensions} dimensions")
+
+        if self._columns is None:
+            self._columns = list(metadata.columns)
+            if not {"item_id", "title"} <= set(self._columns):
+                raise ValueError("metadata needs item_id and title columns")
+        metadata[self._columns].to_csv(self._metadata, header=self.n_items == 0, index=False)
+        self._embeddings.write(embeddings.tobytes())
+        self.n_items += len(metadata)
+
+    def write_batch(self, batch):
+        # One Arrow RecordBatch (or Table) with an `embedding` list column
+        metadata = batch.drop_columns(["embedding"]).to_pandas()
+        self.write(metadata, _embedding_matrix(batch.column("embedding"), self.n_dimensions))
+
+    def close(self) -> str:
+        self._embeddings.close()
+        self._metadata.close()
+        manifest_path = os.path.join(self.path, MANIFEST)
+        previous = _read_manifest(manifest_path) if os.path.exists(manifest_path) else None
+
+        tmp = manifest_path + f".{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "format": FORMAT,
+                "version": FORMAT_VERSION,
+                "n_items": self.n_items,
+                "n_dimensions": self.n_dimensions,
+                "dtype": DTYPE,
+                "embeddings": self._embeddings_name,
+                "metadata": self._metadata_name,
+                "previous": [previous["embeddings"], previous["metadata"]] if previous else [],
+            }, f, indent=2)
+        os.replace(tmp, manifest_path)
+
+        # The export before the previous one is no longer listed by any manifest
+        for name in previous.get("previous", []) if previous else []:
+            if name not in (self._embeddings_name, self._metadata_name):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except FileNotFoundError:
+                    pass
+        return manifest_path
+
+    def abort(self):
+        self._embeddings.close()
+        self._metadata.close()
+        for name in (self._embeddings_name, self._metadata_name):
+            os.remove(os.path.join(self.path, name))
+
+
+def write_catalog(path: str, batches, n_dimensions: int = None) -> str:
+    # Streams an iterable of Arrow record batches (item_id, title, embedding, ...) into
+    # the binary catalog at `path` and returns the manifest path
+    writer = CatalogWriter(path, n_dimensions)
+    try:
+        for batch in batches:
+            writer.write_batch(batch)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close()
+
+
+def _read_manifest(manifest_path):
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT or manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{manifest_path}: not a {FORMAT} v{FORMAT_VERSION} manifest")
+    return manifest
+
+
+def is_binary_catalog(path) -> bool:
+    return bool(path) and os.path.isdir(path) and os.path.exists(os.path.join(path, MANIFEST))
+
+
+class EmbeddingsDataLoader:
+    def __init__(
+        self,
+        path: str,
+    ):
+        self.path = path
+        # Watched and versioned by the model store; replaced last by every export
+        self.filepath = os.path.join(path, MANIFEST)
+
+    def load_arrays(self):
+        # (catalog metadata, read-only float32 memmap of the embeddings). Nothing is
+        # parsed: the matrix is paged in from the file as the models read it.
+        manifest = _read_manifest(self.filepath)
+        shape = (manifest["n_items"], manifest["n_dimensions"])
+        embeddings = np.memmap(os.path.join(self.path, manifest["embeddings"]), dtype=manifest["dtype"], mode="r", shape=shape)
+        catalog = pd.read_csv(os.path.join(self.path, manifest["metadata"]), dtype={"item_id": str, "title": str})
+        if len(catalog) != shape[0]:
+            raise ValueError(f"{self.path}: {len(catalog)} metadata rows for {shape[0]} embeddings")
+        return catalog, embeddings
+
+    def load(self) -> pd.DataFrame:
+        catalog, embeddings = self.load_arrays()
+        catalog["embedding"] = list(np.asarray(embeddings, dtype=np.float64))
+        return catalog
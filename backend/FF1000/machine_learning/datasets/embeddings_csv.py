@@ -1,4 +1,5 @@
 import json
+import numpy as np
 import pandas as pd
 import os
 
@@ -18,3 +19,10 @@ class EmbeddingsDataLoader:
         df = pd.read_csv(self.filepath, compression='gzip')
         df.embedding = df.embedding.apply(lambda vec: [float(v) for v in json.loads(vec)])
         return df
+
+    def load_arrays(self):
+        # (catalog without the embedding column, float64 embedding matrix). Each row is
+        # parsed straight into the matrix in C, without a Python float per value.
+        df = pd.read_csv(self.filepath, compression='gzip')
+        embeddings = np.stack([np.fromstring(vec.strip()[1:-1], dtype=np.float64, sep=",") for vec in df.embedding])
+        return df.drop(columns="embedding"), embeddings
@@ -48,3 +48,21 @@ class EmbeddingsDataLoader:
     def load(self) -> pd.DataFrame:
         query = EMBEDDINGS_SQL.format(**self._table_names)
         return self._spark_session.sql(query).toPandas()
+
+    def arrow_batches(self, staging_dir: str, batch_rows: int = 10000, staging_uri: str = None):
+        # Streams the query result as Arrow record batches of at most `batch_rows` rows.
+        # The executors write it to Parquet under `staging_uri` (the Spark view of
+        # `staging_dir`, e.g. dbfs:/tmp/x for /dbfs/tmp/x); the driver then reads the
+        # files back batch by batch, so nothing is collected into one pandas frame.
+        import pyarrow.dataset as ds
+
+        query = EMBEDDINGS_SQL.format(**self._table_names)
+        self._spark_session.sql(query).write.mode("overwrite").parquet(staging_uri or staging_dir)
+        dataset = ds.dataset(staging_dir, format="parquet")
+        yield from dataset.to_batches(batch_size=batch_rows)
+
+    def export(self, path: str, staging_dir: str, batch_rows: int = 10000, staging_uri: str = None) -> str:
+        # Writes the binary catalog (see embeddings_binary) that the FF1000 server loads
+        # without parsing; returns the manifest path
+        from machine_learning.datasets.embeddings_binary import write_catalog
+        return write_catalog(path, self.arrow_batches(staging_dir, batch_rows, staging_uri))
@@ -0,0 +1,59 @@
+"""Export the embeddings catalog into the FF1000 binary catalog format.
+
+Streams Arrow record batches into a contiguous float32 embedding file plus a metadata
+table (see machine_learning.datasets.embeddings_binary), one batch at a time:
+
+    # On Databricks: the query result is staged as Parquet and read back in batches
+    python -m machine_learning.datasets.export_catalog /dbfs/ff1000/catalog \\
+        --staging-dir /dbfs/tmp/ff1000-staging --staging-uri dbfs:/tmp/ff1000-staging
+
+    # Offline, from the synthetic stand-in source
+    python -m machine_learning.datasets.export_catalog /tmp/catalog --synthetic 100000
+
+Point FF1000_EMBEDDINGS_PATH at the output directory to serve it.
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+
+from machine_learning.datasets.embeddings_binary import CatalogWriter
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="output directory")
+    parser.add_argument("--batch-rows", type=int, default=10000)
+    parser.add_argument("--synthetic", type=int, metavar="N_ITEMS", help="export N synthetic items instead of querying Databricks")
+    parser.add_argument("--dims", type=int, default=1536, help="synthetic embedding dimensions")
+    parser.add_argument("--staging-dir", help="local path for the Parquet staging files (Databricks source)")
+    parser.add_argument("--staging-uri", help="Spark URI of --staging-dir, if it differs")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        from machine_learning.datasets.synthetic import EmbeddingsDataLoader
+        batches = EmbeddingsDataLoader(args.synthetic, args.dims).arrow_batches(args.batch_rows)
+    else:
+        if not args.staging_dir:
+            parser.error("--staging-dir is required for the Databricks source")
+        from machine_learning.datasets.embeddings_databricks import EmbeddingsDataLoader
+        batches = EmbeddingsDataLoader().arrow_batches(args.staging_dir, args.batch_rows, args.staging_uri)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    writer = CatalogWriter(args.path)
+    try:
+        for batch in batches:
+            writer.write_batch(batch)
+            print(f"{writer.n_items} items written ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+    except BaseException:
+        writer.abort()
+        raise
+    manifest = writer.close()
+    _, peak = tracemalloc.get_traced_memory()
+    print(f"{manifest}: {writer.n_items} x {writer.n_dimensions} in {time.perf_counter() - start:.1f}s, "
+          f"peak traced memory {peak / 2**20:.1f} MiB", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
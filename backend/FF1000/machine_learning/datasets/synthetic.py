@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+
+def make_catalog(n_items: int, n_dimensions: int, seed: int = 0, latent_rank: int = None):
+    # Random unit-scale embeddings plus the metadata columns the real loaders provide.
+    # Returns (catalog without the embedding column, float64 embedding matrix).
+    # latent_rank gives the embeddings a low-rank structure plus a little noise, like
+    # real text embeddings, instead of an isotropic cloud.
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((n_items, n_dimensions)) / np.sqrt(n_dimensions)
+    if latent_rank:
+        factors = rng.standard_normal((n_items, latent_rank)) @ rng.standard_normal((latent_rank, n_dimensions))
+        embeddings = factors / np.sqrt(latent_rank * n_dimensions) + 0.1 * embeddings
+    catalog = pd.DataFrame({
+        "item_id": [f"synthetic-{i:08d}" for i in range(n_items)],
+        "title": [f"Synthetic Title {i}" for i in range(n_items)],
+        "poster": [f"https://posters.example.com/{i}.jpg" for i in range(n_items)],
+        "premiere_year": rng.integers(1950, 2026, size=n_items),
+    })
+    return catalog, embeddings
+
+
+class EmbeddingsDataLoader:
+    def __init__(
+        self,
+        n_items: int = 10000,
+        n_dimensions: int = 1536,
+        seed: int = 0,
+    ):
+        self.n_items = n_items
+        self.n_dimensions = n_dimensions
+        self.seed = seed
+
+    def load(self) -> pd.DataFrame:
+        catalog, embeddings = make_catalog(self.n_items, self.n_dimensions, self.seed)
+        catalog["embedding"] = list(embeddings)
+        return catalog
+
+    def load_arrays(self):
+        return make_catalog(self.n_items, self.n_dimensions, self.seed)
+
+    def arrow_batches(self, batch_rows: int = 10000):
+        # Stand-in for the Databricks export source: the same catalog as Arrow record
+        # batches, generated chunk by chunk so memory stays bounded by batch_rows
+        import pyarrow as pa
+
+        for start in range(0, self.n_items, batch_rows):
+            n = min(batch_rows, self.n_items - start)
+            catalog, embeddings = make_catalog(n, self.n_dimensions, self.seed + start)
+            catalog["item_id"] = [f"synthetic-{i:08d}" for i in range(start, start + n)]
+            catalog["title"] = [f"Synthetic Title {i}" for i in range(start, start + n)]
+            catalog["poster"] = [f"https://posters.example.com/{i}.jpg" for i in range(start, start + n)]
+            batch = pa.RecordBatch.from_pandas(catalog, preserve_index=False)
+            flat = pa.array(embeddings.astype(np.float32).ravel())
+            yield batch.append_column("embedding", pa.FixedSizeListArray.from_arrays(flat, self.n_dimensions))
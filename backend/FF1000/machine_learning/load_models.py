@@ -1,35 +1,355 @@
+import hashlib
+import logging
+import os
+import threading
+import time
 import numpy as np
 
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
 from sklearn.pipeline import Pipeline
 
+from machine_learning.datasets import embeddings_binary
 from machine_learning.datasets.embeddings_csv import EmbeddingsDataLoader
 from machine_learning.models.rfy import BayesianRecommender
+from machine_learning.models.sharded import ShardedBayesianRecommender, ShardedSimilarityRecommender
 from machine_learning.models.similarity import SimilarityRecommender
 from machine_learning.transformers.inverter import Inverter
 from machine_learning.transformers.item_encoder import ItemIdOneHotEncoder
+from machine_learning.transformers.projection import EmbeddingProjection, ranking_agreement
 from machine_learning.transformers.scores_to_dict import ScoresToDict
 
 
-catalog = EmbeddingsDataLoader().load()
-embeddings = np.array(catalog.embedding.tolist())
-posters = catalog.poster if 'poster' in catalog.columns else None
-premiere_years = catalog.premiere_year if 'premiere_year' in catalog.columns else None
-
-recommended_for_you = Pipeline([
-    ('encoder', ItemIdOneHotEncoder(catalog.item_id)),
-    ('ranker', BayesianRecommender(embeddings)),
-    ('scores_to_dict', ScoresToDict(catalog.item_id, catalog.title, posters, premiere_years)),
-]).fit([])
-
-not_for_me = Pipeline([
-    ('encoder', ItemIdOneHotEncoder(catalog.item_id)),
-    ('inverter', Inverter()),
-    ('ranker', BayesianRecommender(embeddings)),
-    ('scores_to_dict', ScoresToDict(catalog.item_id, catalog.title, posters, premiere_years)),
-]).fit([])
-
-similarity = Pipeline([
-    ('encoder', ItemIdOneHotEncoder(catalog.item_id)),
-    ('ranker', SimilarityRecommender(embeddings)),
-    ('scores_to_dict', ScoresToDict(catalog.item_id, catalog.title, posters, premiere_years)),
-]).fit([])
+log = logging.getLogger("ff1000-models")
+
+EMBEDDINGS_PATH = os.environ.get("FF1000_EMBEDDINGS_PATH")
+
+# Optional reduced-dimension mode for the Bayesian ranker (rfy / nfm): 0 keeps the full
+# embeddings. FF1000_RFY_AGREEMENT_SAMPLES > 0 also measures, at load, how much of the
+# full-dimension top-k the reduced ranker keeps (costs that many full posteriors).
+RFY_DIMENSIONS = int(os.environ.get("FF1000_RFY_DIMENSIONS", "0"))
+RFY_PROJECTION = os.environ.get("FF1000_RFY_PROJECTION", "svd")
+RFY_AGREEMENT_SAMPLES = int(os.environ.get("FF1000_RFY_AGREEMENT_SAMPLES", "0"))
+
+# Optional sharded scoring: FF1000_SHARDS > 0 splits the catalog across that many local
+# shard processes, each returning its local top-k (FF1000_SHARD_TOP_K, at least the
+# largest `limit` callers ask for) to be merged here. FF1000_SHARD_CHANNELS bounds the
+# requests in flight to the shards at once (threads x workers beyond it wait for a
+# channel). Catalog deltas are not supported in this mode.
+SHARDS = int(os.environ.get("FF1000_SHARDS", "0"))
+SHARD_TOP_K = int(os.environ.get("FF1000_SHARD_TOP_K", "1000"))
+SHARD_CHANNELS = int(os.environ.get("FF1000_SHARD_CHANNELS", "16"))
+
+
+def catalog_version(filepath):
+    # Cheap content tag: modification time plus a hash of path, size and mtime. Good
+    # enough to tell daily snapshots apart without reading the whole file.
+    stat = os.stat(filepath)
+    digest = hashlib.sha1(f"{os.path.abspath(filepath)}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+    return time.strftime("%Y%m%dT%H%M%S", time.gmtime(stat.st_mtime)) + "-" + digest[:8]
+
+
+def default_loader(path=None):
+    # A directory holding a binary catalog export, or the embeddings CSV
+    path = path or EMBEDDINGS_PATH
+    if embeddings_binary.is_binary_catalog(path):
+        return embeddings_binary.EmbeddingsDataLoader(path)
+    return EmbeddingsDataLoader(path)
+
+
+def load_catalog(loader=None):
+    loader = loader or default_loader()
+    if hasattr(loader, "load_arrays"):
+        return loader.load_arrays()
+    catalog = loader.load()
+    embeddings = np.array(catalog.embedding.tolist())
+    return catalog, embeddings
+
+
+def assemble_pipelines(encoder, bayesian, similarity_ranker, to_dict):
+    # The pipelines share their encoder, rankers and ScoresToDict, so a catalog delta
+    # only has to update each component once.
+    recommended_for_you = Pipeline([
+        ('encoder', encoder),
+        ('ranker', bayesian),
+        ('scores_to_dict', to_dict),
+    ]).fit([])
+
+    not_for_me = Pipeline([
+        ('encoder', encoder),
+        ('inverter', Inverter()),
+        ('ranker', bayesian),
+        ('scores_to_dict', to_dict),
+    ]).fit([])
+
+    similarity = Pipeline([
+        ('encoder', encoder),
+        ('ranker', similarity_ranker),
+        ('scores_to_dict', to_dict),
+    ]).fit([])
+
+    return {
+        "nfm": not_for_me,
+        "rfy": recommended_for_you,
+        "similarity": similarity,
+    }
+
+
+def build_bayesian(embeddings, n_components=0, method="svd", agreement_samples=0, shards=0):
+    def ranker(projection=None):
+        if shards:
+            return ShardedBayesianRecommender(embeddings, shards, SHARD_TOP_K, projection=projection,
+                                              channels=SHARD_CHANNELS)
+        return BayesianRecommender(embeddings, projection=projection)
+
+    if not n_components or n_components >= embeddings.shape[1]:
+        return ranker()
+
+    start = time.perf_counter()
+    projection = EmbeddingProjection(n_components, method).fit(embeddings)
+    bayesian = ranker(projection)
+    log.info("rfy embeddings projected %d -> %d dims (%s, explained variance %s) in %.1fs",
+             embeddings.shape[1], n_components, method, projection.explained_variance_, time.perf_counter() - start)
+
+    projection.agreement_ = None
+    if agreement_samples:
+        projection.agreement_ = ranking_agreement(BayesianRecommender(embeddings), bayesian, n_seeds=agreement_samples)
+        log.info("rfy ranking agreement vs full dimension: %s", projection.agreement_)
+    return bayesian
+
+
+def build_similarity(embeddings, shards=0):
+    if shards:
+        return ShardedSimilarityRecommender(embeddings, shards, SHARD_TOP_K, channels=SHARD_CHANNELS)
+    return SimilarityRecommender(embeddings)
+
+
+def build_models(catalog, embeddings):
+    posters = catalog.poster if 'poster' in catalog.columns else None
+    premiere_years = catalog.premiere_year if 'premiere_year' in catalog.columns else None
+
+    # The components are independent; building them side by side overlaps the NumPy
+    # work (normalising, copying the embeddings) with the pure-Python column cleanup.
+    with ThreadPoolExecutor(max_workers=4, thread_name_prefix="build-models") as pool:
+        encoder = pool.submit(ItemIdOneHotEncoder, catalog.item_id)
+        bayesian = pool.submit(build_bayesian, embeddings, RFY_DIMENSIONS, RFY_PROJECTION, RFY_AGREEMENT_SAMPLES, SHARDS)
+        similarity_ranker = pool.submit(build_similarity, embeddings, SHARDS)
+        to_dict = pool.submit(ScoresToDict, catalog.item_id, catalog.title, posters, premiere_years)
+
+    return assemble_pipelines(encoder.result(), bayesian.result(), similarity_ranker.result(), to_dict.result())
+
+
+class ModelSnapshot:
+    # One consistent catalog + pipelines. Never mutated after construction, so a
+    # request that grabbed a snapshot keeps using it even if a reload swaps in another.
+    def __init__(self, version, models, n_items, n_retired=0, n_deltas=0):
+        self.version = version
+        self.models = models
+        self.n_items = n_items
+        self.n_retired = n_retired
+        self.n_deltas = n_deltas
+        self.loaded_at = time.time()
+
+    def with_delta(self, upserts=(), retired_ids=()):
+        # New snapshot with items added, updated in their slot or retired, leaving this
+        # snapshot untouched: the embedding buffers grow with spare capacity (updates
+        # copy them first), only the changed rows are normalised, and retired items keep
+        # their slot but are masked out of every ranking (the rankers' mask_value).
+        encoder = self.models["rfy"].named_steps["encoder"]
+        bayesian = self.models["rfy"].named_steps["ranker"]
+        similarity_ranker = self.models["similarity"].named_steps["ranker"]
+        to_dict = self.models["rfy"].named_steps["scores_to_dict"]
+        index = encoder.index_
+
+        if not all(isinstance(item_id, str) for item_id in retired_ids):
+            raise ValueError("retired item ids must be strings")
+        unknown = [item_id for item_id in retired_ids if item_id not in index]
+        if unknown:
+            raise ValueError(f"cannot retire unknown items: {unknown[:10]}")
+
+        # Full-dimension embeddings; the Bayesian ranker projects them itself if reduced
+        d = similarity_ranker.d_
+        for item in upserts:
+            if not isinstance(item["item_id"], str) or not isinstance(item["title"], str):
+                raise ValueError(f"item {item['item_id']!r}: item_id and title must be strings")
+            embedding = item["embedding"]
+            if not isinstance(embedding, list) or not all(
+                isinstance(x, (int, float)) and not isinstance(x, bool) for x in embedding
+            ):
+                raise ValueError(f"item {item['item_id']}: embedding must be a list of numbers")
+            if len(embedding) != d:
+                raise ValueError(f"item {item['item_id']}: embedding has {len(embedding)} dims, expected {d}")
+        # A second row for the same new id would be appended but never reachable
+        counts = Counter(item["item_id"] for item in upserts)
+        duplicates = [item_id for item_id, n in counts.items() if n > 1]
+        if duplicates:
+            raise ValueError(f"items upserted more than once: {duplicates[:10]}")
+
+        added = [item for item in upserts if item["item_id"] not in index]
+        updated = [item for item in upserts if item["item_id"] in index]
+        update_idx = [index[item["item_id"]] for item in updated]
+        retire_idx = [index[item_id] for item_id in retired_ids]
+
+        def column(items, key):
+            return [item.get(key) for item in items]
+
+        def updated_column(key, current):
+            # Metadata an update leaves out keeps its current value
+            return [item[key] if key in item else current[i] for item, i in zip(updated, update_idx)]
+
+        new_embeddings = np.array(column(added, "embedding"), dtype=np.float64).reshape(len(added), d)
+        update_embeddings = np.array(column(updated, "embedding"), dtype=np.float64).reshape(len(updated), d)
+
+        bayesian = bayesian.with_delta(new_embeddings, update_idx, update_embeddings, retire_idx)
+        models = assemble_pipelines(
+            encoder.with_items(column(added, "item_id")),
+            bayesian,
+            similarity_ranker.with_delta(new_embeddings, update_idx, update_embeddings, retire_idx),
+            to_dict.with_delta(
+                column(added, "item_id"), column(added, "title"), column(added, "poster"), column(added, "premiere_year"),
+                update_idx, column(updated, "title"),
+                updated_column("poster", to_dict.posters), updated_column("premiere_year", to_dict.premiere_years),
+            ),
+        )
+        n_deltas = self.n_deltas + 1
+        version = self.version.split("+")[0] + f"+delta{n_deltas}"
+        return ModelSnapshot(version, models, bayesian.N_, int(bayesian.retired_.sum()), n_deltas)
+
+    def predict_rfy_and_nfm(self, X, timings=None, **params):
+        # Same result as models["rfy"].predict(X) and models["nfm"].predict(X), but the
+        # Bayesian posterior is computed once per row and shared by both rankings.
+        # Per-step durations are appended to `timings` when a list is given.
+        steps = self.models["rfy"].named_steps
+        timings = [] if timings is None else timings
+
+        start = time.perf_counter()
+        encoded = steps['encoder'].transform(X)
+        timings.append(('encoder', time.perf_counter() - start))
+
+        start = time.perf_counter()
+        rfy_scores, nfm_scores = steps['ranker'].joint_transform(encoded)
+        timings.append(('ranker', time.perf_counter() - start))
+
+        start = time.perf_counter()
+        preds = steps['scores_to_dict'].predict(rfy_scores, **params), steps['scores_to_dict'].predict(nfm_scores, **params)
+        timings.append(('scores_to_dict', time.perf_counter() - start))
+        return preds
+
+
+class ModelStore:
+    # Holds the live ModelSnapshot. Reloads build a complete new snapshot off to the
+    # side and then swap a single reference, so requests never see a half-built catalog
+    # and the old snapshot keeps serving until the swap.
+    def __init__(self, loader_factory=None):
+        self._loader_factory = loader_factory or default_loader
+        self._current = None
+        self._reload_lock = threading.Lock()
+        self._lock = threading.Lock()  # guards the reloading flag
+        self._watcher = None
+        self.reloading = False
+        self.last_error = None
+
+    @property
+    def current(self) -> ModelSnapshot:
+        return self._current
+
+    @property
+    def ready(self) -> bool:
+        return self._current is not None
+
+    def _version_for(self, loader):
+        filepath = getattr(loader, "filepath", None)
+        if filepath and os.path.exists(filepath):
+            return catalog_version(filepath)
+        return time.strftime("%Y%m%dT%H%M%S", time.gmtime()) + "-loaded"
+
+    def load(self) -> ModelSnapshot:
+        with self._reload_lock:
+            with self._lock:
+                self.reloading = True
+            try:
+                start = time.perf_counter()
+                loader = self._loader_factory()
+                version = self._version_for(loader)
+                catalog, embeddings = load_catalog(loader)
+                snapshot = ModelSnapshot(version, build_models(catalog, embeddings), len(catalog))
+                self._current = snapshot
+                self.last_error = None
+                log.info("catalog %s loaded: %d items in %.1fs", version, snapshot.n_items, time.perf_counter() - start)
+                return snapshot
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                log.exception("catalog load failed; still serving %s", self._current and self._current.version)
+                raise
+            finally:
+                self.reloading = False
+
+    def _claim_reload(self) -> bool:
+        # Test-and-set, so concurrent callers (admin and the file watcher) start a
+        # single build between them
+        with self._lock:
+            if self.reloading:
+                return False
+            self.reloading = True
+            return True
+
+    def reload_async(self) -> bool:
+        # Also used for the first load, so a worker can bind and answer /health while
+        # the catalog is still being built
+        if not self._claim_reload():
+            return False
+
+        def run():
+            try:
+                self.load()
+            except Exception:
+                pass  # already logged and kept in last_error
+
+        threading.Thread(target=run, name="catalog-reload", daemon=True).start()
+        return True
+
+    def apply_delta(self, upserts=(), retired_ids=()) -> ModelSnapshot:
+        # Serialised with reloads: deltas always extend the live snapshot. A full reload
+        # starts from the catalog file again, which is expected to include past deltas.
+        with self._reload_lock:
+            start = time.perf_counter()
+            snapshot = self._current.with_delta(upserts, retired_ids)
+            self._current = snapshot
+            log.info("catalog %s: %d upserts, %d retired in %.1f ms",
+                     snapshot.version, len(upserts), len(retired_ids), (time.perf_counter() - start) * 1000)
+            return snapshot
+
+    def catalog_path(self):
+        return getattr(self._loader_factory(), "filepath", None)
+
+    def watch(self, filepath, interval_s: float = 30.0):
+        # Poll the embeddings file and reload when a new snapshot lands on it. Replace
+        # the file atomically (write elsewhere, then rename) so a half-written file is
+        # never picked up.
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+
+        def run():
+            seen = catalog_version(filepath) if os.path.exists(filepath) else None
+            while True:
+                time.sleep(interval_s)
+                if not os.path.exists(filepath):
+                    continue
+                version = catalog_version(filepath)
+                if version != seen and (self._current is None or version != self._current.version):
+                    if not self._claim_reload():
+                        continue  # a reload is already running; look again on the next poll
+                    log.info("catalog file changed (%s); reloading", version)
+                    try:
+                        self.load()
+                    except Exception:
+                        continue  # already logged and kept in last_error; retried on the next poll
+                seen = version
+
+        self._watcher = threading.Thread(target=run, name="catalog-watcher", daemon=True)
+        self._watcher.start()
+
+
+# Loaded by the server at startup (server.api), not on import
+store = ModelStore()
@@ -0,0 +1,58 @@
+import numpy as np
+
+
+class GrowableRows:
+    # Row buffer with spare capacity so appending k rows costs O(k·d) amortised instead
+    # of copying the whole matrix. `appended` returns a new GrowableRows that may share
+    # the underlying buffer: rows past this object's `n` are never read through it, so
+    # an older holder keeps seeing exactly the rows it had. Rows an older holder can see
+    # are never written: `overwritten` copies the buffer first.
+    def __init__(self, rows: np.ndarray, capacity: int = None):
+        rows = np.asarray(rows)
+        capacity = max(capacity or 0, rows.shape[0])
+        if capacity == rows.shape[0]:
+            self._buffer = rows
+        else:
+            self._buffer = np.empty((capacity,) + rows.shape[1:], dtype=rows.dtype)
+            self._buffer[:rows.shape[0]] = rows
+        self.n = rows.shape[0]
+
+    @property
+    def rows(self) -> np.ndarray:
+        return self._buffer[:self.n]
+
+    @property
+    def capacity(self) -> int:
+        return self._buffer.shape[0]
+
+    def appended(self, new_rows: np.ndarray) -> "GrowableRows":
+        new_rows = np.asarray(new_rows, dtype=self._buffer.dtype)
+        k = new_rows.shape[0]
+        out = GrowableRows.__new__(GrowableRows)
+        if self.n + k <= self.capacity:
+            out._buffer = self._buffer
+        else:
+            out._buffer = np.empty((max(2 * self.capacity, self.n + k),) + self._buffer.shape[1:], dtype=self._buffer.dtype)
+            out._buffer[:self.n] = self.rows
+        out._buffer[self.n:self.n + k] = new_rows
+        out.n = self.n + k
+        return out
+
+    def overwritten(self, idx, new_rows: np.ndarray) -> "GrowableRows":
+        # Copy-on-write: a snapshot still being served may read these rows, so the
+        # replaced rows go into a private copy (same spare capacity) instead
+        out = GrowableRows.__new__(GrowableRows)
+        out._buffer = np.empty_like(self._buffer)
+        out._buffer[:self.n] = self.rows
+        out._buffer[np.asarray(idx, dtype=np.intp)] = new_rows
+        out.n = self.n
+        return out
+
+
+def retired_mask_after(retired, n, update_idx=(), retire_idx=()):
+    # Retired flags for a catalog grown to n rows: upserted rows come back, retired go out
+    out = np.zeros(n, dtype=bool)
+    out[:retired.shape[0]] = retired
+    out[np.asarray(update_idx, dtype=np.intp)] = False
+    out[np.asarray(retire_idx, dtype=np.intp)] = True
+    return out
@@ -1,6 +1,26 @@
+import copy
 import numpy as np
 from sklearn.base import BaseEstimator
 
+from machine_learning.models.growable import GrowableRows, retired_mask_after
+
+
+def posterior(X_obs, y_obs, lambda_reg, sigma2):
+    # Posterior precision inverse and mean of the user's weight vector given the seen
+    # items' embeddings X_obs and their signs y_obs
+    d = X_obs.shape[1]
+    A = lambda_reg * np.eye(d, dtype=np.float64) + (X_obs.T @ X_obs) / sigma2
+    invA = np.linalg.inv(A)
+    mu = invA @ (X_obs.T @ y_obs) / sigma2
+    return invA, mu
+
+
+def mean_and_uncertainty(X, invA, mu):
+    # Predictive mean m and standard deviation s for every row of X
+    m = X @ mu
+    s2 = np.einsum('ij,ij->i', X @ invA, X)
+    return m, np.sqrt(np.clip(s2, 0.0, None))
+
 
 class BayesianRecommender(BaseEstimator):
     def __init__(self,
@@ -8,41 +28,72 @@ class BayesianRecommender(BaseEstimator):
                  lambda_reg: float = 1.0,
                  sigma2: float = 1.0,
                  z: float = -1.1645,  # -1.645=<10% LCB
-                 mask_value: float = -np.inf):
+                 mask_value: float = -np.inf,
+                 projection=None):
 
-        self.item_embeddings = np.asarray(item_embeddings, dtype=np.float64)
+        # Optional fitted EmbeddingProjection: the posterior is computed in its reduced
+        # space, and embeddings added by deltas are projected the same way
+        self.projection = projection
+        self._rows = GrowableRows(self._project(item_embeddings))
         self.N_, self.d_ = self.item_embeddings.shape
 
         self.lambda_reg = float(lambda_reg)
         self.sigma2 = float(sigma2)
         self.z = float(z)
         self.mask_value = mask_value
+        self.retired_ = np.zeros(self.N_, dtype=bool)
+        self._retired_idx = np.empty(0, dtype=np.intp)
+
+    @property
+    def item_embeddings(self):
+        return self._rows.rows
 
-        self.X_items = self.item_embeddings
-        self.XT_items = self.item_embeddings.T
+    @property
+    def X_items(self):
+        return self._rows.rows
+
+    @property
+    def XT_items(self):
+        return self._rows.rows.T
+
+    def _project(self, E):
+        E = np.asarray(E, dtype=np.float64)
+        return E if self.projection is None else self.projection.transform(E)
 
     def fit(self, X=None, y=None):
         return self
 
-    def _user_posterior_and_scores(self, y_vec: np.ndarray):
+    def with_delta(self, new_embeddings=None, update_idx=(), update_embeddings=None, retire_idx=()):
+        # Copy with rows appended, overwritten or retired. Retired items stay in place
+        # and are masked out of the scores.
+        out = copy.copy(self)
+        if len(update_idx):
+            out._rows = out._rows.overwritten(update_idx, self._project(update_embeddings))
+        if new_embeddings is not None and len(new_embeddings):
+            out._rows = out._rows.appended(self._project(new_embeddings))
+        out.N_ = out._rows.n
+        out.retired_ = retired_mask_after(self.retired_, out.N_, update_idx, retire_idx)
+        out._retired_idx = np.flatnonzero(out.retired_)
+        return out
+
+    def _user_posterior(self, y_vec: np.ndarray):
         seen_mask = y_vec != 0
         X_obs = self.X_items[seen_mask]
         y_obs = y_vec[seen_mask].astype(np.float64)
-        A = self.lambda_reg * np.eye(self.d_, dtype=np.float64) + (X_obs.T @ X_obs) / self.sigma2
-        invA = np.linalg.inv(A)
-        mu = invA @ (X_obs.T @ y_obs) / self.sigma2
+        invA, mu = posterior(X_obs, y_obs, self.lambda_reg, self.sigma2)
+        m, s = mean_and_uncertainty(self.X_items, invA, mu)
+        return seen_mask, m, s
 
-        m = self.X_items @ mu
-        XinvA = self.X_items @ invA
-        s2 = np.einsum('ij,ij->i', XinvA, self.X_items)
-        s = np.sqrt(np.clip(s2, 0.0, None))
+    def _user_posterior_and_scores(self, y_vec: np.ndarray):
+        seen_mask, m, s = self._user_posterior(y_vec)
 
         scores = m + self.z * s
         scores[seen_mask] = self.mask_value
+        scores[self._retired_idx] = self.mask_value
 
         return scores
 
-    def transform(self, X):
+    def _check_input(self, X):
         X = np.asarray(X, dtype=np.float64)
         if X.ndim == 1:
             X = X[None, :]
@@ -50,8 +101,32 @@ class BayesianRecommender(BaseEstimator):
         B, N = X.shape
         if N != self.N_:
             raise ValueError(f"Input width {N} != number of items {self.N_}.")
+        return X
+
+    def transform(self, X):
+        X = self._check_input(X)
+        B, N = X.shape
 
         out = np.empty((B, N), dtype=np.float64)
         for b in range(B):
             out[b] = self._user_posterior_and_scores(X[b])
         return out
+
+    def joint_transform(self, X):
+        # Scores for X and for -X (what the Inverter feeds the nfm pipeline) from one
+        # posterior: A and the uncertainty s only depend on which items were seen, and
+        # negating y only flips the sign of mu, hence of m.
+        X = self._check_input(X)
+        B, N = X.shape
+
+        out = np.empty((B, N), dtype=np.float64)
+        out_inverted = np.empty((B, N), dtype=np.float64)
+        for b in range(B):
+            seen_mask, m, s = self._user_posterior(X[b])
+            out[b] = m + self.z * s
+            out_inverted[b] = -m + self.z * s
+            out[b, seen_mask] = self.mask_value
+            out_inverted[b, seen_mask] = self.mask_value
+            out[b, self._retired_idx] = self.mask_value
+            out_inverted[b, self._retired_idx] = self.mask_value
+        return out, out_inverted
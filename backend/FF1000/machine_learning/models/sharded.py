@@ -0,0 +1,274 @@
+import multiprocessing
+import os
+import random
+import weakref
+import numpy as np
+from multiprocessing.connection import wait
+from sklearn.base import BaseEstimator
+
+from machine_learning.models.rfy import mean_and_uncertainty, posterior
+
+
+# Sharded scoring: the catalog rows are split across shard processes, each of which
+# only ever holds its own slice. A request is a scatter-gather:
+#   1. gather the seed items' rows from the shards that own them
+#   2. the coordinator builds the user vector (similarity) or the posterior (Bayesian)
+#      once and broadcasts it
+#   3. every shard scores its slice and returns its local top-k
+#   4. the coordinator merges the local top-ks into the global top-k
+# The rankers still return a full (B, N) score matrix so they drop into the existing
+# pipelines: everything outside the global top-k is mask_value, which is fine as long
+# as callers never ask for more than top_k items.
+
+
+def _local_top_k(scores, k, offset):
+    if k < scores.shape[0]:
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(scores.shape[0])
+    return idx + offset, scores[idx]
+
+
+def _shard_main(conns, rows, offset, mask_value):
+    # Shard process loop: owns catalog rows [offset, offset + len(rows)) and serves
+    # every channel, answering each request on the channel it came in on
+    E = np.asarray(rows, dtype=np.float64)
+    end = offset + E.shape[0]
+
+    def local(idx):
+        idx = np.asarray(idx, dtype=np.intp)
+        return idx[(idx >= offset) & (idx < end)] - offset
+
+    def masked(scores, seen):
+        scores[local(seen)] = mask_value
+        return scores
+
+    def handle(op, args):
+        if op == "rows":
+            # [seen idx per request row] -> [(global idx, rows) owned by this shard]
+            return [(l + offset, E[l]) for l in map(local, args)]
+        if op == "similarity":
+            # user vectors (B, d) -> local top-k of the cosine scores per row
+            U, seen_rows, k = args
+            return [_local_top_k(masked(E @ u, seen), k, offset) for u, seen in zip(U, seen_rows)]
+        if op == "bayesian":
+            # [(invA, mu, seen)] -> local top-k of the LCB scores per row, plus the
+            # top-k of the inverted (nfm) scores when `joint`
+            posteriors, z, k, joint = args
+            out = []
+            for invA, mu, seen in posteriors:
+                m, s = mean_and_uncertainty(E, invA, mu)
+                top = _local_top_k(masked(m + z * s, seen), k, offset)
+                out.append((top, _local_top_k(masked(-m + z * s, seen), k, offset)) if joint else top)
+            return out
+        raise ValueError(f"unknown shard op {op!r}")
+
+    conns = list(conns)
+    while conns:
+        for conn in wait(conns):
+            try:
+                op, args = conn.recv()
+            except EOFError:
+                conns.remove(conn)
+                continue
+            if op == "stop":
+                return
+            try:
+                conn.send(("ok", handle(op, args)))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+def _stop_shards(owner_pid, channels, processes):
+    # Only the process that started the shards stops them; gunicorn workers forked from
+    # it share the pipes but must not shut them down when they exit
+    if os.getpid() != owner_pid:
+        return
+    for conn in channels[0]:
+        try:
+            conn.send(("stop", None))
+        except (OSError, EOFError):
+            pass
+    for conns in channels:
+        for conn in conns:
+            conn.close()
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+
+
+class ShardGroup:
+    # A set of local shard processes over consecutive slices of the catalog rows.
+    # Requests come in over `channels` reply channels, each a pipe to every shard, with
+    # a cross-process lock: a request checks out a free channel, so concurrent requests
+    # (from every thread, and from gunicorn workers forked after the shards started)
+    # never read each other's replies. Each shard serves its channels one request at a
+    # time, so concurrent requests are pipelined across the shards rather than waiting
+    # for each other's whole scatter-gather.
+    def __init__(self, rows, n_shards, mask_value=-np.inf, channels=16):
+        rows = np.asarray(rows)
+        self.N = rows.shape[0]
+        self.d = rows.shape[1]
+        self.n_shards = max(1, min(n_shards, self.N))
+        self.bounds = np.linspace(0, self.N, self.n_shards + 1).astype(int)
+
+        # spawn: each shard receives only its own slice, not a copy of this process
+        ctx = multiprocessing.get_context("spawn")
+        n_channels = max(1, int(channels))
+        self._channel_locks = [ctx.Lock() for _ in range(n_channels)]
+        pipes = [[ctx.Pipe() for _ in range(self.n_shards)] for _ in range(n_channels)]
+        self._channels = [[parent for parent, _ in channel] for channel in pipes]
+        processes = []
+        for shard, (lo, hi) in enumerate(zip(self.bounds[:-1], self.bounds[1:])):
+            children = [channel[shard][1] for channel in pipes]
+            process = ctx.Process(
+                target=_shard_main, args=(children, rows[lo:hi], int(lo), mask_value),
+                name=f"ff1000-shard-{lo}", daemon=True,
+            )
+            process.start()
+            for child in children:
+                child.close()
+            processes.append(process)
+        self._finalizer = weakref.finalize(self, _stop_shards, os.getpid(), self._channels, processes)
+
+    def _acquire_channel(self):
+        # A free channel if there is one (from a random start, to spread the callers),
+        # otherwise wait for a random one
+        n = len(self._channel_locks)
+        first = random.randrange(n)
+        for i in range(n):
+            channel = (first + i) % n
+            if self._channel_locks[channel].acquire(block=False):
+                return channel
+        self._channel_locks[first].acquire()
+        return first
+
+    def scatter_gather(self, op, args):
+        # Same request to every shard, replies in shard order
+        channel = self._acquire_channel()
+        try:
+            conns = self._channels[channel]
+            for conn in conns:
+                conn.send((op, args))
+            replies = [conn.recv() for conn in conns]
+        finally:
+            self._channel_locks[channel].release()
+        errors = [payload for status, payload in replies if status != "ok"]
+        if errors:
+            raise RuntimeError(f"shard {op} failed: {errors[0]}")
+        return [payload for _, payload in replies]
+
+    def gather_rows(self, seen_rows):
+        # Rows of the seen items, per request row, in the order of `seen_rows`
+        per_shard = self.scatter_gather("rows", seen_rows)
+        out = []
+        for b, seen in enumerate(seen_rows):
+            idx = np.concatenate([shard[b][0] for shard in per_shard])
+            rows = np.concatenate([shard[b][1] for shard in per_shard]).reshape(len(idx), self.d)
+            order = {item: i for i, item in enumerate(idx)}
+            out.append(rows[[order[item] for item in seen]] if len(seen) else rows)
+        return out
+
+    def close(self):
+        self._finalizer()
+
+
+def _merge(per_shard, k, N, mask_value):
+    # Global top-k of the shards' local top-ks, as full (B, N) score rows
+    B = len(per_shard[0])
+    out = np.full((B, N), mask_value, dtype=np.float64)
+    for b in range(B):
+        idx = np.concatenate([shard[b][0] for shard in per_shard])
+        scores = np.concatenate([shard[b][1] for shard in per_shard])
+        if k < scores.shape[0]:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            idx, scores = idx[keep], scores[keep]
+        out[b, idx] = scores
+    return out
+
+
+def _seen(X):
+    return [np.flatnonzero(row) for row in X]
+
+
+class ShardedSimilarityRecommender(BaseEstimator):
+    # Drop-in for SimilarityRecommender with the normalised catalog spread over shards
+    def __init__(self, item_embeddings: np.ndarray, n_shards: int = 2, top_k: int = 1000,
+                 mask_value: float = -np.inf, channels: int = 16):
+        E = np.asarray(item_embeddings, dtype=np.float64)
+        self.N_, self.d_ = E.shape
+        self.n_shards = n_shards
+        self.top_k = top_k
+        self.mask_value = mask_value
+        self.channels = channels
+        self.shards_ = ShardGroup(E / np.linalg.norm(E, axis=1, keepdims=True), n_shards, mask_value, channels)
+
+    def fit(self, X=None, y=None):
+        return self
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        seen = _seen(X)
+        rows = self.shards_.gather_rows(seen)
+        U = np.zeros((len(X), self.d_))
+        for b in range(len(X)):
+            U[b] = X[b, seen[b]] @ rows[b]
+        U /= np.linalg.norm(U, axis=1, keepdims=True)
+        per_shard = self.shards_.scatter_gather("similarity", (U, seen, self.top_k))
+        return _merge(per_shard, self.top_k, self.N_, self.mask_value)
+
+    def with_delta(self, *args, **kwargs):
+        raise ValueError("catalog deltas are not supported with sharded scoring; reload the catalog instead")
+
+
+class ShardedBayesianRecommender(BaseEstimator):
+    # Drop-in for BayesianRecommender: the posterior is computed once per request by the
+    # coordinator and broadcast; the shards compute mean and uncertainty for their rows
+    def __init__(self, item_embeddings: np.ndarray, n_shards: int = 2, top_k: int = 1000,
+                 lambda_reg: float = 1.0, sigma2: float = 1.0, z: float = -1.1645,
+                 mask_value: float = -np.inf, projection=None, channels: int = 16):
+        E = np.asarray(item_embeddings, dtype=np.float64)
+        self.projection = projection
+        if projection is not None:
+            E = projection.transform(E)
+        self.N_, self.d_ = E.shape
+        self.n_shards = n_shards
+        self.top_k = top_k
+        self.lambda_reg = float(lambda_reg)
+        self.sigma2 = float(sigma2)
+        self.z = float(z)
+        self.mask_value = mask_value
+        self.channels = channels
+        self.shards_ = ShardGroup(E, n_shards, mask_value, channels)
+
+    def fit(self, X=None, y=None):
+        return self
+
+    def _posteriors(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.N_:
+            raise ValueError(f"Input width {X.shape[1]} != number of items {self.N_}.")
+        seen = _seen(X)
+        rows = self.shards_.gather_rows(seen)
+        return X, [
+            posterior(rows[b], X[b, seen[b]], self.lambda_reg, self.sigma2) + (seen[b],) for b in range(len(X))
+        ]
+
+    def transform(self, X):
+        X, posteriors = self._posteriors(X)
+        per_shard = self.shards_.scatter_gather("bayesian", (posteriors, self.z, self.top_k, False))
+        return _merge(per_shard, self.top_k, self.N_, self.mask_value)
+
+    def joint_transform(self, X):
+        # rfy and nfm scores from one posterior and one pass over each shard
+        X, posteriors = self._posteriors(X)
+        per_shard = self.shards_.scatter_gather("bayesian", (posteriors, self.z, self.top_k, True))
+        out = _merge([[top for top, _ in shard] for shard in per_shard], self.top_k, self.N_, self.mask_value)
+        out_inverted = _merge([[top for _, top in shard] for shard in per_shard], self.top_k, self.N_, self.mask_value)
+        return out, out_inverted
+
+    def with_delta(self, *args, **kwargs):
+        raise ValueError("catalog deltas are not supported with sharded scoring; reload the catalog instead")
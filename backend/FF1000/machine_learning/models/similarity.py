@@ -1,6 +1,9 @@
+import copy
 import numpy as np
 from sklearn.base import BaseEstimator
 
+from machine_learning.models.growable import GrowableRows, retired_mask_after
+
 
 class SimilarityRecommender(BaseEstimator):
     def __init__(self,
@@ -8,9 +11,19 @@ class SimilarityRecommender(BaseEstimator):
                  mask_value: float = -np.inf):
 
         E = np.asarray(item_embeddings, dtype=np.float64)
-        self.item_embeddings = E / np.linalg.norm(E, axis=1, keepdims=True)
+        self._rows = GrowableRows(self._normalize(E))
         self.N_, self.d_ = self.item_embeddings.shape
         self.mask_value = mask_value
+        self.retired_ = np.zeros(self.N_, dtype=bool)
+        self._retired_idx = np.empty(0, dtype=np.intp)
+
+    @staticmethod
+    def _normalize(E):
+        return E / np.linalg.norm(E, axis=1, keepdims=True)
+
+    @property
+    def item_embeddings(self):
+        return self._rows.rows
 
     def fit(self, X=None, y=None):
         return self
@@ -21,4 +34,19 @@ class SimilarityRecommender(BaseEstimator):
         U /= np.linalg.norm(U, axis=1, keepdims=True)
         scores = U @ self.item_embeddings.T
         scores[X != 0] = self.mask_value
+        scores[:, self._retired_idx] = self.mask_value
         return scores
+
+    def with_delta(self, new_embeddings=None, update_idx=(), update_embeddings=None, retire_idx=()):
+        # Copy with rows appended, overwritten or retired. Only the touched rows are
+        # normalised; retired items stay in place and are masked out of the scores.
+        out = copy.copy(self)
+        if len(update_idx):
+            update_embeddings = self._normalize(np.asarray(update_embeddings, dtype=np.float64))
+            out._rows = out._rows.overwritten(update_idx, update_embeddings)
+        if new_embeddings is not None and len(new_embeddings):
+            out._rows = out._rows.appended(self._normalize(np.asarray(new_embeddings, dtype=np.float64)))
+        out.N_ = out._rows.n
+        out.retired_ = retired_mask_after(self.retired_, out.N_, update_idx, retire_idx)
+        out._retired_idx = np.flatnonzero(out.retired_)
+        return out
@@ -1,21 +1,37 @@
+import copy
 import numpy as np
 from sklearn.base import BaseEstimator, TransformerMixin
-from sklearn.preprocessing import MultiLabelBinarizer
 
 
 class ItemIdOneHotEncoder(BaseEstimator, TransformerMixin):
     def __init__(self, all_item_ids):
         self.all_item_ids = list(all_item_ids)
-        self._mlb = MultiLabelBinarizer(classes=self.all_item_ids)
+        self._index = {item_id: i for i, item_id in enumerate(self.all_item_ids)}
 
     def fit(self, X, y=None):
-        self._mlb.fit([[]])
         return self
 
     def transform(self, X):
-        M = self._mlb.transform(X).astype(np.float64)
+        # Multi-hot rows over the catalog; unknown ids are ignored
+        M = np.zeros((len(X), len(self.all_item_ids)), dtype=np.float64)
+        for b, items in enumerate(X):
+            cols = [self._index[item] for item in items if item in self._index]
+            M[b, cols] = 1.0
         return M
 
+    def with_items(self, new_item_ids):
+        # Copy with new ids appended at the end; the existing columns keep their index
+        out = copy.copy(self)
+        out.all_item_ids = self.all_item_ids + list(new_item_ids)
+        out._index = dict(self._index)
+        for i, item_id in enumerate(new_item_ids, start=len(self.all_item_ids)):
+            out._index[item_id] = i
+        return out
+
+    @property
+    def index_(self):
+        return self._index
+
     @property
     def vocab_(self):
         return self.all_item_ids
@@ -0,0 +1,78 @@
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.decomposition import TruncatedSVD
+from sklearn.random_projection import GaussianRandomProjection
+
+
+class EmbeddingProjection(BaseEstimator, TransformerMixin):
+    # Maps item embeddings down to n_components dimensions before they reach the
+    # Bayesian ranker, whose posterior costs O(d^3 + N·d^2) per request.
+    #   svd     truncated SVD (uncentred PCA): the best rank-k approximation of the item
+    #           dot products, which is all the ranker's linear model sees
+    #   random  Gaussian random projection: no fitting cost, dot products preserved
+    #           only in expectation
+    METHODS = ("svd", "random")
+
+    def __init__(self, n_components: int = 256, method: str = "svd", random_state: int = 0):
+        self.n_components = n_components
+        self.method = method
+        self.random_state = random_state
+
+    def fit(self, X, y=None):
+        X = np.asarray(X, dtype=np.float64)
+        if self.method not in self.METHODS:
+            raise ValueError(f"Unknown projection {self.method!r}; valid: {list(self.METHODS)}")
+        if not 0 < self.n_components < X.shape[1]:
+            raise ValueError(f"n_components must be in [1, {X.shape[1] - 1}], got {self.n_components}")
+
+        if self.method == "svd":
+            self.reducer_ = TruncatedSVD(self.n_components, algorithm="randomized", random_state=self.random_state)
+        else:
+            self.reducer_ = GaussianRandomProjection(self.n_components, random_state=self.random_state)
+        self.reducer_.fit(X)
+        self.n_features_in_ = X.shape[1]
+        # Share of the embeddings' energy kept (svd only)
+        self.explained_variance_ = (
+            float(self.reducer_.explained_variance_ratio_.sum()) if self.method == "svd" else None
+        )
+        return self
+
+    def transform(self, X):
+        return self.reducer_.transform(np.asarray(X, dtype=np.float64))
+
+    def describe(self):
+        return {
+            "method": self.method,
+            "n_components": self.n_components,
+            "n_features": self.n_features_in_,
+            "explained_variance": self.explained_variance_,
+        }
+
+
+def ranking_agreement(full_ranker, reduced_ranker, n_seeds: int = 20, k: int = 10, random_state: int = 0):
+    # How much of the full-dimension top-k the reduced ranker keeps, over single-seed
+    # requests for random catalog items: mean / min share of the full top-k that also
+    # appears in the reduced top-k, and how often the top-1 item is the same.
+    rng = np.random.default_rng(random_state)
+    n_items = full_ranker.N_
+    seeds = rng.choice(n_items, size=min(n_seeds, n_items), replace=False)
+    k = min(k, n_items - 1)
+
+    overlaps, top1 = [], []
+    for seed in seeds:
+        X = np.zeros((1, n_items))
+        X[0, seed] = 1.0
+        full = full_ranker.transform(X)[0]
+        reduced = reduced_ranker.transform(X)[0]
+        full_top = np.argsort(-full)[:k]
+        reduced_top = np.argsort(-reduced)[:k]
+        overlaps.append(len(np.intersect1d(full_top, reduced_top)) / k)
+        top1.append(full_top[0] == reduced_top[0])
+
+    return {
+        "k": int(k),
+        "n_seeds": int(len(seeds)),
+        "overlap_mean": float(np.mean(overlaps)),
+        "overlap_min": float(np.min(overlaps)),
+        "top1_match": float(np.mean(top1)),
+    }
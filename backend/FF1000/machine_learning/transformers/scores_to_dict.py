@@ -1,40 +1,112 @@
+import copy
 import numpy as np
 from sklearn.base import BaseEstimator, TransformerMixin
 
 
+def _missing_to_none(values):
+    # pandas hands over NaN for missing posters/years; NaN is not valid JSON
+    return [None if v is None or v != v else v for v in values]
+
+
+def _clean_posters(posters, n):
+    return _missing_to_none(posters) if posters is not None else [None] * n
+
+
+def _clean_premiere_years(premiere_years, n):
+    if premiere_years is None:
+        return [None] * n
+    return [None if y is None else int(y) for y in _missing_to_none(premiere_years)]
+
+
+def _as_object_array(values):
+    out = np.empty(len(values), dtype=object)
+    out[:] = values
+    return out
+
+
 class ScoresToDict(BaseEstimator, TransformerMixin):
+    FIELDS = ("item_ids", "titles", "posters", "premiere_years", "scores")
+
     def __init__(self, item_ids, titles, posters=None, premiere_years=None):
         self.item_ids = list(item_ids)
         self.titles = list(titles)
-        self.posters = list(posters) if posters is not None else [None] * len(item_ids)
-        self.premiere_years = list(premiere_years) if premiere_years is not None else [None] * len(item_ids)
+        self.posters = _clean_posters(posters, len(self.item_ids))
+        self.premiere_years = _clean_premiere_years(premiere_years, len(self.item_ids))
+        self._build_columns()
+
+    def _build_columns(self):
+        # Object arrays so top-k columns are gathered with one fancy index
+        self._item_ids = _as_object_array(self.item_ids)
+        self._titles = _as_object_array(self.titles)
+        self._posters = _as_object_array(self.posters)
+        self._premiere_years = _as_object_array(self.premiere_years)
 
     def fit(self, X, y=None):
         return self
 
-    def transform(self, scores_matrix):
-        scores_matrix = np.asarray(scores_matrix, dtype=np.float64)
-        B, N = scores_matrix.shape
-        out = []
-        for b in range(B):
-            out.append({
-                "item_ids": self.item_ids,
-                "scores": scores_matrix[b].tolist(),
-            })
+    def with_delta(self, new_item_ids=(), new_titles=(), new_posters=None, new_premiere_years=None,
+                   update_idx=(), update_titles=(), update_posters=None, update_premiere_years=None):
+        # Copy with items appended and metadata of existing items replaced; the item
+        # order stays aligned with the encoder and the ranker buffers.
+        out = copy.copy(self)
+        out.item_ids = self.item_ids + list(new_item_ids)
+        out.titles = self.titles + list(new_titles)
+        out.posters = self.posters + _clean_posters(new_posters, len(new_item_ids))
+        out.premiere_years = self.premiere_years + _clean_premiere_years(new_premiere_years, len(new_item_ids))
+
+        update_posters = _clean_posters(update_posters, len(update_idx))
+        update_premiere_years = _clean_premiere_years(update_premiere_years, len(update_idx))
+        for i, title, poster, year in zip(update_idx, update_titles, update_posters, update_premiere_years):
+            out.titles[i] = title
+            out.posters[i] = poster
+            out.premiere_years[i] = year
+
+        out._build_columns()
         return out
 
-    def predict(self, scores_matrix, limit=10):
+    @staticmethod
+    def _top_k(scores, limit):
+        if limit >= scores.shape[0]:
+            return np.argsort(-scores)
+        idx = np.argpartition(-scores, limit)[:limit]
+        return idx[np.argsort(-scores[idx])]   # descending top-k
+
+    def _check_fields(self, fields):
+        fields = self.FIELDS if fields is None else fields
+        unknown = set(fields) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields {sorted(unknown)}; valid fields: {list(self.FIELDS)}")
+        return fields
+
+    def gather(self, idx, scores, fields=None, as_arrays=False):
+        # Columns of the items at catalog rows `idx` (already ranked), with their scores.
+        # Masked items (seeds, retired items) score -inf and are left out, so a limit
+        # beyond the unmasked items returns fewer rows rather than non-finite scores.
+        fields = self._check_fields(fields)
+        finite = np.isfinite(scores)
+        if not finite.all():
+            idx, scores = idx[finite], scores[finite]
+        columns_by_field = {
+            "item_ids": self._item_ids,
+            "titles": self._titles,
+            "posters": self._posters,
+            "premiere_years": self._premiere_years,
+        }
+        columns = {
+            field: scores if field == "scores" else columns_by_field[field][idx]
+            for field in fields
+        }
+        if not as_arrays:
+            columns = {name: values.tolist() for name, values in columns.items()}
+        return columns
+
+    def predict(self, scores_matrix, limit=10, as_arrays=False, fields=None):
+        fields = self._check_fields(fields)
         scores_matrix = np.asarray(scores_matrix, dtype=np.float64)
         B, N = scores_matrix.shape
         out = []
         for b in range(B):
             scores = scores_matrix[b]
-            idx = np.argsort(-scores)[:limit]   # descending top-k
-            out.append({
-                "item_ids": [self.item_ids[i] for i in idx],
-                "titles": [self.titles[i] for i in idx],
-                "posters": [self.posters[i] for i in idx],
-                "premiere_years": [self.premiere_years[i] for i in idx],
-                "scores": scores[idx].tolist(),
-            })
+            idx = self._top_k(scores, limit)
+            out.append(self.gather(idx, scores[idx], fields, as_arrays))
         return out
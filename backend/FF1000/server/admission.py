@@ -0,0 +1,108 @@
+import math
+import threading
+import time
+
+from contextlib import contextmanager
+
+from server.timing import ADMISSION_DECISIONS
+
+
+class Overloaded(Exception):
+    # A request refused before any scoring: retrying it later (or elsewhere) is safe
+    def __init__(self, model, reason, retry_after=1):
+        super().__init__(f"{model} is overloaded ({reason})")
+        self.model = model
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    # Bounded in-flight work for one model in this worker: at most `concurrency`
+    # predictions score at once and at most `max_queue` more wait for a slot; anything
+    # beyond that is refused straight away. The service time per seed list is tracked as
+    # an EWMA, so a request that cannot finish before its deadline is refused up front
+    # instead of being scored for a caller that has already given up.
+    def __init__(self, model, concurrency=2, max_queue=4, initial_seconds=0.05, alpha=0.2):
+        self.model = model
+        self.concurrency = max(1, int(concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.row_seconds = float(initial_seconds)
+        self.alpha = float(alpha)
+        self._cond = threading.Condition()
+        self._running = 0
+        self._running_rows = 0
+        self._waiting = 0
+        self._waiting_rows = 0
+
+    def _estimate(self, rows):
+        # Seconds until a request of `rows` seed lists arriving now would be done
+        # (caller holds the lock). Requests being scored are on average half done.
+        backlog = self._waiting_rows
+        if self._running >= self.concurrency:
+            backlog += self._running_rows / 2
+        return self.row_seconds * (backlog / self.concurrency + rows)
+
+    def _refuse(self, reason, rows):
+        ADMISSION_DECISIONS.labels(self.model, reason).inc()
+        retry_after = max(1, math.ceil(self._estimate(rows)))
+        raise Overloaded(self.model, reason, retry_after)
+
+    def fits(self, rows, deadline):
+        # Would a request admitted now finish in time (and not find the queue full)?
+        with self._cond:
+            if self._running >= self.concurrency and self._waiting >= self.max_queue:
+                return False
+            return deadline is None or time.monotonic() + self._estimate(rows) <= deadline
+
+    def queued(self):
+        with self._cond:
+            return self._waiting
+
+    @contextmanager
+    def slot(self, rows=1, deadline=None):
+        # deadline: a time.monotonic() value, or None to only bound the queue
+        with self._cond:
+            if deadline is not None and time.monotonic() + self._estimate(rows) > deadline:
+                self._refuse("deadline", rows)
+            if self._running >= self.concurrency:
+                if self._waiting >= self.max_queue:
+                    self._refuse("queue_full", rows)
+                self._waiting += 1
+                self._waiting_rows += rows
+                try:
+                    while self._running >= self.concurrency:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                    self._waiting_rows -= rows
+                # Out of the queue: only score if the result can still be delivered
+                if deadline is not None and time.monotonic() + self.row_seconds * rows > deadline:
+                    self._cond.notify()
+                    self._refuse("expired", rows)
+            self._running += 1
+            self._running_rows += rows
+        ADMISSION_DECISIONS.labels(self.model, "admitted").inc()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._cond:
+                self._running -= 1
+                self._running_rows -= rows
+                self.row_seconds += self.alpha * (seconds / rows - self.row_seconds)
+                self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "running": self._running,
+                "waiting": self._waiting,
+                "concurrency": self.concurrency,
+                "max_queue": self.max_queue,
+                "row_ms": round(self.row_seconds * 1000, 3),
+            }
@@ -1,15 +1,25 @@
 import os
 import sys
+import time
 import logging
 
-from typing import Dict, Any
-from flask import Flask, request, jsonify
+from contextlib import nullcontext
+from typing import Dict
+from flask import Flask, Response, g, request, jsonify
 from werkzeug.exceptions import HTTPException
-from machine_learning.load_models import (
-    not_for_me,
-    recommended_for_you,
-    similarity,
+from machine_learning.load_models import store
+from machine_learning.transformers.scores_to_dict import ScoresToDict
+from server import profiling
+from server.admission import AdmissionGate, Overloaded
+from server.precomputed import PrecomputedResults
+from server.batching import MicroBatcher
+from server.serialization import negotiate, render
+from server.single_flight import SingleFlight
+from server.timing import (
+    ADMISSION_DECISIONS, COALESCED_REQUESTS, PRECOMPUTED_LOOKUPS, RESULT_CACHE_LOOKUPS, metrics_payload, observe,
+    server_timing_header, timed_predict,
 )
+from server.warmup import ResultStore, Warmer
 
 
 logging.basicConfig(
@@ -20,11 +30,235 @@ logging.basicConfig(
 log = logging.getLogger("ff1000-api")
 
 
-MODELS: Dict[str, Any] = {
-    "nfm": not_for_me,
-    "rfy": recommended_for_you,
-    "similarity": similarity,
-}
+MODEL_NAMES = ("nfm", "rfy", "similarity")
+
+MAX_LIMIT = 1000
+
+# Seed lists per /predict/<model>/batch request (e.g. the tiles of one rail)
+MAX_BATCH = int(os.environ.get("FF1000_MAX_BATCH", "100"))
+
+# Optional micro-batching: concurrent requests for the same model are grouped into one
+# pipeline call. Only pays off when a worker has several threads (gunicorn --threads).
+MICROBATCH = os.environ.get("FF1000_MICROBATCH", "0") == "1"
+BATCHERS: Dict[str, MicroBatcher] = {
+    name: MicroBatcher(
+        max_batch_size=int(os.environ.get("FF1000_MICROBATCH_MAX_SIZE", "32")),
+        max_wait_ms=float(os.environ.get("FF1000_MICROBATCH_MAX_WAIT_MS", "2")),
+    )
+    for name in MODEL_NAMES
+} if MICROBATCH else {}
+
+# Catalog hot reload: POST /admin/reload (needs FF1000_ADMIN_TOKEN) and/or polling the
+# embeddings file every FF1000_WATCH_CATALOG_SECONDS.
+ADMIN_TOKEN = os.environ.get("FF1000_ADMIN_TOKEN")
+WATCH_CATALOG_SECONDS = float(os.environ.get("FF1000_WATCH_CATALOG_SECONDS", "0"))
+
+# Pre-warming: results for popular seeds (FF1000_WARM_ITEMS_PATH plus the most requested
+# seeds) are computed before the instance reports ready and refreshed in the background
+WARM = os.environ.get("FF1000_WARM", "0") == "1"
+WARMER = Warmer(
+    store,
+    ResultStore(limit=int(os.environ.get("FF1000_WARM_LIMIT", "200"))),
+    models=os.environ.get("FF1000_WARM_MODELS", "similarity,rfy").split(","),
+    seeds_path=os.environ.get("FF1000_WARM_ITEMS_PATH"),
+    max_items=int(os.environ.get("FF1000_WARM_MAX_ITEMS", "1000")),
+    workers=int(os.environ.get("FF1000_WARM_WORKERS", "4")),
+    refresh_s=float(os.environ.get("FF1000_WARM_REFRESH_SECONDS", "300")),
+) if WARM else None
+
+# Offline results: single-seed predictions precomputed by machine_learning.batch_scoring,
+# memory-mapped from FF1000_PRECOMPUTED_PATH and served for the catalog version they
+# were computed on
+PRECOMPUTED_PATH = os.environ.get("FF1000_PRECOMPUTED_PATH")
+PRECOMPUTED = PrecomputedResults(
+    PRECOMPUTED_PATH, check_s=float(os.environ.get("FF1000_PRECOMPUTED_CHECK_SECONDS", "60")),
+) if PRECOMPUTED_PATH else None
+
+# Identical predictions in flight at the same time (same catalog, model, items, limit
+# and fields) are computed once and shared
+IN_FLIGHT = SingleFlight()
+
+# Admission control, per model and worker: at most FF1000_ADMIT_CONCURRENCY predictions
+# score at once and FF1000_ADMIT_QUEUE more wait; the rest, and anything that cannot
+# finish before the caller's deadline (X-Request-Deadline, unix seconds, or
+# X-Request-Timeout-Ms), is refused at once with a retryable 503. Under pressure, rfy is
+# served by the cheaper similarity ranker instead (FF1000_DEGRADE_RFY). Both are opt-in:
+# with them off, every request is scored as before, however long it has to wait.
+ADMISSION = os.environ.get("FF1000_ADMISSION", "0") == "1"
+GATES: Dict[str, AdmissionGate] = {
+    name: AdmissionGate(
+        name,
+        concurrency=int(os.environ.get("FF1000_ADMIT_CONCURRENCY", "2")),
+        max_queue=int(os.environ.get("FF1000_ADMIT_QUEUE", "4")),
+    )
+    for name in MODEL_NAMES
+} if ADMISSION else {}
+DEGRADE_RFY = ADMISSION and os.environ.get("FF1000_DEGRADE_RFY", "0") == "1"
+# rfy waiters at which new rfy requests are degraded even if they would make their deadline
+DEGRADE_QUEUE = int(os.environ.get("FF1000_DEGRADE_QUEUE", "2"))
+# Deadlines further out than this are capped (guards against clock skew with the caller)
+MAX_DEADLINE_SECONDS = float(os.environ.get("FF1000_MAX_DEADLINE_SECONDS", "60"))
+
+# Set by gunicorn.conf.py when the app is preloaded in the gunicorn master: the catalog
+# is then loaded once, before the workers fork, and shared copy-on-write.
+PRELOAD = os.environ.get("FF1000_PRELOAD", "0") == "1"
+
+
+class ApiError(Exception):
+    def __init__(self, error: str, message: str, status: int = 400, headers: Dict[str, str] = None):
+        super().__init__(message)
+        self.error = error
+        self.message = message
+        self.status = status
+        self.headers = headers or {}
+
+
+def _live_snapshot():
+    snapshot = store.current
+    if snapshot is None:
+        raise ApiError("NotReady", "models are still loading", 503, {"Retry-After": "1"})
+    return snapshot
+
+
+def _json_payload(key):
+    try:
+        payload = request.get_json(force=True, silent=False)
+    except Exception:
+        raise ApiError("InvalidJSON", "body must be valid JSON")
+
+    if not isinstance(payload, dict) or key not in payload:
+        raise ApiError("BadRequest", f"json must have key '{key}'")
+    return payload
+
+
+def _is_item_id_list(inputs):
+    # Checked before any cache or popularity lookup, which hash and sort the ids
+    return isinstance(inputs, list) and all(isinstance(item_id, str) for item_id in inputs)
+
+
+def _parse_predict_payload():
+    payload = _json_payload("items")
+    inputs = payload["items"]
+    if not _is_item_id_list(inputs):
+        raise ApiError("BadRequest", "'items' must be a list of item ids (strings)")
+
+    return inputs, _predict_params(payload)
+
+
+def _parse_batch_payload():
+    payload = _json_payload("batch")
+    batch = payload["batch"]
+    if (not isinstance(batch, list) or not 1 <= len(batch) <= MAX_BATCH
+            or not all(_is_item_id_list(inputs) for inputs in batch)):
+        raise ApiError("BadRequest", f"'batch' must be a list of 1 to {MAX_BATCH} item id lists")
+
+    return batch, _predict_params(payload)
+
+
+def _predict_params(payload):
+    limit = payload.get("limit", 10)
+    if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= MAX_LIMIT:
+        raise ApiError("BadRequest", f"'limit' must be an integer in [1, {MAX_LIMIT}]")
+
+    fields = payload.get("fields")
+    if fields is not None:
+        if not isinstance(fields, list) or not fields or not set(fields) <= set(ScoresToDict.FIELDS):
+            raise ApiError("BadRequest", f"'fields' must be a non-empty subset of {list(ScoresToDict.FIELDS)}")
+        fields = tuple(fields)
+
+    return {"limit": limit, "fields": fields, "as_arrays": True}
+
+
+def _precomputed(snapshot, model_name, batch, params):
+    # The precomputed prediction for each seed list, None where there is none
+    if PRECOMPUTED is None:
+        return [None] * len(batch)
+    start = time.perf_counter()
+    preds = [PRECOMPUTED.lookup(snapshot, model_name, inputs, params["limit"], params["fields"]) for inputs in batch]
+    hits = sum(pred is not None for pred in preds)
+    if hits:
+        PRECOMPUTED_LOOKUPS.labels(model_name, "hit").inc(hits)
+        g.timings.append(("precomputed", time.perf_counter() - start))
+    if hits < len(preds):
+        PRECOMPUTED_LOOKUPS.labels(model_name, "miss").inc(len(preds) - hits)
+    return preds
+
+
+def _deadline():
+    # The caller's deadline as a time.monotonic() value, or None if it sent none
+    now = time.monotonic()
+    try:
+        if "X-Request-Deadline" in request.headers:
+            remaining = float(request.headers["X-Request-Deadline"]) - time.time()
+        elif "X-Request-Timeout-Ms" in request.headers:
+            remaining = float(request.headers["X-Request-Timeout-Ms"]) / 1000
+        else:
+            return None
+    except ValueError:
+        raise ApiError("BadRequest", "X-Request-Deadline must be unix seconds and X-Request-Timeout-Ms milliseconds")
+    return now + min(remaining, MAX_DEADLINE_SECONDS)
+
+
+def _admitted(model_name, rows, deadline):
+    gate = GATES.get(model_name)
+    return gate.slot(rows, deadline) if gate else nullcontext()
+
+
+def _route(model_name, rows, deadline):
+    # The model that will actually score the request: rfy under pressure (a queue is
+    # building, or it would miss the deadline) goes to similarity if that one can make it
+    if model_name != "rfy" or not DEGRADE_RFY:
+        return model_name
+    if deadline is not None and deadline <= time.monotonic():
+        return model_name  # refused by the gate anyway
+    rfy = GATES["rfy"]
+    if rfy.queued() < DEGRADE_QUEUE and rfy.fits(rows, deadline):
+        return model_name
+    if not GATES["similarity"].fits(rows, deadline):
+        return model_name
+    ADMISSION_DECISIONS.labels(model_name, "degraded").inc()
+    g.degraded_to = "similarity"
+    return "similarity"
+
+
+def _timed_render(payload, snapshot):
+    start = time.perf_counter()
+    payload["catalog_version"] = snapshot.version
+    if g.degraded_to:
+        payload["degraded_to"] = g.degraded_to
+    response = render(payload, negotiate(request.accept_mimetypes))
+    response.headers["X-Catalog-Version"] = snapshot.version
+    if g.degraded_to:
+        response.headers["X-Degraded-To"] = g.degraded_to
+    g.timings.append(("serialize", time.perf_counter() - start))
+    return response
+
+
+def _require_admin():
+    if not ADMIN_TOKEN:
+        raise ApiError("Forbidden", "admin endpoints are disabled (FF1000_ADMIN_TOKEN is not set)", 403)
+    if request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        raise ApiError("Unauthorized", "missing or invalid X-Admin-Token", 401)
+
+
+def _rfy_projection(snapshot):
+    projection = snapshot and snapshot.models["rfy"].named_steps["ranker"].projection
+    if projection is None:
+        return None
+    return {**projection.describe(), "agreement": getattr(projection, "agreement_", None)}
+
+
+def _catalog_status():
+    snapshot = store.current
+    return {
+        "catalog_version": snapshot.version if snapshot else None,
+        "n_items": snapshot.n_items if snapshot else None,
+        "n_retired": snapshot.n_retired if snapshot else None,
+        "rfy_projection": _rfy_projection(snapshot),
+        "loaded_at": snapshot.loaded_at if snapshot else None,
+        "reloading": store.reloading,
+        "last_error": store.last_error,
+    }
 
 
 def create_app() -> Flask:
@@ -37,37 +271,256 @@ def create_app() -> Flask:
         log.exception("Unhandled exception")
         return jsonify(error="InternalServerError", message=str(e)), 500
 
+    @app.errorhandler(ApiError)
+    def handle_api_error(e):
+        return jsonify(error=e.error, message=e.message), e.status, e.headers
+
+    @app.errorhandler(Overloaded)
+    def handle_overloaded(e):
+        headers = {"Retry-After": str(e.retry_after), "X-Load-Shed": e.reason}
+        return jsonify(error="Overloaded", message=str(e)), 503, headers
+
+    # Registered before the timing hooks: Flask runs after_request hooks in reverse, so
+    # the profiled response is built once Server-Timing has been set
+    @app.before_request
+    def start_profiler():
+        g.profiler = None
+        if request.endpoint in ("predict", "predict_joint") and profiling.requested(request):
+            g.profiler = profiling.StackSampler().start()
+
+    @app.after_request
+    def finish_profiler(response):
+        sampler = getattr(g, "profiler", None)
+        if sampler is None:
+            return response
+        sampler.stop()
+        log.info("profiled %s: %d samples over %.1f ms", request.path, sampler.samples, sampler.duration * 1000)
+        if profiling.PROFILE_DIR:
+            response.headers["X-Profile-File"] = profiling.save(sampler, request.endpoint)
+            return response
+        # No profile directory configured: return the collapsed stacks instead of the body
+        profiled = Response(sampler.collapsed(), mimetype="text/plain")
+        profiled.headers["X-Profile-Original-Status"] = str(response.status_code)
+        profiled.headers["Server-Timing"] = response.headers.get("Server-Timing", "")
+        return profiled
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        g.timings = []
+        g.model_name = ""
+        g.degraded_to = None
+
+    @app.after_request
+    def report_timings(response):
+        if request.endpoint in ("healthz", "readyz", "metrics", "catalog_status", "admission_status",
+                                "precomputed_status") or not hasattr(g, "request_start"):
+            return response
+        total = time.perf_counter() - g.request_start
+        timings = g.timings + [("total", total)]
+        response.headers["Server-Timing"] = server_timing_header(timings)
+        observe(request.endpoint or "unknown", g.model_name, response.status_code, g.timings, total)
+        return response
+
     @app.get("/health")
     def healthz():
+        # Liveness: the process is up, whether or not the models are loaded yet
         return jsonify(status="ok")
 
+    @app.get("/ready")
+    def readyz():
+        # Readiness: only route traffic here once a catalog is loaded
+        snapshot = store.current
+        if snapshot is None:
+            return jsonify(status="loading", last_error=store.last_error), 503
+        if WARMER and not WARMER.ready:
+            return jsonify(status="warming", catalog_version=snapshot.version), 503
+        return jsonify(status="ready", catalog_version=snapshot.version, n_items=snapshot.n_items)
+
+    @app.get("/admin/catalog")
+    def catalog_status():
+        _require_admin()
+        return jsonify(_catalog_status())
+
+    @app.get("/admin/precomputed")
+    def precomputed_status():
+        _require_admin()
+        return jsonify(path=PRECOMPUTED_PATH, results=PRECOMPUTED.stats() if PRECOMPUTED else None)
+
+    @app.get("/admin/admission")
+    def admission_status():
+        # Per-model admission state of the worker that answers
+        _require_admin()
+        return jsonify(enabled=ADMISSION, degrade_rfy=DEGRADE_RFY, pid=os.getpid(),
+                       models={name: gate.stats() for name, gate in GATES.items()})
+
+    @app.post("/admin/reload")
+    def reload_catalog():
+        # Builds the new catalog in the background; the current one keeps serving until
+        # the swap. Poll /admin/catalog to see the new version.
+        _require_admin()
+        _live_snapshot()
+        started = store.reload_async()
+        return jsonify(started=started, **_catalog_status()), 202
+
+    @app.post("/admin/catalog/delta")
+    def catalog_delta():
+        # Add, update or retire items in place, without a full catalog rebuild
+        _require_admin()
+        payload = request.get_json(force=True, silent=True)
+        if not isinstance(payload, dict):
+            raise ApiError("InvalidJSON", "body must be a JSON object")
+
+        upserts = payload.get("upsert", [])
+        retired_ids = payload.get("retire", [])
+        if not isinstance(upserts, list) or not all(
+            isinstance(item, dict) and {"item_id", "title", "embedding"} <= item.keys() for item in upserts
+        ):
+            raise ApiError("BadRequest", "'upsert' must be a list of objects with item_id, title and embedding")
+        if not isinstance(retired_ids, list):
+            raise ApiError("BadRequest", "'retire' must be a list of item ids")
+
+        _live_snapshot()
+        try:
+            store.apply_delta(upserts, retired_ids)
+        except ValueError as e:
+            raise ApiError("BadRequest", str(e))
+        return jsonify(_catalog_status())
+
+    @app.get("/metrics")
+    def metrics():
+        return Response(metrics_payload(), mimetype="text/plain; version=0.0.4")
+
     @app.post("/predict/<model_name>")
     def predict(model_name: str):
-        if model_name not in MODELS:
-            return jsonify(error="UnknownModel", message=f"valid models: {list(MODELS.keys())}"), 400
+        if model_name not in MODEL_NAMES:
+            return jsonify(error="UnknownModel", message=f"valid models: {list(MODEL_NAMES)}"), 400
+
+        g.model_name = model_name
+        inputs, params = _parse_predict_payload()
+        deadline = _deadline()
+        snapshot = _live_snapshot()
+
+        pred = _precomputed(snapshot, model_name, [inputs], params)[0]
+        if pred is not None:
+            return _timed_render({"model": model_name, "predictions": [pred]}, snapshot)
 
+        if WARMER and model_name in WARMER.models:
+            WARMER.record(inputs)
+            start = time.perf_counter()
+            cached = WARMER.results.lookup(snapshot.version, model_name, inputs, params["limit"], params["fields"])
+            RESULT_CACHE_LOOKUPS.labels(model_name, "miss" if cached is None else "hit").inc()
+            if cached is not None:
+                g.timings.append(("result_cache", time.perf_counter() - start))
+                return _timed_render({"model": model_name, "predictions": [cached]}, snapshot)
+
+        served = _route(model_name, 1, deadline)
+        model = snapshot.models[served]
+
+        def compute():
+            # Only the caller that computes takes an admission slot; identical requests
+            # coalesced onto it just wait for its result
+            with _admitted(served, 1, deadline):
+                if served in BATCHERS:
+                    start = time.perf_counter()
+                    pred, timings = BATCHERS[served].predict(model, inputs, **params)
+                    waited = time.perf_counter() - start - sum(seconds for _, seconds in timings)
+                    return [pred], [("batch_wait", max(waited, 0.0))] + timings
+                return timed_predict(model, [inputs], **params)
+
+        key = (snapshot.version, served, tuple(inputs), params["limit"], params["fields"])
         try:
-            payload = request.get_json(force=True, silent=False)
-        except Exception:
-            return jsonify(error="InvalidJSON", message="body must be valid JSON"), 400
+            start = time.perf_counter()
+            (preds, timings), shared = IN_FLIGHT.do(key, compute)
+            if shared:
+                COALESCED_REQUESTS.labels(model_name).inc()
+                timings = [("coalesced_wait", time.perf_counter() - start)]
+            g.timings.extend(timings)
+        except Overloaded:
+            raise
+        except Exception as e:
+            log.exception("Prediction failed")
+            return jsonify(error="PredictionError", message=str(e)), 500
+
+        return _timed_render({"model": model_name, "predictions": preds}, snapshot)
+
+    @app.post("/predict/<model_name>/batch")
+    def predict_batch(model_name: str):
+        # Several independent seed lists (e.g. every tile of a rail) ranked in one
+        # pipeline call; predictions come back in the order of 'batch'
+        if model_name not in MODEL_NAMES:
+            return jsonify(error="UnknownModel", message=f"valid models: {list(MODEL_NAMES)}"), 400
+
+        g.model_name = model_name
+        batch, params = _parse_batch_payload()
+        deadline = _deadline()
+        snapshot = _live_snapshot()
+
+        # Precomputed seed lists are answered from the files; only the rest is scored
+        preds = _precomputed(snapshot, model_name, batch, params)
+        missing = [i for i, pred in enumerate(preds) if pred is None]
+        if missing:
+            served = _route(model_name, len(missing), deadline)
+            try:
+                with _admitted(served, len(missing), deadline):
+                    computed, timings = timed_predict(snapshot.models[served], [batch[i] for i in missing], **params)
+            except Overloaded:
+                raise
+            except Exception as e:
+                log.exception("Prediction failed")
+                return jsonify(error="PredictionError", message=str(e)), 500
+            g.timings.extend(timings)
+            for i, pred in zip(missing, computed):
+                preds[i] = pred
 
-        if not isinstance(payload, dict) or "items" not in payload:
-            return jsonify(error="BadRequest", message="json must have key 'items'"), 400
+        return _timed_render({"model": model_name, "predictions": preds}, snapshot)
 
-        inputs = payload["items"]
-        if not isinstance(inputs, list):
-            return jsonify(error="BadRequest", message="'items' must be a list"), 400
+    @app.post("/predict-joint")
+    def predict_joint():
+        # rfy and nfm share one posterior, so both rankings cost one model evaluation
+        g.model_name = "rfy+nfm"
+        inputs, params = _parse_predict_payload()
+        deadline = _deadline()
+        snapshot = _live_snapshot()
+
+        rfy_pred = _precomputed(snapshot, "rfy", [inputs], params)[0]
+        nfm_pred = _precomputed(snapshot, "nfm", [inputs], params)[0] if rfy_pred is not None else None
+        if nfm_pred is not None:
+            return _timed_render({"model": "rfy+nfm", "predictions": {"rfy": [rfy_pred], "nfm": [nfm_pred]}}, snapshot)
 
-        model = MODELS[model_name]
         try:
-            preds = model.predict([inputs])
+            # Not degraded: similarity has no counterpart to the nfm ranking
+            with _admitted("rfy", 1, deadline):
+                rfy_preds, nfm_preds = snapshot.predict_rfy_and_nfm([inputs], timings=g.timings, **params)
+        except Overloaded:
+            raise
         except Exception as e:
             log.exception("Prediction failed")
             return jsonify(error="PredictionError", message=str(e)), 500
 
-        return jsonify(model=model_name, predictions=preds)
+        return _timed_render({"model": "rfy+nfm", "predictions": {"rfy": rfy_preds, "nfm": nfm_preds}}, snapshot)
 
     return app
 
 
+def start_background_tasks():
+    # Threads don't survive fork, so under --preload gunicorn.conf.py calls this again
+    # in every worker (post_fork)
+    if WATCH_CATALOG_SECONDS > 0 and store.catalog_path():
+        store.watch(store.catalog_path(), WATCH_CATALOG_SECONDS)
+    if WARMER:
+        WARMER.start()
+
+
 app = create_app()
+
+if PRELOAD:
+    # Gunicorn master: load (and warm) synchronously so the workers fork with the models
+    # and the warmed results in memory
+    store.load()
+    if WARMER:
+        WARMER.warm()
+else:
+    # Each worker loads in the background and answers /ready with 503 until done
+    store.reload_async()
+    start_background_tasks()
@@ -0,0 +1,88 @@
+import logging
+import queue
+import threading
+import time
+
+from concurrent.futures import Future
+
+from server.timing import timed_predict
+
+
+log = logging.getLogger("ff1000-api")
+
+
+class MicroBatcher:
+    # Collects concurrent predict calls for one model for up to `max_wait_ms` (or until
+    # `max_batch_size` rows are queued), runs them as one `model.predict` and hands each
+    # caller its own row back, together with the batch's stage timings. Rows for
+    # different model instances (e.g. across a catalog reload) or with different
+    # predict params go in separate calls.
+
+    def __init__(self, max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = float(max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Started lazily so the thread is created in the worker that serves requests,
+        # not in a gunicorn master that forks after import.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="microbatcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, model, row, **params) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((model, row, params, future))
+        return future
+
+    def predict(self, model, row, **params):
+        return self.submit(model, row, **params).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+
+            groups = {}
+            for model, row, params, future in batch:
+                key = (id(model), repr(sorted(params.items())))
+                groups.setdefault(key, (model, params, []))[2].append((row, future))
+
+            for model, params, entries in groups.values():
+                self._dispatch(model, params, entries)
+
+    def _dispatch(self, model, params, entries):
+        try:
+            preds, timings = timed_predict(model, [row for row, _ in entries], **params)
+        except Exception as e:
+            if len(entries) == 1:
+                entries[0][1].set_exception(e)
+                return
+            # One bad row must not fail the requests that happened to share its batch:
+            # run them one at a time, so only the offending caller gets the error
+            log.warning("microbatch of %d failed (%s); retrying its rows one by one", len(entries), e)
+            for entry in entries:
+                self._dispatch(model, params, [entry])
+            return
+
+        log.debug("microbatch size=%d", len(entries))
+        for (_, future), pred in zip(entries, preds):
+            future.set_result((pred, timings))
@@ -0,0 +1,96 @@
+import logging
+import os
+import threading
+import time
+import numpy as np
+
+from machine_learning.batch_scoring import MANIFEST, projection_spec, read_manifest
+
+
+log = logging.getLogger("ff1000-precomputed")
+
+
+class _Table:
+    # One finished batch_scoring run, memory-mapped read-only
+    def __init__(self, path, manifest):
+        self.manifest = manifest
+        self.catalog_version = manifest["catalog_version"]
+        self.top_k = manifest["top_k"]
+        self.rfy_projection = manifest["rfy_projection"]
+        shape = (manifest["n_seeds"], self.top_k)
+        self.rows = {}
+        self.scores = {}
+        for model, files in manifest["files"].items():
+            self.rows[model] = np.memmap(os.path.join(path, files["rows"]), dtype="<u4", mode="r", shape=shape)
+            self.scores[model] = np.memmap(os.path.join(path, files["scores"]), dtype="<f4", mode="r", shape=shape)
+        seeds = np.fromfile(os.path.join(path, manifest["seeds"]), dtype="<u4")
+        # Catalog row -> result row, -1 for items that were not scored
+        self.position = np.full(manifest["n_items"], -1, dtype=np.int64)
+        self.position[seeds] = np.arange(len(seeds))
+
+
+class PrecomputedResults:
+    # Serves single-seed predictions from the top-k files of machine_learning.batch_scoring.
+    # Only requests it can answer exactly are hits: one seed that was scored, a limit up
+    # to the run's top_k, and the very catalog version (and rfy projection) the run was
+    # computed on; after a reload or a delta every lookup misses until the next run. The
+    # manifest is re-checked every `check_s` seconds, so a new run is picked up without
+    # a restart.
+    def __init__(self, path, check_s=60.0):
+        self.path = path
+        self.check_s = check_s
+        self._table = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh()
+
+    def _refresh(self):
+        manifest_path = os.path.join(self.path, MANIFEST)
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            table = _Table(self.path, read_manifest(self.path))
+        except (OSError, ValueError, KeyError) as e:
+            log.error("cannot load precomputed results from %s: %s", self.path, e)
+            return
+        self._table, self._mtime = table, mtime
+        log.info("precomputed results for catalog %s: top-%d of %d seeds (%s)", table.catalog_version,
+                 table.top_k, table.manifest["n_seeds"], ", ".join(table.rows))
+
+    def _current(self):
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_s and self._lock.acquire(blocking=False):
+            try:
+                self._checked_at = now
+                self._refresh()
+            finally:
+                self._lock.release()
+        return self._table
+
+    def lookup(self, snapshot, model_name, inputs, limit, fields=None):
+        table = self._current()
+        if (table is None or len(inputs) != 1 or not isinstance(inputs[0], str)
+                or snapshot.version != table.catalog_version or limit > table.top_k or model_name not in table.rows):
+            return None
+        pipeline = snapshot.models[model_name]
+        if model_name != "similarity" and projection_spec(pipeline.named_steps["ranker"].projection) != table.rfy_projection:
+            return None
+
+        row = pipeline.named_steps["encoder"].index_.get(inputs[0])
+        if row is None or row >= len(table.position) or table.position[row] < 0:
+            return None
+        pos = table.position[row]
+        idx = np.asarray(table.rows[model_name][pos, :limit], dtype=np.intp)
+        scores = np.asarray(table.scores[model_name][pos, :limit], dtype=np.float64)
+        return pipeline.named_steps["scores_to_dict"].gather(idx, scores, fields, as_arrays=True)
+
+    def stats(self):
+        table = self._table
+        if table is None:
+            return None
+        return {key: table.manifest[key] for key in ("catalog_version", "n_seeds", "models", "top_k", "created_at")}
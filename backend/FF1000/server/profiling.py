@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+import time
+import uuid
+
+from collections import Counter
+
+
+# Off unless the operator opts in; the per-request flag alone does nothing
+ENABLED = os.environ.get("FF1000_PROFILING", "0") == "1"
+PROFILE_DIR = os.environ.get("FF1000_PROFILE_DIR")
+INTERVAL_MS = float(os.environ.get("FF1000_PROFILE_INTERVAL_MS", "1"))
+
+
+_switch_lock = threading.Lock()
+_active = 0
+_saved_switch_interval = None
+
+
+def _raise_sampling_priority(interval):
+    # A CPU-bound request thread only yields the GIL every switch interval (5 ms by
+    # default), which would starve the sampler; shorten it while any profile is running.
+    global _active, _saved_switch_interval
+    with _switch_lock:
+        if _active == 0:
+            _saved_switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(min(_saved_switch_interval, interval))
+        _active += 1
+
+
+def _restore_sampling_priority():
+    global _active
+    with _switch_lock:
+        _active -= 1
+        if _active == 0:
+            sys.setswitchinterval(_saved_switch_interval)
+
+
+def requested(req) -> bool:
+    return ENABLED and (req.headers.get("X-Profile") == "1" or req.args.get("profile") == "1")
+
+
+class StackSampler:
+    # Samples the Python stacks of every thread (the micro-batcher does the work on its
+    # own thread) every `interval_ms` and counts them in collapsed-stack format:
+    # "thread;outer_fn (file:line);...;inner_fn (file:line) <count>", ready for
+    # flamegraph.pl or speedscope. NumPy/BLAS calls show up as the Python frame that
+    # called into them, since native frames are not visible from here.
+
+    def __init__(self, interval_ms: float = INTERVAL_MS):
+        self.interval = interval_ms / 1000.0
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        _raise_sampling_priority(self.interval)
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        _restore_sampling_priority()
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+def save(sampler: StackSampler, label: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{label}-{uuid.uuid4().hex[:8]}.collapsed"
+    path = os.path.join(PROFILE_DIR, name)
+    with open(path, "w") as f:
+        f.write(sampler.collapsed())
+    return path
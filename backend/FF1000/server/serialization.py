@@ -0,0 +1,62 @@
+import json
+
+import numpy as np
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+
+
+def offered_mimetypes():
+    return [JSON_MIMETYPE, MSGPACK_MIMETYPE] if msgpack is not None else [JSON_MIMETYPE]
+
+
+def negotiate(accept_mimetypes) -> str:
+    # JSON stays the default when the client sends no (or a wildcard) Accept header
+    return accept_mimetypes.best_match(offered_mimetypes(), default=JSON_MIMETYPE) or JSON_MIMETYPE
+
+
+def _to_builtin(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {k: _to_builtin(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(v) for v in value]
+    return value
+
+
+def _numeric_arrays_native(value):
+    # orjson encodes float/int ndarrays directly, but not object arrays
+    if isinstance(value, np.ndarray):
+        return value.tolist() if value.dtype == object else value
+    if isinstance(value, dict):
+        return {k: _numeric_arrays_native(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_numeric_arrays_native(v) for v in value]
+    return value
+
+
+def dumps(payload, mimetype: str = JSON_MIMETYPE) -> bytes:
+    if mimetype == MSGPACK_MIMETYPE:
+        return msgpack.packb(_to_builtin(payload), use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(_numeric_arrays_native(payload), option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(_to_builtin(payload), separators=(",", ":")).encode("utf-8")
+
+
+def render(payload, mimetype: str = JSON_MIMETYPE, status: int = 200) -> Response:
+    response = Response(dumps(payload, mimetype), status=status, mimetype=mimetype)
+    response.vary.add("Accept")
+    return response
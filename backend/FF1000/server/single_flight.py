@@ -0,0 +1,43 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Coalesces concurrent identical calls: the first caller for a key runs it, callers
+    # arriving while it is in flight wait and share its result (or its exception)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        # Returns (result, shared); shared is True when another caller did the work
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Forget the key before waking the followers, so a caller arriving now starts
+            # a fresh call instead of reading a finished one
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
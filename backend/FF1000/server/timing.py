@@ -0,0 +1,82 @@
+import json
+import logging
+import os
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess
+
+
+log = logging.getLogger("ff1000-api")
+
+# Latencies here range from sub-millisecond encodes to multi-second rfy calls
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_SECONDS = Histogram(
+    "ff1000_request_seconds", "HTTP request latency", ["endpoint", "model", "status"], buckets=BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "ff1000_stage_seconds", "Latency of each prediction stage", ["model", "stage"], buckets=BUCKETS,
+)
+COALESCED_REQUESTS = Counter(
+    "ff1000_coalesced_requests_total", "Predictions answered by an identical request already in flight", ["model"],
+)
+RESULT_CACHE_LOOKUPS = Counter(
+    "ff1000_result_cache_lookups_total", "Pre-warmed result store lookups", ["model", "outcome"],
+)
+PRECOMPUTED_LOOKUPS = Counter(
+    "ff1000_precomputed_lookups_total", "Lookups in the offline batch-scoring results", ["model", "outcome"],
+)
+ADMISSION_DECISIONS = Counter(
+    "ff1000_admission_total", "Admission control decisions (admitted, degraded or a refusal reason)", ["model", "outcome"],
+)
+
+
+def timed_predict(model, X, **params):
+    # Same as Pipeline.predict, but times every step. Models without steps (anything
+    # exposing a plain predict) are reported as a single "predict" stage.
+    steps = getattr(model, "steps", None)
+    if not steps:
+        start = time.perf_counter()
+        preds = model.predict(X, **params)
+        return preds, [("predict", time.perf_counter() - start)]
+
+    timings = []
+    Xt = X
+    for name, step in steps[:-1]:
+        start = time.perf_counter()
+        Xt = step.transform(Xt)
+        timings.append((name, time.perf_counter() - start))
+
+    name, last = steps[-1]
+    start = time.perf_counter()
+    preds = last.predict(Xt, **params)
+    timings.append((name, time.perf_counter() - start))
+    return preds, timings
+
+
+def server_timing_header(timings) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings)
+
+
+def observe(endpoint: str, model: str, status: int, timings, total_seconds: float):
+    REQUEST_SECONDS.labels(endpoint, model, str(status)).observe(total_seconds)
+    for stage, seconds in timings:
+        STAGE_SECONDS.labels(model, stage).observe(seconds)
+
+    log.info("request_timing %s", json.dumps({
+        "endpoint": endpoint,
+        "model": model,
+        "status": status,
+        "total_ms": round(total_seconds * 1000, 3),
+        "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in timings},
+    }))
+
+
+def metrics_payload() -> bytes:
+    # Under gunicorn each worker has its own registry; with PROMETHEUS_MULTIPROC_DIR set
+    # the exposition aggregates every worker's samples.
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -0,0 +1,143 @@
+import logging
+import os
+import threading
+import time
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+log = logging.getLogger("ff1000-warmup")
+
+
+def read_seed_file(path):
+    # One item_id per line; blank lines and "#" comments are ignored
+    if not path or not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def _key(model_name, inputs):
+    # Seeds are a multi-hot set for the encoder, so order and repeats don't matter
+    return model_name, tuple(sorted(set(inputs)))
+
+
+class ResultStore:
+    # Precomputed predictions for popular seed sets, all computed at `limit` with every
+    # field, for one catalog version. A request with a smaller limit or fewer fields is
+    # answered by slicing; anything else (or another catalog version) is a miss.
+    def __init__(self, limit):
+        self.limit = limit
+        self.version = None
+        self._results = {}
+
+    def lookup(self, version, model_name, inputs, limit, fields=None):
+        if version != self.version or limit > self.limit:
+            return None
+        pred = self._results.get(_key(model_name, inputs))
+        if pred is None:
+            return None
+        return {field: values[:limit] for field, values in pred.items() if fields is None or field in fields}
+
+    def replace(self, version, results):
+        # Swapped as one reference, so lookups see either the old or the new set
+        self._results, self.version = results, version
+
+    def __len__(self):
+        return len(self._results)
+
+
+class Warmer:
+    # Computes the results of the most popular single-seed requests ahead of time: the
+    # seed file plus the seeds requested most since the last refresh (counts halve at
+    # every refresh, so the list follows recent traffic). Runs once before the instance
+    # first reports ready, then again every `refresh_s` seconds and after every catalog
+    # swap, in the background: the instance keeps serving meanwhile, and results of the
+    # previous catalog version are simply not used.
+    def __init__(self, store, results: ResultStore, models, seeds_path=None, max_items=1000,
+                 workers=4, chunk_size=32, refresh_s=300.0):
+        self.store = store
+        self.results = results
+        self.models = tuple(models)
+        self.seeds_path = seeds_path
+        self.max_items = max_items
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.refresh_s = refresh_s
+        self._popular = Counter()
+        self._popular_lock = threading.Lock()
+        self._thread = None
+        self.warmed_at = None
+
+    @property
+    def ready(self) -> bool:
+        # Only the first warm-up gates readiness
+        return self.results.version is not None
+
+    def record(self, inputs):
+        if len(inputs) == 1 and isinstance(inputs[0], str):
+            with self._popular_lock:
+                self._popular[inputs[0]] += 1
+
+    def seeds(self):
+        seeds = dict.fromkeys(read_seed_file(self.seeds_path))
+        with self._popular_lock:
+            for item_id, _ in self._popular.most_common(self.max_items):
+                seeds[item_id] = None
+            for item_id in list(self._popular):
+                self._popular[item_id] //= 2
+                if not self._popular[item_id]:
+                    del self._popular[item_id]
+        return list(seeds)[:self.max_items]
+
+    def warm(self, snapshot=None):
+        # Scores the seeds in chunks (one batched predict per chunk and model) on a
+        # bounded pool, then publishes all results at once
+        snapshot = snapshot or self.store.current
+        seeds = [item_id for item_id in self.seeds() if item_id in snapshot.models["similarity"].named_steps["encoder"].index_]
+        start = time.perf_counter()
+
+        def run(model_name, chunk):
+            preds = snapshot.models[model_name].predict([[item_id] for item_id in chunk], limit=self.results.limit, as_arrays=True)
+            return [(_key(model_name, [item_id]), pred) for item_id, pred in zip(chunk, preds)]
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="warmup") as pool:
+            futures = [
+                pool.submit(run, model_name, seeds[i:i + self.chunk_size])
+                for model_name in self.models
+                for i in range(0, len(seeds), self.chunk_size)
+            ]
+            results = dict(pair for future in futures for pair in future.result())
+
+        self.results.replace(snapshot.version, results)
+        self.warmed_at = time.time()
+        log.info("warmed %d results for %d seeds (catalog %s) in %.2fs",
+                 len(results), len(seeds), snapshot.version, time.perf_counter() - start)
+        return len(results)
+
+    def start(self):
+        # Background refresh; also covers the first warm-up when the catalog itself is
+        # still loading in the background
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def run():
+            last = time.monotonic()
+            while True:
+                snapshot = self.store.current
+                due = time.monotonic() - last >= self.refresh_s
+                if snapshot is not None and (due or self.results.version != snapshot.version):
+                    try:
+                        self.warm(snapshot)
+                    except Exception:
+                        log.exception("warm-up failed")
+                        if self.results.version != snapshot.version:
+                            # Serve uncached until the next refresh rather than stay
+                            # unready (or retry every loop) forever
+                            self.results.replace(snapshot.version, {})
+                    last = time.monotonic()
+                time.sleep(0.5)
+
+        self._thread = threading.Thread(target=run, name="warmup-refresh", daemon=True)
+        self._thread.start()
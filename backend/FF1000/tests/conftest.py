@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# The server and the models import each other as top-level packages, as under gunicorn
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from machine_learning.datasets import synthetic  # noqa: E402
+from machine_learning.load_models import store  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def catalog_store():
+    # The server's own store, loaded once with a small synthetic catalog
+    store._loader_factory = lambda: synthetic.EmbeddingsDataLoader(n_items=300, n_dimensions=16)
+    store.load()
+    return store
+
+
+@pytest.fixture
+def client(catalog_store):
+    from server.api import app
+    return app.test_client()
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from server.admission import AdmissionGate, Overloaded
+
+SEED = {"items": ["synthetic-00000001"], "limit": 5}
+
+
+def test_refuses_beyond_the_queue():
+    gate = AdmissionGate("similarity", concurrency=1, max_queue=0)
+    with gate.slot():
+        with pytest.raises(Overloaded) as refused:
+            with gate.slot():
+                pass
+    assert refused.value.reason == "queue_full"
+    with gate.slot():
+        pass
+
+
+def test_refuses_what_cannot_make_the_deadline():
+    gate = AdmissionGate("similarity", initial_seconds=2.0)
+    with pytest.raises(Overloaded) as refused:
+        with gate.slot(rows=1, deadline=time.monotonic() + 0.5):
+            pass
+    assert refused.value.reason == "deadline"
+    assert refused.value.retry_after >= 2
+    assert not gate.fits(1, time.monotonic() + 0.5) and gate.fits(1, None)
+
+
+def test_drops_requests_that_expired_in_the_queue():
+    gate = AdmissionGate("similarity", concurrency=1, max_queue=1, initial_seconds=0.01)
+    refused = []
+
+    def waiter():
+        try:
+            with gate.slot(deadline=time.monotonic() + 0.1):
+                pass
+        except Overloaded as e:
+            refused.append(e.reason)
+
+    with gate.slot():
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        thread.join(5)
+    assert refused == ["expired"]
+    assert gate.stats()["waiting"] == 0
+
+
+@pytest.fixture
+def api(client, monkeypatch):
+    from server import api
+    monkeypatch.setattr(api, "WARMER", None)
+    monkeypatch.setattr(api, "PRECOMPUTED", None)
+    monkeypatch.setattr(api, "DEGRADE_RFY", True)
+    # Admission is opt-in, so the gates are installed here rather than read from the env
+    for name in api.MODEL_NAMES:
+        monkeypatch.setitem(api.GATES, name, AdmissionGate(name, initial_seconds=0.001))
+    return api
+
+
+def test_shed_request_is_a_retryable_503(client, api, monkeypatch):
+    monkeypatch.setitem(api.GATES, "similarity", AdmissionGate("similarity", initial_seconds=5.0))
+    response = client.post("/predict/similarity", json=SEED, headers={"X-Request-Timeout-Ms": "100"})
+    assert response.status_code == 503
+    assert response.get_json()["error"] == "Overloaded"
+    assert response.headers["X-Load-Shed"] == "deadline"
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_rfy_under_pressure_is_served_by_similarity(client, api, monkeypatch):
+    monkeypatch.setitem(api.GATES, "rfy", AdmissionGate("rfy", initial_seconds=5.0))
+    response = client.post("/predict/rfy", json=SEED, headers={"X-Request-Timeout-Ms": "1000"})
+    assert response.status_code == 200
+    assert response.headers["X-Degraded-To"] == "similarity"
+    assert response.get_json()["degraded_to"] == "similarity"
+
+    relaxed = client.post("/predict/rfy", json=SEED, headers={"X-Request-Timeout-Ms": "60000"})
+    assert relaxed.status_code == 200 and "X-Degraded-To" not in relaxed.headers
+
+
+def test_malformed_deadline_is_rejected(client, api):
+    response = client.post("/predict/similarity", json=SEED, headers={"X-Request-Timeout-Ms": "soon"})
+    assert response.status_code == 400
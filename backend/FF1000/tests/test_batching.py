@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from server.batching import MicroBatcher
+
+
+class _Model:
+    # Doubles each row's single value; rows holding "bad" make the whole call fail
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, X, limit=10):
+        self.calls.append(len(X))
+        if any(row == ["bad"] for row in X):
+            raise KeyError("bad")
+        return [{"value": row[0] * 2, "limit": limit} for row in X]
+
+
+def test_concurrent_rows_are_scored_in_one_call():
+    batcher, model = MicroBatcher(max_batch_size=8, max_wait_ms=200), _Model()
+    results = {}
+
+    def call(i):
+        results[i] = batcher.predict(model, [i], limit=3)[0]
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert results == {i: {"value": i * 2, "limit": 3} for i in range(4)}
+    assert len(model.calls) < 4 and sum(model.calls) == 4
+
+
+def test_rows_with_different_params_are_scored_separately():
+    batcher, model = MicroBatcher(max_batch_size=8, max_wait_ms=50), _Model()
+    futures = [batcher.submit(model, [1], limit=2), batcher.submit(model, [2], limit=5)]
+    assert [f.result(5)[0]["limit"] for f in futures] == [2, 5]
+
+
+def test_a_failing_row_only_fails_its_own_request():
+    batcher, model = MicroBatcher(max_batch_size=8, max_wait_ms=200), _Model()
+    futures = [batcher.submit(model, row) for row in ([1], ["bad"], [3])]
+    assert futures[0].result(5)[0]["value"] == 2
+    assert futures[2].result(5)[0]["value"] == 6
+    with pytest.raises(KeyError):
+        futures[1].result(5)
+    assert model.calls[0] == 3
@@ -0,0 +1,101 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from machine_learning.datasets import embeddings_binary, synthetic
+from machine_learning.load_models import ModelStore, default_loader
+
+
+def _export(path, seed=0):
+    source = synthetic.EmbeddingsDataLoader(n_items=30, n_dimensions=8, seed=seed)
+    embeddings_binary.write_catalog(str(path), source.arrow_batches(batch_rows=12))
+    with open(path / embeddings_binary.MANIFEST) as f:
+        manifest = json.load(f)
+    return [manifest["embeddings"], manifest["metadata"]]
+
+
+def test_arrow_export_round_trips(tmp_path):
+    batches = list(synthetic.EmbeddingsDataLoader(n_items=30, n_dimensions=8).arrow_batches(batch_rows=12))
+    expected = pa.Table.from_batches(batches)
+    embeddings_binary.write_catalog(str(tmp_path), batches)
+
+    loader = default_loader(str(tmp_path))
+    assert isinstance(loader, embeddings_binary.EmbeddingsDataLoader)
+    catalog, embeddings = loader.load_arrays()
+    assert list(catalog.item_id) == expected.column("item_id").to_pylist()
+    assert list(catalog.title) == expected.column("title").to_pylist()
+    assert list(catalog.poster) == expected.column("poster").to_pylist()
+    assert embeddings.dtype == np.float32 and embeddings.shape == (30, 8)
+    np.testing.assert_array_equal(embeddings, np.array(expected.column("embedding").to_pylist(), dtype=np.float32))
+
+
+def test_writer_streams_pandas_chunks(tmp_path):
+    catalog, embeddings = synthetic.make_catalog(10, 4)
+    writer = embeddings_binary.CatalogWriter(str(tmp_path))
+    writer.write(catalog.iloc[:6], embeddings[:6])
+    writer.write(catalog.iloc[6:], embeddings[6:])
+    writer.close()
+
+    loaded = embeddings_binary.EmbeddingsDataLoader(str(tmp_path)).load()
+    assert list(loaded.item_id) == list(catalog.item_id)
+    assert list(loaded.premiere_year) == list(catalog.premiere_year)
+    np.testing.assert_allclose(np.stack(loaded.embedding), embeddings.astype(np.float32))
+
+
+def test_writer_rejects_bad_chunks_and_abort_leaves_nothing(tmp_path):
+    catalog, embeddings = synthetic.make_catalog(4, 4)
+    writer = embeddings_binary.CatalogWriter(str(tmp_path))
+    writer.write(catalog, embeddings)
+    with pytest.raises(ValueError):
+        writer.write(catalog, np.zeros((4, 5)))
+    with pytest.raises(ValueError):
+        writer.write(catalog, embeddings[:3])
+    with pytest.raises(ValueError):
+        embeddings_binary.CatalogWriter(str(tmp_path / "other")).write(pd.DataFrame({"id": range(4)}), embeddings)
+    writer.abort()
+    assert os.listdir(tmp_path) == ["other"]
+    assert not embeddings_binary.is_binary_catalog(str(tmp_path))
+
+
+def test_store_serves_a_binary_catalog_and_picks_up_a_new_export(tmp_path):
+    _export(tmp_path, seed=1)
+    store = ModelStore(lambda: default_loader(str(tmp_path)))
+    first = store.load()
+    assert first.n_items == 30
+
+    source = synthetic.EmbeddingsDataLoader(n_items=40, n_dimensions=8, seed=2)
+    embeddings_binary.write_catalog(str(tmp_path), source.arrow_batches())
+    second = store.load()
+    assert second.n_items == 40 and second.version != first.version
+
+
+def test_previous_export_is_kept_until_the_next_one(tmp_path):
+    first = _export(tmp_path, seed=1)
+    second = _export(tmp_path, seed=2)
+    assert all(os.path.exists(tmp_path / name) for name in first + second)
+
+    third = _export(tmp_path, seed=3)
+    assert not any(os.path.exists(tmp_path / name) for name in first)
+    assert all(os.path.exists(tmp_path / name) for name in second + third)
+    assert sorted(os.listdir(tmp_path)) == sorted(second + third + [embeddings_binary.MANIFEST])
+
+
+def test_previous_batch_scoring_run_is_kept_until_the_next_one(tmp_path):
+    from machine_learning import batch_scoring
+
+    catalog, out = tmp_path / "catalog", tmp_path / "precomputed"
+    catalog.mkdir()
+    _export(catalog)
+    runs = []
+    for top_k in (5, 6, 7):  # different parameters, so every run starts afresh
+        batch_scoring.main([str(out), "--catalog", str(catalog), "--models", "similarity",
+                            "--top-k", str(top_k), "--workers", "0"])
+        manifest = batch_scoring.read_manifest(str(out))
+        runs.append([manifest["seeds"]] + list(manifest["files"]["similarity"].values()))
+    assert not any(os.path.exists(out / name) for name in runs[0])
+    assert all(os.path.exists(out / name) for name in runs[1] + runs[2])
+
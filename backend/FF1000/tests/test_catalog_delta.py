@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from machine_learning.datasets import synthetic
+from machine_learning.load_models import ModelStore
+
+SEED = "synthetic-00000003"
+
+
+@pytest.fixture
+def delta_store():
+    store = ModelStore(lambda: synthetic.EmbeddingsDataLoader(n_items=120, n_dimensions=8))
+    store.load()
+    return store
+
+
+def _predict(snapshot, model_name, limit=120):
+    (pred,) = snapshot.models[model_name].predict([[SEED]], limit=limit)
+    return pred
+
+
+def _upsert(item_id, seed):
+    embedding = np.random.default_rng(seed).standard_normal(8).tolist()
+    return {"item_id": item_id, "title": f"Updated {item_id}", "embedding": embedding}
+
+
+@pytest.mark.parametrize("model_name", ["rfy", "nfm", "similarity"])
+@pytest.mark.parametrize("added", [[], ["new-item"]])
+def test_older_snapshot_scores_are_unchanged_by_a_delta(delta_store, model_name, added):
+    # A first append reallocates the buffers, so also apply an update after it, when
+    # both snapshots share the buffer with spare capacity
+    before = delta_store.apply_delta([_upsert("first-new-item", 1)])
+    expected = _predict(before, model_name)
+
+    upserts = [_upsert(f"synthetic-{i:08d}", i) for i in (1, 5, 50)] + [_upsert(item_id, 7) for item_id in added]
+    after = delta_store.apply_delta(upserts, retired_ids=["synthetic-00000009"])
+    assert after is delta_store.current and after is not before
+
+    assert _predict(before, model_name) == expected
+    assert _predict(after, model_name) != expected
+    assert after.n_items == before.n_items + len(added)
+
+
+def test_delta_updates_titles_appends_and_retires(delta_store):
+    after = delta_store.apply_delta(
+        [_upsert("synthetic-00000001", 1), _upsert("new-item", 2)], retired_ids=["synthetic-00000002"]
+    )
+    pred = _predict(after, "similarity")
+    titles = dict(zip(pred["item_ids"], pred["titles"]))
+    assert titles["synthetic-00000001"] == "Updated synthetic-00000001"
+    assert "new-item" in titles
+    assert "synthetic-00000002" not in titles
+    assert SEED not in titles
+    assert after.version.endswith("+delta1") and after.n_retired == 1
+
+
+def test_retired_item_comes_back_when_upserted(delta_store):
+    retired = delta_store.apply_delta(retired_ids=["synthetic-00000002"])
+    back = delta_store.apply_delta([_upsert("synthetic-00000002", 2)])
+    assert "synthetic-00000002" not in _predict(retired, "rfy")["item_ids"]
+    assert "synthetic-00000002" in _predict(back, "rfy")["item_ids"]
+    assert back.n_retired == 0
+
+
+def test_delta_rejects_unknown_retirements_and_wrong_dimensions(delta_store):
+    with pytest.raises(ValueError):
+        delta_store.apply_delta(retired_ids=["nope"])
+    with pytest.raises(ValueError):
+        delta_store.apply_delta([{"item_id": "x", "title": "x", "embedding": [0.0] * 3}])
+
+
+def test_update_keeps_metadata_it_leaves_out(delta_store):
+    with_poster = dict(_upsert("synthetic-00000001", 1), poster="https://posters.example.com/1.jpg", premiere_year=1999)
+    delta_store.apply_delta([with_poster])
+    after = delta_store.apply_delta([dict(_upsert("synthetic-00000001", 2), title="Renamed")])
+    to_dict = after.models["similarity"].named_steps["scores_to_dict"]
+    i = after.models["similarity"].named_steps["encoder"].index_["synthetic-00000001"]
+    assert (to_dict.titles[i], to_dict.posters[i], to_dict.premiere_years[i]) == (
+        "Renamed", "https://posters.example.com/1.jpg", 1999
+    )
+
+    cleared = delta_store.apply_delta([dict(_upsert("synthetic-00000001", 3), poster=None)])
+    assert cleared.models["similarity"].named_steps["scores_to_dict"].posters[i] is None
+
+
+@pytest.mark.parametrize("upserts", [
+    [_upsert("new-item", 1), _upsert("new-item", 2)],
+    [_upsert("synthetic-00000001", 1), _upsert("synthetic-00000001", 2)],
+    [dict(_upsert("x", 1), embedding="not a list")],
+    [dict(_upsert("x", 1), embedding=[0.5] * 7 + ["0.5"])],
+    [dict(_upsert("x", 1), embedding=7)],
+    [dict(_upsert("x", 1), item_id=["x"])],
+])
+def test_delta_rejects_malformed_upserts(delta_store, upserts):
+    before = delta_store.current
+    with pytest.raises(ValueError):
+        delta_store.apply_delta(upserts)
+    assert delta_store.current is before
+
+
+def test_admin_delta_answers_400_for_a_bad_embedding(client, catalog_store, monkeypatch):
+    from server import api
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    for embedding in ("abc", 3, [[1.0]] * 16):
+        response = client.post("/admin/catalog/delta", headers={"X-Admin-Token": "secret"},
+                               json={"upsert": [{"item_id": "x", "title": "x", "embedding": embedding}]})
+        assert response.status_code == 400
+        assert response.get_json()["error"] == "BadRequest"
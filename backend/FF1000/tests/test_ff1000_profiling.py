@@ -0,0 +1,12 @@
+from server import profiling
+
+
+def test_profiled_response_keeps_server_timing(client, monkeypatch):
+    monkeypatch.setattr(profiling, "ENABLED", True)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", None)
+    response = client.post("/predict/similarity", json={"items": ["synthetic-00000001"]},
+                           headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert response.headers["X-Profile-Original-Status"] == "200"
+    assert "total;dur=" in response.headers["Server-Timing"]
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from server.single_flight import SingleFlight
+
+
+class _WatchedEvent(threading.Event):
+    # Counts the callers blocked on it, so a test knows every follower has joined the call
+    def __init__(self):
+        super().__init__()
+        self.waiting = 0
+
+    def wait(self, timeout=None):
+        self.waiting += 1
+        return super().wait(timeout)
+
+
+def _fail():
+    raise ValueError("boom")
+
+
+def _run_with_followers(flight, key, leader_fn, followers):
+    # Starts a leader blocked inside leader_fn, joins `followers` callers to its call,
+    # then lets it finish; returns what every caller got back or raised
+    started, release = threading.Event(), threading.Event()
+    outcomes = []
+
+    def fn():
+        started.set()
+        release.wait(5)
+        return leader_fn()
+
+    def call():
+        try:
+            outcomes.append(flight.do(key, fn))
+        except Exception as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    assert started.wait(5)
+    done = flight._calls[key].done = _WatchedEvent()
+    threads += [threading.Thread(target=call) for _ in range(followers)]
+    for thread in threads[1:]:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while done.waiting < followers and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight, runs = SingleFlight(), []
+
+    def work():
+        runs.append(1)
+        return "result"
+
+    outcomes = _run_with_followers(flight, "k", work, followers=4)
+    assert len(runs) == 1
+    assert sorted(outcomes, key=lambda o: o[1]) == [("result", False)] + [("result", True)] * 4
+
+
+def test_different_keys_do_not_share():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("b", lambda: 2) == (2, False)
+
+
+def test_an_error_reaches_every_waiter():
+    outcomes = _run_with_followers(SingleFlight(), "k", _fail, followers=3)
+    assert len(outcomes) == 4
+    assert all(isinstance(o, ValueError) and str(o) == "boom" for o in outcomes)
+
+
+def test_key_is_cleared_after_success_and_after_an_error():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == (1, False)
+    assert flight._calls == {}
+    assert flight.do("k", lambda: 2) == (2, False)
+
+    with pytest.raises(ValueError):
+        flight.do("k", _fail)
+    assert flight._calls == {}
+    assert flight.do("k", lambda: 3) == (3, False)
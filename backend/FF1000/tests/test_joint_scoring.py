@@ -0,0 +1,31 @@
+import pytest
+
+SEEDS = [["synthetic-00000001", "synthetic-00000005"], ["synthetic-00000010"], ["synthetic-00000042"] * 2]
+
+
+def _assert_same_ranking(joint, separate):
+    assert joint["item_ids"] == separate["item_ids"]
+    assert joint["titles"] == separate["titles"]
+    assert joint["scores"] == pytest.approx(separate["scores"], rel=1e-9, abs=1e-12)
+
+
+def test_one_posterior_matches_separate_rfy_and_nfm(catalog_store):
+    snapshot = catalog_store.current
+    timings = []
+    rfy, nfm = snapshot.predict_rfy_and_nfm(SEEDS, timings=timings, limit=50)
+    assert [stage for stage, _ in timings] == ["encoder", "ranker", "scores_to_dict"]
+
+    for joint, separate in zip(rfy, snapshot.models["rfy"].predict(SEEDS, limit=50)):
+        _assert_same_ranking(joint, separate)
+    for joint, separate in zip(nfm, snapshot.models["nfm"].predict(SEEDS, limit=50)):
+        _assert_same_ranking(joint, separate)
+
+
+def test_joint_endpoint_matches_the_single_model_endpoints(client):
+    payload = {"items": SEEDS[0], "limit": 10}
+    joint = client.post("/predict-joint", json=payload)
+    assert joint.status_code == 200
+    predictions = joint.get_json()["predictions"]
+    for model in ("rfy", "nfm"):
+        separate = client.post(f"/predict/{model}", json=payload).get_json()["predictions"][0]
+        _assert_same_ranking(predictions[model][0], separate)
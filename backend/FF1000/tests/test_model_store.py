@@ -0,0 +1,64 @@
+import threading
+import time
+
+from machine_learning.datasets import synthetic
+from machine_learning.load_models import ModelStore
+
+
+def test_concurrent_reloads_start_one_build():
+    builds = []
+    release = threading.Event()
+
+    def loader_factory():
+        builds.append(threading.current_thread().name)
+        release.wait(5)
+        return synthetic.EmbeddingsDataLoader(n_items=50, n_dimensions=8)
+
+    store = ModelStore(loader_factory)
+    start = threading.Barrier(8)
+    started = []
+
+    def reload():
+        start.wait()
+        started.append(store.reload_async())
+
+    threads = [threading.Thread(target=reload) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert started.count(True) == 1
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while store.reloading and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.ready and not store.reloading
+    assert len(builds) == 1
+    assert store.reload_async()
+
+
+def test_watcher_retries_a_failed_reload(tmp_path):
+    catalog = tmp_path / "catalog.csv"
+    attempts = []
+
+    def loader_factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("catalog is still being copied")
+        return synthetic.EmbeddingsDataLoader(n_items=50, n_dimensions=8)
+
+    store = ModelStore(loader_factory)
+    catalog.write_text("snapshot")
+    store.watch(str(catalog), interval_s=0.01)
+    # Replace the file until the watcher tries (and fails) to load it, whenever it took
+    # its first look; then leave it alone, so only a retry can load it
+    deadline = time.monotonic() + 5
+    while not attempts and time.monotonic() < deadline:
+        catalog.write_text("snapshot" * (len(catalog.read_text()) // 8 + 1))
+        time.sleep(0.02)
+
+    while not store.ready and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.ready and store.last_error is None
+    assert len(attempts) == 2
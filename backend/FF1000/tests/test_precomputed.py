@@ -0,0 +1,72 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from machine_learning.batch_scoring import FORMAT, FORMAT_VERSION, MANIFEST
+from server.precomputed import PrecomputedResults
+
+TOP_K = 3
+
+
+def _item_id(snapshot, row):
+    encoder = snapshot.models["similarity"].named_steps["encoder"]
+    return next(item_id for item_id, r in encoder.index_.items() if r == row)
+
+
+@pytest.fixture
+def results(tmp_path, catalog_store):
+    # A similarity-only run over seed rows 0 and 1: each ranks rows 10, 11, 12
+    snapshot = catalog_store.current
+    n_items = len(snapshot.models["similarity"].named_steps["encoder"].index_)
+    np.array([0, 1], dtype="<u4").tofile(tmp_path / "seeds.u32")
+    np.tile(np.array([10, 11, 12], dtype="<u4"), (2, 1)).tofile(tmp_path / "rows.u32")
+    np.tile(np.array([0.9, 0.8, 0.7], dtype="<f4"), (2, 1)).tofile(tmp_path / "scores.f32")
+    with open(tmp_path / MANIFEST, "w") as f:
+        json.dump({
+            "format": FORMAT, "version": FORMAT_VERSION, "catalog_version": snapshot.version,
+            "n_items": n_items, "n_seeds": 2, "models": ["similarity"], "top_k": TOP_K, "rfy_projection": None,
+            "seeds": "seeds.u32", "files": {"similarity": {"rows": "rows.u32", "scores": "scores.f32"}},
+            "created_at": 0,
+        }, f)
+    return PrecomputedResults(str(tmp_path))
+
+
+def test_hit_serves_the_stored_ranking(results, catalog_store):
+    snapshot = catalog_store.current
+    pred = results.lookup(snapshot, "similarity", [_item_id(snapshot, 0)], limit=2, fields=["item_ids", "scores"])
+    assert list(pred["item_ids"]) == [_item_id(snapshot, 10), _item_id(snapshot, 11)]
+    assert np.allclose(pred["scores"], [0.9, 0.8])
+
+
+def test_misses_what_the_run_cannot_answer_exactly(results, catalog_store):
+    snapshot = catalog_store.current
+    seed = _item_id(snapshot, 0)
+    assert results.lookup(snapshot, "similarity", [seed], limit=TOP_K + 1) is None
+    assert results.lookup(snapshot, "similarity", [seed, _item_id(snapshot, 1)], limit=2) is None
+    assert results.lookup(snapshot, "similarity", [_item_id(snapshot, 2)], limit=2) is None
+    assert results.lookup(snapshot, "similarity", ["not-in-the-catalog"], limit=2) is None
+    assert results.lookup(snapshot, "rfy", [seed], limit=2) is None
+
+
+def test_misses_after_the_catalog_changed(results, catalog_store):
+    snapshot = catalog_store.current
+    changed = snapshot.with_delta(retired_ids=[_item_id(snapshot, 20)])
+    assert changed.version != snapshot.version
+    assert results.lookup(changed, "similarity", [_item_id(snapshot, 0)], limit=2) is None
+
+
+def test_missing_or_foreign_manifest_serves_nothing(tmp_path, catalog_store):
+    assert PrecomputedResults(str(tmp_path)).lookup(catalog_store.current, "similarity", ["x"], limit=2) is None
+    (tmp_path / MANIFEST).write_text(json.dumps({"format": "something-else"}))
+    assert PrecomputedResults(str(tmp_path)).stats() is None
+
+
+def test_api_answers_hits_from_the_files(client, results, catalog_store, monkeypatch):
+    from server import api
+    monkeypatch.setattr(api, "PRECOMPUTED", results)
+    snapshot = catalog_store.current
+    response = client.post("/predict/similarity", json={"items": [_item_id(snapshot, 1)], "limit": 3})
+    assert response.status_code == 200
+    assert response.get_json()["predictions"][0]["item_ids"] == [_item_id(snapshot, row) for row in (10, 11, 12)]
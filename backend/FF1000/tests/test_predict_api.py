@@ -0,0 +1,43 @@
+import pytest
+
+from server.warmup import ResultStore, Warmer
+
+
+@pytest.mark.parametrize("items", [[["nested"]], [{"a": 1}], ["ok", 3], "synthetic-00000001"])
+def test_predict_rejects_items_that_are_not_item_ids(client, catalog_store, monkeypatch, items):
+    # With the result store on, which records and looks up the seeds before scoring
+    from server import api
+    monkeypatch.setattr(api, "WARMER", Warmer(catalog_store, ResultStore(limit=20), ("rfy",)))
+    response = client.post("/predict/rfy", json={"items": items})
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "BadRequest"
+
+
+def test_batch_rejects_items_that_are_not_item_ids(client):
+    response = client.post("/predict/similarity/batch", json={"batch": [["synthetic-00000001"], [["x"]]]})
+    assert response.status_code == 400
+
+
+def test_fields_and_limit_project_the_prediction(client):
+    seed = {"items": ["synthetic-00000001"]}
+    full = client.post("/predict/similarity", json={**seed, "limit": 3}).get_json()["predictions"][0]
+    assert set(full) == {"item_ids", "titles", "posters", "premiere_years", "scores"}
+    assert all(len(column) == 3 for column in full.values())
+
+    response = client.post("/predict/similarity", json={**seed, "limit": 3, "fields": ["item_ids", "scores"]})
+    assert response.status_code == 200
+    assert response.get_json()["predictions"][0] == {"item_ids": full["item_ids"], "scores": full["scores"]}
+
+    batch = {"batch": [seed["items"]] * 2, "limit": 2, "fields": ["item_ids"]}
+    batch = client.post("/predict/similarity/batch", json=batch)
+    assert batch.get_json()["predictions"] == [{"item_ids": full["item_ids"][:2]}] * 2
+
+
+@pytest.mark.parametrize("params", [
+    {"fields": []}, {"fields": ["item_ids", "ratings"]}, {"fields": "item_ids"},
+    {"limit": 0}, {"limit": 1001}, {"limit": "10"}, {"limit": True},
+])
+def test_bad_fields_or_limit_are_rejected(client, params):
+    response = client.post("/predict/similarity", json={"items": ["synthetic-00000001"], **params})
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "BadRequest"
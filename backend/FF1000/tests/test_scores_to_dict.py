@@ -0,0 +1,21 @@
+import numpy as np
+
+from machine_learning.transformers.scores_to_dict import ScoresToDict
+from server.serialization import dumps
+
+
+def _transformer(n=4):
+    return ScoresToDict([f"id{i}" for i in range(n)], [f"Title {i}" for i in range(n)])
+
+
+def test_masked_items_are_left_out_beyond_the_unmasked_ones():
+    scores = np.array([[0.5, -np.inf, 0.9, -np.inf]])
+    (result,) = _transformer().predict(scores, limit=4)
+    assert result["item_ids"] == ["id2", "id0"]
+    assert result["scores"] == [0.9, 0.5]
+
+
+def test_serialized_scores_are_all_numbers():
+    scores = np.array([[0.5, -np.inf, 0.9, -np.inf]])
+    (result,) = _transformer().predict(scores, limit=10, as_arrays=True, fields=["item_ids", "scores"])
+    assert dumps({"predictions": [result]}) == b'{"predictions":[{"item_ids":["id2","id0"],"scores":[0.9,0.5]}]}'
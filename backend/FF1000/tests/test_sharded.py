@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from machine_learning.models.rfy import BayesianRecommender
+from machine_learning.models.sharded import ShardedBayesianRecommender, ShardedSimilarityRecommender
+from machine_learning.models.similarity import SimilarityRecommender
+
+N, D, K = 400, 12, 20
+
+
+@pytest.fixture(scope="module")
+def embeddings():
+    return np.random.default_rng(0).standard_normal((N, D))
+
+
+def _requests(n):
+    rng = np.random.default_rng(1)
+    X = np.zeros((n, N))
+    for row in X:
+        row[rng.choice(N, size=3, replace=False)] = rng.choice([-1.0, 1.0], size=3)
+    return X
+
+
+def _top(scores):
+    return [tuple(np.argsort(-row)[:K]) for row in scores]
+
+
+@pytest.mark.parametrize("single_cls,sharded_cls", [
+    (SimilarityRecommender, ShardedSimilarityRecommender),
+    (BayesianRecommender, ShardedBayesianRecommender),
+])
+def test_concurrent_requests_get_their_own_top_k(embeddings, single_cls, sharded_cls):
+    X = _requests(48)
+    expected = _top(single_cls(embeddings).transform(X))
+
+    sharded = sharded_cls(embeddings, n_shards=3, top_k=K, channels=4)
+    try:
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            got = list(pool.map(lambda x: _top(sharded.transform(x[None, :]))[0], X))
+    finally:
+        sharded.shards_.close()
+    assert got == expected
+
+
+def test_shard_errors_are_raised_and_leave_the_channel_usable(embeddings):
+    sharded = ShardedSimilarityRecommender(embeddings, n_shards=2, top_k=K, channels=1)
+    try:
+        with pytest.raises(RuntimeError, match="unknown shard op"):
+            sharded.shards_.scatter_gather("nope", None)
+        X = _requests(2)
+        assert _top(sharded.transform(X)) == _top(SimilarityRecommender(embeddings).transform(X))
+    finally:
+        sharded.shards_.close()
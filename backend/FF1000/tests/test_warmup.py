@@ -0,0 +1,43 @@
+import pytest
+
+from server.warmup import ResultStore, Warmer
+
+
+class _Store:
+    def __init__(self, snapshot):
+        self.current = snapshot
+
+
+@pytest.fixture
+def warmer(catalog_store, tmp_path):
+    seeds = tmp_path / "seeds.txt"
+    seeds.write_text("synthetic-00000001\n# comment\nsynthetic-00000002\n")
+    return Warmer(_Store(catalog_store.current), ResultStore(limit=20), ("rfy", "similarity"), str(seeds))
+
+
+def test_ready_after_the_first_warm_and_through_later_catalog_swaps(warmer, catalog_store):
+    assert not warmer.ready
+    warmer.warm()
+    assert warmer.ready
+
+    version = catalog_store.current.version
+    assert warmer.results.lookup(version, "rfy", ["synthetic-00000001"], 5) is not None
+
+    # A new catalog version: still ready, but the stale results are never served
+    warmer.store.current = catalog_store.current.with_delta(retired_ids=["synthetic-00000005"])
+    assert warmer.ready
+    new_version = warmer.store.current.version
+    assert warmer.results.lookup(new_version, "rfy", ["synthetic-00000001"], 5) is None
+
+    warmer.warm()
+    assert warmer.results.lookup(new_version, "rfy", ["synthetic-00000001"], 5) is not None
+
+
+def test_lookup_slices_limit_and_fields(warmer, catalog_store):
+    warmer.warm()
+    version = catalog_store.current.version
+    full = warmer.results.lookup(version, "similarity", ["synthetic-00000002"], 20)
+    sliced = warmer.results.lookup(version, "similarity", ["synthetic-00000002"], 3, ("item_ids",))
+    assert list(sliced) == ["item_ids"]
+    assert list(sliced["item_ids"]) == list(full["item_ids"][:3])
+    assert warmer.results.lookup(version, "similarity", ["synthetic-00000002"], 21) is None
@@ -0,0 +1,92 @@
+"""
+Circuit Breaker - Fail fast while a downstream service is unhealthy
+Closed: calls go through and consecutive failures are counted. Open: calls are refused
+without touching the network. Half-open: after a cool-down a single trial call is let
+through; its outcome closes the circuit again or re-opens it
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Thread-safe three-state circuit breaker"""
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        reset_timeout: float = 10.0,
+        on_state_change: Optional[Callable[[str, str], None]] = None
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._on_state_change = on_state_change
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def _transition(self, state: str):
+        """Change state and notify (caller holds the lock)"""
+        previous, self._state = self._state, state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if previous != state and self._on_state_change:
+            self._on_state_change(previous, state)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._transition(HALF_OPEN)
+            return self._state
+
+    def allow_request(self) -> bool:
+        """
+        Decide whether a call may go out now
+
+        Returns:
+            True when closed, or for the one trial call of a half-open circuit
+        """
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._transition(HALF_OPEN)
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._transition(OPEN)
+
+    def trip(self):
+        """Open immediately, e.g. when a health probe fails"""
+        with self._lock:
+            self._trial_in_flight = False
+            self._transition(OPEN)
+
+    def allow_trial(self):
+        """
+        Let an open circuit go half-open without waiting out the cool-down, e.g. when a
+        health probe succeeds. Only the outcome of a real call closes the circuit.
+        """
+        with self._lock:
+            if self._state == OPEN:
+                self._transition(HALF_OPEN)
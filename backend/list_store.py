@@ -0,0 +1,160 @@
+"""
+List Store - In-memory storage for My List items
+Keeps a category index up to date on every write so category lookups never scan the list
+"""
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class ListStore:
+    """In-memory My List storage with an incrementally maintained category index"""
+
+    def __init__(self, items: Optional[List[Dict]] = None):
+        self._lock = threading.RLock()
+
+        # Items keyed by id (dicts keep insertion order, so this is also list order)
+        self._items: Dict[int, Dict] = {}
+
+        # category -> ordered set of item ids (dict used as an ordered set)
+        self._category_index: Dict[str, Dict[int, None]] = {}
+
+        self._next_id = 1
+
+        for item in items or []:
+            self._insert(dict(item))
+
+    def _insert(self, item: Dict) -> Dict:
+        """Insert a fully built item and index it (caller holds the lock)"""
+        if item.get("id") is None:
+            item["id"] = self._next_id
+        self._next_id = max(self._next_id, item["id"] + 1)
+
+        self._items[item["id"]] = item
+        self._category_index.setdefault(item["category"], {})[item["id"]] = None
+        return item
+
+    def _unindex(self, item: Dict):
+        """Remove an item from the category index (caller holds the lock)"""
+        ids = self._category_index.get(item["category"])
+        if ids is None:
+            return
+        ids.pop(item["id"], None)
+        if not ids:
+            del self._category_index[item["category"]]
+
+    def items(self, category: Optional[str] = None) -> List[Dict]:
+        """
+        Get items in My List
+
+        Args:
+            category: Optional category to filter by (served from the category index)
+
+        Returns:
+            List of item dicts in insertion order
+        """
+        with self._lock:
+            if category is None:
+                return list(self._items.values())
+            return [self._items[i] for i in self._category_index.get(category, {})]
+
+    def get(self, item_id: int) -> Optional[Dict]:
+        """Get a single item by id"""
+        with self._lock:
+            return self._items.get(item_id)
+
+    def add(self, fields: Dict) -> Dict:
+        """
+        Add a new item to My List
+
+        Args:
+            fields: Item fields (title, description, category, rating, thumbnail)
+
+        Returns:
+            The stored item including its generated id and created_at
+        """
+        with self._lock:
+            item = {
+                "id": self._next_id,
+                "title": fields.get("title"),
+                "description": fields.get("description"),
+                "category": fields.get("category"),
+                "rating": fields.get("rating"),
+                "thumbnail": fields.get("thumbnail"),
+                "created_at": datetime.now()
+            }
+            return self._insert(item)
+
+    def add_many(self, fields_list: List[Dict]) -> List[Dict]:
+        """
+        Add several items in one transaction (readers never see a partial batch)
+
+        Args:
+            fields_list: List of item field dicts, as accepted by add()
+
+        Returns:
+            The stored items, in request order
+        """
+        with self._lock:
+            return [self.add(fields) for fields in fields_list]
+
+    def delete_many(self, item_ids: List[int]) -> List[bool]:
+        """
+        Delete several items in one transaction
+
+        Args:
+            item_ids: Ids to delete; repeated ids only delete once
+
+        Returns:
+            One flag per requested id, True if that id was deleted
+        """
+        with self._lock:
+            return [self.delete(item_id) for item_id in item_ids]
+
+    def update(self, item_id: int, fields: Dict) -> Optional[Dict]:
+        """
+        Update an existing item, moving it between categories if needed
+
+        Returns:
+            The updated item, or None if the id does not exist
+        """
+        with self._lock:
+            item = self._items.get(item_id)
+            if item is None:
+                return None
+
+            if fields.get("category") != item["category"]:
+                self._unindex(item)
+                self._category_index.setdefault(fields.get("category"), {})[item_id] = None
+
+            item["title"] = fields.get("title")
+            item["description"] = fields.get("description")
+            item["category"] = fields.get("category")
+            item["rating"] = fields.get("rating")
+            item["thumbnail"] = fields.get("thumbnail")
+            return item
+
+    def delete(self, item_id: int) -> bool:
+        """Delete an item, returning False if the id does not exist"""
+        with self._lock:
+            item = self._items.pop(item_id, None)
+            if item is None:
+                return False
+            self._unindex(item)
+            return True
+
+    def categories(self) -> Dict[str, int]:
+        """
+        Get item counts per category
+
+        Returns:
+            Dictionary mapping category name to item count, sorted by name
+        """
+        with self._lock:
+            return {
+                category: len(self._category_index[category])
+                for category in sorted(self._category_index)
+            }
+
+    def __len__(self) -> int:
+        return len(self._items)
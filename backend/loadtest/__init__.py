@@ -0,0 +1,5 @@
+"""
+Load Testing - Traffic generator for the backend and a local FF1000 stand-in
+run.py replays a mix of API calls at a target rate and reports latency percentiles;
+ff1000_standin.py serves FF1000's predict API from a stub or a synthetic catalog
+"""
@@ -0,0 +1,193 @@
+"""
+FF1000 Stand-in - Serve FF1000's API locally for load tests, without its embeddings file
+
+Two modes:
+    stub       A threaded HTTP server that answers /predict/<model>[/batch] with made-up but
+               stable rankings over a fake catalog, after an injected latency (base +
+               per ranked item + jitter) and with an optional error rate. No ML
+               dependencies; isolates the backend's own overhead.
+    synthetic  The real FF1000 server (server/api.py under gunicorn) on a synthetic
+               catalog exported once to --catalog-dir. Measures the backend/FF1000 pair.
+
+Both use the synthetic catalog's item ids (synthetic-00000000, ...), so
+`python -m loadtest.run --items N` sends seeds either mode knows:
+
+    python -m loadtest.ff1000_standin stub --port 8080 --latency-ms 20 --error-rate 0.01
+    python -m loadtest.ff1000_standin synthetic --port 8080 --items 20000 --dims 256
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+FF1000_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "FF1000")
+MODELS = ("similarity", "rfy", "nfm")
+FIELDS = ("item_ids", "titles", "posters", "premiere_years", "scores")
+
+
+def synthetic_item_id(i: int) -> str:
+    """Item id of the i-th item of FF1000's synthetic catalog"""
+    return f"synthetic-{i:08d}"
+
+
+class StubModel:
+    """Fake catalog plus deterministic rankings: the same seeds always rank the same items"""
+
+    def __init__(self, n_items: int, latency_ms: float, per_item_us: float, jitter_ms: float, error_rate: float):
+        self.n_items = n_items
+        self.latency_ms = latency_ms
+        self.per_item_us = per_item_us
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def delay(self, limit: int) -> float:
+        """Injected service time in seconds for a ranking of `limit` items"""
+        jitter = random.expovariate(1.0 / self.jitter_ms) if self.jitter_ms > 0 else 0.0
+        return (self.latency_ms + jitter) / 1000 + self.per_item_us * limit / 1e6
+
+    def fail(self) -> bool:
+        return random.random() < self.error_rate
+
+    def predict(self, model_name: str, items: List[str], limit: int, fields: Optional[List[str]]) -> Dict:
+        """One prediction in FF1000's as-arrays layout"""
+        with self._lock:
+            self.requests += 1
+        rng = random.Random(zlib.crc32(f"{model_name}:{','.join(sorted(items))}".encode()))
+        seeds = set(items)
+        ranked = [i for i in rng.sample(range(self.n_items), min(limit + len(seeds), self.n_items))
+                  if synthetic_item_id(i) not in seeds][:limit]
+        columns = {
+            "item_ids": [synthetic_item_id(i) for i in ranked],
+            "titles": [f"Synthetic Title {i}" for i in ranked],
+            "posters": [f"https://posters.example.com/{i}.jpg" for i in ranked],
+            "premiere_years": [1980 + i % 45 for i in ranked],
+            "scores": [round(1.0 - rank / (limit + 1), 6) for rank in range(len(ranked))],
+        }
+        return {name: columns[name] for name in (fields or FIELDS)}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    model: StubModel = None
+    protocol_version = "HTTP/1.1"  # keep-alive, like gunicorn behind the backend's session
+
+    def _send(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path in ("/health", "/ready"):
+            self._send(200, {"status": "ready" if self.path == "/ready" else "ok", "n_items": self.model.n_items})
+        else:
+            self._send(404, {"error": "NotFound", "message": self.path})
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        parts = self.path.strip("/").split("/")
+        batch = len(parts) == 3 and parts[2] == "batch"
+        model_name = parts[1] if len(parts) > 1 else ""
+        if parts[0] != "predict" or model_name not in MODELS or len(parts) > (3 if batch else 2):
+            self._send(400, {"error": "UnknownModel", "message": f"valid models: {list(MODELS)}"})
+            return
+
+        limit = int(payload.get("limit", 10))
+        seed_lists = payload.get("batch", []) if batch else [payload.get("items", [])]
+        start = time.perf_counter()
+        # A batch costs one base latency plus the per-item time of every ranking
+        time.sleep(self.model.delay(limit * len(seed_lists)))
+        if self.model.fail():
+            self._send(503, {"error": "InjectedFailure", "message": "stub error injection"}, {"Retry-After": "1"})
+            return
+        predictions = [self.model.predict(model_name, items, limit, payload.get("fields")) for items in seed_lists]
+        server_timing = f"ranker;dur={(time.perf_counter() - start) * 1000:.3f}"
+        self._send(200, {"model": model_name, "predictions": predictions}, {"Server-Timing": server_timing})
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def serve_stub(args):
+    StubHandler.model = StubModel(args.items, args.latency_ms, args.per_item_us, args.jitter_ms, args.error_rate)
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    logger.info(f"FF1000 stub on {args.host}:{args.port}: {args.items} items, {args.latency_ms}ms "
+                f"+ {args.per_item_us}us/item + exp({args.jitter_ms}ms) jitter, error rate {args.error_rate}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info(f"Served {StubHandler.model.requests} predictions")
+        server.server_close()
+
+
+def serve_synthetic(args):
+    catalog_dir = os.path.abspath(args.catalog_dir or os.path.join(
+        tempfile.gettempdir(), f"ff1000-loadtest-{args.items}x{args.dims}"
+    ))
+    if not os.path.exists(os.path.join(catalog_dir, "manifest.json")):
+        logger.info(f"Exporting a {args.items} x {args.dims} synthetic catalog to {catalog_dir}")
+        subprocess.run(
+            [sys.executable, "-m", "machine_learning.datasets.export_catalog", catalog_dir,
+             "--synthetic", str(args.items), "--dims", str(args.dims)],
+            cwd=FF1000_DIR, check=True,
+        )
+
+    env = dict(
+        os.environ,
+        FF1000_EMBEDDINGS_PATH=catalog_dir,
+        FF1000_BIND=f"{args.host}:{args.port}",
+        FF1000_WORKERS=str(args.workers),
+        FF1000_THREADS=str(args.threads),
+    )
+    logger.info(f"Starting FF1000 on {args.host}:{args.port} with {args.workers} workers x {args.threads} threads")
+    # Replace this process, so stopping the stand-in stops gunicorn
+    os.chdir(FF1000_DIR)
+    os.execvpe(sys.executable, [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "server.api:app"], env)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["stub", "synthetic"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--items", type=int, default=20000, help="catalog size")
+    stub = parser.add_argument_group("stub")
+    stub.add_argument("--latency-ms", type=float, default=20.0, help="base service time per prediction")
+    stub.add_argument("--per-item-us", type=float, default=20.0, help="extra service time per ranked item")
+    stub.add_argument("--jitter-ms", type=float, default=5.0, help="mean of the exponential latency jitter")
+    stub.add_argument("--error-rate", type=float, default=0.0, help="share of predictions answered with 503")
+    synthetic = parser.add_argument_group("synthetic")
+    synthetic.add_argument("--dims", type=int, default=256, help="embedding dimensions")
+    synthetic.add_argument("--catalog-dir", help="where to export the catalog (default in the temp dir, reused across runs)")
+    synthetic.add_argument("--workers", type=int, default=2)
+    synthetic.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if args.mode == "stub":
+        serve_stub(args)
+    else:
+        serve_synthetic(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Load Generator - Replay a mix of backend API calls at a target rate
+
+Open-loop: requests are started on a fixed schedule (or Poisson arrivals) whether or
+not earlier ones have finished, and latency is measured from the scheduled start. A
+saturated backend therefore shows up as growing latency instead of a silently lower
+request rate (no coordinated omission).
+
+Each rate in --rates is one stage of --duration seconds; the run stops at the first
+stage that breaks the SLO (--slo-p99-ms, --max-error-rate). The last stage that met
+it is reported as the saturation point:
+
+    python -m loadtest.ff1000_standin stub --port 8080 &
+    FF1000_BASE_URL=http://127.0.0.1:8080 uvicorn main:app --port 8000 &
+    python -m loadtest.run --base-url http://127.0.0.1:8000 --rates 20,50,100,200 \\
+        --duration 30 --mix more-like-this=4,something-else=3,theme=1,list=2
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from loadtest.ff1000_standin import synthetic_item_id
+
+DEFAULT_MIX = "more-like-this=4,something-else=3,theme=1,list=2"
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection (just enough client for the backend's JSON API)"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: Optional[Dict] = None) -> Tuple[int, bytes]:
+        """
+        Send one request and read the whole response
+
+        Args:
+            method: HTTP method
+            path: Path and query string
+            body: JSON body, if any
+
+        Returns:
+            (status, response body)
+        """
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+        data = json.dumps(body).encode() if body is not None else b""
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nAccept: application/json\r\n"
+        if body is not None:
+            head += f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+        self._writer.write(head.encode() + b"\r\n" + data)
+        await self._writer.drain()
+
+        status = int((await self._reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding") == "chunked":
+            chunks = []
+            while True:
+                size = int((await self._reader.readline()).split(b";")[0], 16)
+                chunk = await self._reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            payload = b"".join(chunks)
+        else:
+            payload = await self._reader.readexactly(int(headers.get("content-length", 0)))
+
+        if headers.get("connection") == "close":
+            self.close()
+        return status, payload
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+class Traffic:
+    """Builds requests for each endpoint; seeds follow a Zipf-like popularity over the catalog"""
+
+    def __init__(self, n_items: int, zipf_s: float, seed: int):
+        self.rng = random.Random(seed)
+        self.items = list(range(n_items))
+        self.cum_weights = list(itertools.accumulate(1.0 / (rank + 1) ** zipf_s for rank in range(n_items)))
+        self.builders: Dict[str, Callable[[], Tuple[str, str, Optional[Dict]]]] = {
+            "more-like-this": self.more_like_this,
+            "more-like-this-rail": self.more_like_this_rail,
+            "something-else": self.something_else,
+            "theme": lambda: ("GET", "/api/theme", None),
+            "list": lambda: ("GET", "/api/list", None),
+        }
+
+    def seed_item(self) -> int:
+        return self.rng.choices(self.items, cum_weights=self.cum_weights)[0]
+
+    def more_like_this(self):
+        i = self.seed_item()
+        return "POST", "/api/more-like-this", {
+            "seed_title": f"Synthetic Title {i}", "seed_item_id": synthetic_item_id(i), "limit": 2
+        }
+
+    def more_like_this_rail(self):
+        seeds = [self.seed_item() for _ in range(10)]
+        return "POST", "/api/more-like-this/rail", {
+            "seeds": [{"title": f"Synthetic Title {i}", "item_id": synthetic_item_id(i)} for i in seeds], "limit": 2
+        }
+
+    def something_else(self):
+        i = self.seed_item()
+        # Clicking "Something Else" again on the same tile raises the diversity level
+        excluded = [self.seed_item() for _ in range(self.rng.randint(0, 10))]
+        return "POST", "/api/something-else", {
+            "current_title": f"Synthetic Title {i}",
+            "current_item_id": synthetic_item_id(i),
+            "diversity_level": self.rng.choice([1, 1, 1, 2, 3, 5]),
+            "exclude_item_ids": [synthetic_item_id(j) for j in excluded],
+            "exclude_titles": [f"Synthetic Title {j}" for j in excluded],
+        }
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(p / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], errors: Dict[str, int], duration: float) -> Dict:
+    latencies = sorted(latencies)
+    n_errors = sum(errors.values())
+    total = len(latencies) + n_errors
+    summary = {
+        "requests": total,
+        "rate": total / duration if duration > 0 else 0.0,
+        "error_rate": n_errors / total if total else 0.0,
+        "errors": dict(errors),
+    }
+    for p in PERCENTILES:
+        value = percentile(latencies, p)
+        summary[f"p{p:g}_ms"] = value * 1000 if value is not None else None
+    summary["max_ms"] = latencies[-1] * 1000 if latencies else None
+    return summary
+
+
+async def run_stage(args, traffic: Traffic, mix: Dict[str, float], rate: float) -> Dict:
+    """
+    Drive one stage at a fixed arrival rate
+
+    Args:
+        args: Parsed command line
+        traffic: Request builder
+        mix: Endpoint weights
+        rate: Requests per second to start
+
+    Returns:
+        Per-endpoint and overall latency/error summary
+    """
+    target = urlsplit(args.base_url)
+    pool: asyncio.Queue = asyncio.Queue()
+    for _ in range(args.connections):
+        pool.put_nowait(Connection(target.hostname, target.port or 80))
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    names, weights = list(mix), list(mix.values())
+    loop = asyncio.get_running_loop()
+
+    async def fire(name: str, scheduled: float):
+        method, path, body = traffic.builders[name]()
+        # Waiting for a free connection counts: it is queueing the backend caused
+        conn = await pool.get()
+        try:
+            status, _ = await asyncio.wait_for(conn.request(method, path, body), args.timeout - (loop.time() - scheduled))
+            if 200 <= status < 300:
+                latencies[name].append(loop.time() - scheduled)
+            else:
+                errors[name][f"http_{status}"] += 1
+        except asyncio.TimeoutError:
+            errors[name]["timeout"] += 1
+            conn.close()
+        except (OSError, asyncio.IncompleteReadError, IndexError, ValueError) as e:
+            errors[name][type(e).__name__] += 1
+            conn.close()
+        finally:
+            pool.put_nowait(conn)
+
+    tasks = []
+    start = loop.time()
+    scheduled = start
+    while scheduled < start + args.duration:
+        await asyncio.sleep(max(0.0, scheduled - loop.time()))
+        name = traffic.rng.choices(names, weights)[0]
+        tasks.append(asyncio.create_task(fire(name, scheduled)))
+        scheduled += traffic.rng.expovariate(rate) if args.poisson else 1.0 / rate
+    await asyncio.gather(*tasks)
+    duration = loop.time() - start
+
+    for _ in range(args.connections):
+        (await pool.get()).close()
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    all_errors: Dict[str, int] = defaultdict(int)
+    for per_endpoint in errors.values():
+        for kind, count in per_endpoint.items():
+            all_errors[kind] += count
+    return {
+        "target_rate": rate,
+        "overall": summarize(all_latencies, all_errors, duration),
+        "endpoints": {name: summarize(latencies[name], errors[name], duration) for name in names},
+    }
+
+
+async def ml_status(base_url: str) -> Optional[Dict]:
+    """The backend's view of FF1000 (circuit state) after a stage, if reachable"""
+    target = urlsplit(base_url)
+    conn = Connection(target.hostname, target.port or 80)
+    try:
+        status, body = await asyncio.wait_for(conn.request("GET", "/api/ml/status"), 5)
+        return json.loads(body) if status == 200 else None
+    except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+        return None
+    finally:
+        conn.close()
+
+
+def _fmt(value: Optional[float]) -> str:
+    return f"{value:8.1f}" if value is not None else "       -"
+
+
+def print_stage(stage: Dict):
+    print(f"\n== {stage['target_rate']:g} req/s ==")
+    print(f"{'endpoint':<20}{'requests':>9}{'rate':>8}{'errors':>8}" + "".join(f"{'p' + format(p, 'g'):>9}" for p in PERCENTILES) + f"{'max':>9}")
+    rows = list(stage["endpoints"].items()) + [("overall", stage["overall"])]
+    for name, s in rows:
+        print(f"{name:<20}{s['requests']:>9}{s['rate']:>8.1f}{s['error_rate']:>7.1%} "
+              + "".join(" " + _fmt(s[f'p{p:g}_ms']) for p in PERCENTILES) + " " + _fmt(s["max_ms"]))
+    if stage["overall"]["errors"]:
+        print(f"errors: {stage['overall']['errors']}")
+    if stage.get("ml_status"):
+        print(f"ff1000: available={stage['ml_status'].get('is_available')} circuit={stage['ml_status'].get('circuit')}")
+
+
+def meets_slo(stage: Dict, args) -> bool:
+    overall = stage["overall"]
+    p99 = overall["p99_ms"]
+    return overall["error_rate"] <= args.max_error_rate and p99 is not None and p99 <= args.slo_p99_ms
+
+
+async def main_async(args) -> Dict:
+    mix = parse_mix(args.mix)
+    traffic = Traffic(args.items, args.zipf, args.seed)
+    unknown = set(mix) - set(traffic.builders)
+    if unknown:
+        raise SystemExit(f"Unknown endpoints in --mix: {sorted(unknown)}; valid: {sorted(traffic.builders)}")
+
+    report = {"base_url": args.base_url, "mix": mix, "duration_s": args.duration, "stages": [], "saturation_rate": None}
+    for rate in args.rates:
+        stage = await run_stage(args, traffic, mix, rate)
+        stage["ml_status"] = await ml_status(args.base_url)
+        stage["meets_slo"] = meets_slo(stage, args)
+        report["stages"].append(stage)
+        print_stage(stage)
+        if not stage["meets_slo"]:
+            print(f"SLO broken at {rate:g} req/s (p99 <= {args.slo_p99_ms:g}ms, errors <= {args.max_error_rate:.1%})")
+            break
+        report["saturation_rate"] = rate
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="backend to load")
+    parser.add_argument("--rates", type=lambda s: [float(r) for r in s.split(",")], default=[10.0, 20.0, 50.0],
+                        help="requests per second, one stage each, increasing")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per stage")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights")
+    parser.add_argument("--connections", type=int, default=64, help="client connection pool size")
+    parser.add_argument("--timeout", type=float, default=10.0, help="per-request timeout, from its scheduled start")
+    parser.add_argument("--poisson", action="store_true", help="exponential inter-arrival times instead of a fixed interval")
+    parser.add_argument("--items", type=int, default=20000, help="catalog size the FF1000 stand-in serves")
+    parser.add_argument("--zipf", type=float, default=1.1, help="seed popularity skew (0 = uniform)")
+    parser.add_argument("--slo-p99-ms", type=float, default=500.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the full report as JSON")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(main_async(args))
+    print(f"\nSaturation: {report['saturation_rate']} req/s" if report["saturation_rate"] is not None
+          else "\nSaturation: SLO not met at the lowest rate")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.out}")
+    sys.exit(0 if report["saturation_rate"] is not None else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,29 @@ Dynamic My List - FastAPI Backend
 Built with Slate Design System integration
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from pydantic import BaseModel, Field
+from typing import Dict, Iterator, List, Literal, Optional
 from datetime import datetime
 import uvicorn
+import json
 import logging
 import os
+import re
+import tempfile
+import time
 
 from tokens import DesignTokens
 from ml_service import RecommendationEngine
+from list_store import ListStore
+from rail_cache import RankingCache
+from replacement_queues import ReplacementQueues
+from poster_cache import FORMATS, PosterCache, PosterUnavailable
+import request_timing
+import profiling
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,6 +38,34 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Endpoints that may be profiled on demand (see profiling.py). Middleware added later
+# wraps middleware added earlier, so CORS and Server-Timing also apply to the
+# collapsed stacks returned in place of a profiled response.
+PROFILED_PATHS = {"/api/more-like-this", "/api/something-else"}
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """Run opted-in requests under the stack sampler and return or save the stacks"""
+    if request.url.path not in PROFILED_PATHS or not profiling.requested(request):
+        return await call_next(request)
+    
+    sampler = profiling.StackSampler().start()
+    try:
+        response = await call_next(request)
+    finally:
+        sampler.stop()
+    logger.info(f"Profiled {request.url.path}: {sampler.samples} samples over {sampler.duration * 1000:.1f} ms")
+    
+    if profiling.PROFILE_DIR:
+        response.headers["X-Profile-File"] = profiling.save(sampler, request.url.path.strip("/").replace("/", "-"))
+        return response
+    
+    # No profile directory configured: return the collapsed stacks instead of the body
+    return PlainTextResponse(
+        sampler.collapsed(),
+        headers={"X-Profile-Original-Status": str(response.status_code)}
+    )
+
 # Configure CORS for React frontend
 app.add_middleware(
     CORSMiddleware,
@@ -38,8 +78,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Session-Reset"],
 )
 
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Time every request and expose the breakdown (including FF1000's) as Server-Timing"""
+    timings = request_timing.start_request()
+    start = time.perf_counter()
+    response = await call_next(request)
+    total = time.perf_counter() - start
+    
+    response.headers["Server-Timing"] = request_timing.format_server_timing(timings + [("total", total)])
+    # Label by route template, not raw path, to keep metric cardinality bounded
+    route = request.scope.get("route")
+    request_timing.finish_request(
+        request.method, route.path if route else "unmatched", response.status_code, timings, total
+    )
+    return response
+
 # Initialize design tokens
 tokens = DesignTokens(brand='max')
 
@@ -48,6 +105,45 @@ tokens = DesignTokens(brand='max')
 FF1000_BASE_URL = os.getenv("FF1000_BASE_URL", "http://localhost:8080")
 ml_engine = RecommendationEngine(ff1000_base_url=FF1000_BASE_URL)
 
+# Paginated rails: each rail is scored once (RAIL_DEPTH candidates) and its ranking kept
+# for RAIL_CACHE_TTL_SECONDS; later pages are served from the cached ranking
+RAIL_DEPTH = int(os.getenv("RAIL_DEPTH", "500"))
+rail_cache = RankingCache(
+    ttl_seconds=float(os.getenv("RAIL_CACHE_TTL_SECONDS", "300")),
+    max_entries=int(os.getenv("RAIL_CACHE_MAX_ENTRIES", "1000")),
+)
+
+# "Something Else" with a session_id: each tile is scored once per session and later
+# clicks pop the next candidate from its queue; sessions idle for the TTL are dropped
+replacement_queues = ReplacementQueues(
+    ttl_seconds=float(os.getenv("SOMETHING_ELSE_TTL_SECONDS", "900")),
+    max_sessions=int(os.getenv("SOMETHING_ELSE_MAX_SESSIONS", "10000")),
+    max_tiles_per_session=int(os.getenv("SOMETHING_ELSE_MAX_TILES", "24")),
+    max_candidates=int(os.getenv("SOMETHING_ELSE_MAX_CANDIDATES", "500000")),
+    max_exclusions_per_session=int(os.getenv("SOMETHING_ELSE_MAX_EXCLUSIONS", "2000")),
+)
+
+# Poster proxy (opt-in): recommendation responses point at tile-sized WebP/JPEG variants
+# served from a local disk cache instead of the full-size origin posters. PUBLIC_BASE_URL
+# is the backend's public address for the proxied URLs; behind a TLS-terminating proxy
+# the request's own base URL is http://, which browsers block as mixed content.
+POSTER_PROXY = os.getenv("POSTER_PROXY", "0") == "1"
+POSTER_WIDTHS = [int(w) for w in os.getenv("POSTER_WIDTHS", "200,400").split(",")]
+POSTER_TILE_WIDTH = int(os.getenv("POSTER_TILE_WIDTH", str(POSTER_WIDTHS[0])))
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL")
+poster_cache = PosterCache(
+    cache_dir=os.getenv("POSTER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "dynamic-my-list-posters")),
+    max_bytes=int(float(os.getenv("POSTER_CACHE_MAX_MB", "512")) * 1024 * 1024),
+    widths=POSTER_WIDTHS,
+    quality=int(os.getenv("POSTER_QUALITY", "80")),
+) if POSTER_PROXY else None
+if POSTER_PROXY and not PUBLIC_BASE_URL:
+    logger.warning("POSTER_PROXY is on without PUBLIC_BASE_URL: poster URLs use each request's base URL")
+
+# Proxied posters are immutable: a changed origin image gets a new URL, hence a new key
+POSTER_CACHE_CONTROL = "public, max-age=31536000, immutable"
+POSTER_KEY = re.compile(r"^[0-9a-f]{32}$")
+
 # Models
 class ListItem(BaseModel):
     id: Optional[int] = None
@@ -58,6 +154,12 @@ class ListItem(BaseModel):
     thumbnail: Optional[str] = None
     created_at: Optional[datetime] = None
 
+class BulkAddRequest(BaseModel):
+    items: List[ListItem] = Field(..., max_length=1000)
+
+class BulkDeleteRequest(BaseModel):
+    ids: List[int] = Field(..., max_length=1000)
+
 class ThemeConfig(BaseModel):
     brand: str
     primaryColor: str
@@ -69,12 +171,21 @@ class MoreLikeThisRequest(BaseModel):
     seed_item_id: Optional[str] = None
     limit: int = 2
 
+class RailSeed(BaseModel):
+    title: str
+    item_id: Optional[str] = None
+
+class MoreLikeThisRailRequest(BaseModel):
+    seeds: List[RailSeed] = Field(..., min_length=1, max_length=50)
+    limit: int = Field(2, ge=1, le=20)
+
 class SomethingElseRequest(BaseModel):
     current_title: str
     current_item_id: Optional[str] = None
     diversity_level: int = 1
-    exclude_item_ids: Optional[List[str]] = []
-    exclude_titles: Optional[List[str]] = []
+    exclude_item_ids: Optional[List[str]] = Field([], max_length=500)
+    exclude_titles: Optional[List[str]] = Field([], max_length=500)
+    session_id: Optional[str] = Field(None, pattern=r"^[\w-]{1,64}$")
 
 class RecommendationResponse(BaseModel):
     title: str
@@ -82,9 +193,26 @@ class RecommendationResponse(BaseModel):
     score: float
     year: Optional[int] = None
     poster: Optional[str] = None
+    poster_srcset: Optional[str] = None
+    poster_original: Optional[str] = None
+
+class MoreLikeThisTile(BaseModel):
+    seed_title: str
+    seed_item_id: Optional[str] = None
+    recommendations: List[RecommendationResponse]
+
+class RailRequest(BaseModel):
+    seed_item_ids: List[str] = Field(..., min_length=1, max_length=50)
+    model: Literal["similarity", "rfy"] = "similarity"
+    page_size: int = Field(20, ge=1, le=100)
+    exclude_item_ids: Optional[List[str]] = []
+
+class RailPage(BaseModel):
+    items: List[RecommendationResponse]
+    next_cursor: Optional[str] = None
 
 # In-memory storage (replace with database in production)
-my_list: List[ListItem] = [
+list_store = ListStore([
     {
         "id": 1,
         "title": "Sample Movie",
@@ -103,7 +231,7 @@ my_list: List[ListItem] = [
         "thumbnail": "/icons/default/play.svg",
         "created_at": datetime.now()
     }
-]
+])
 
 # Routes
 @app.get("/")
@@ -121,6 +249,11 @@ def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.now()}
 
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/api/theme")
 def get_theme():
     """Get current theme configuration with design tokens"""
@@ -155,17 +288,18 @@ def get_theme_by_brand(brand: str):
     return theme_config
 
 @app.get("/api/list")
-def get_my_list():
-    """Get all items in My List"""
+def get_my_list(category: Optional[str] = None):
+    """Get all items in My List, optionally filtered by category"""
+    items = list_store.items(category=category)
     return {
-        "items": my_list,
-        "count": len(my_list)
+        "items": items,
+        "count": len(items)
     }
 
 @app.get("/api/list/{item_id}")
 def get_list_item(item_id: int):
     """Get a specific item from My List"""
-    item = next((item for item in my_list if item["id"] == item_id), None)
+    item = list_store.get(item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     return item
@@ -173,62 +307,101 @@ def get_list_item(item_id: int):
 @app.post("/api/list")
 def add_to_list(item: ListItem):
     """Add a new item to My List"""
-    # Generate new ID
-    new_id = max([i["id"] for i in my_list], default=0) + 1
-    
-    new_item = {
-        "id": new_id,
-        "title": item.title,
-        "description": item.description,
-        "category": item.category,
-        "rating": item.rating,
-        "thumbnail": item.thumbnail,
-        "created_at": datetime.now()
-    }
-    
-    my_list.append(new_item)
+    new_item = list_store.add(item.model_dump())
     return {"message": "Item added successfully", "item": new_item}
 
+@app.post("/api/list/bulk")
+def bulk_add_to_list(request: BulkAddRequest):
+    """Add many items to My List in one transaction"""
+    new_items = list_store.add_many([item.model_dump() for item in request.items])
+    return {
+        "message": f"{len(new_items)} items added successfully",
+        "results": [
+            {"index": i, "status": "added", "item": new_item}
+            for i, new_item in enumerate(new_items)
+        ],
+        "added": len(new_items)
+    }
+
+@app.post("/api/list/bulk-delete")
+def bulk_delete_from_list(request: BulkDeleteRequest):
+    """Delete many items from My List in one transaction"""
+    deleted = list_store.delete_many(request.ids)
+    return {
+        "message": f"{sum(deleted)} items deleted successfully",
+        "results": [
+            {"id": item_id, "status": "deleted" if ok else "not_found"}
+            for item_id, ok in zip(request.ids, deleted)
+        ],
+        "deleted": sum(deleted)
+    }
+
 @app.put("/api/list/{item_id}")
 def update_list_item(item_id: int, item: ListItem):
     """Update an existing item in My List"""
-    existing_item = next((i for i in my_list if i["id"] == item_id), None)
+    existing_item = list_store.update(item_id, item.model_dump())
     if not existing_item:
         raise HTTPException(status_code=404, detail="Item not found")
     
-    # Update fields
-    existing_item["title"] = item.title
-    existing_item["description"] = item.description
-    existing_item["category"] = item.category
-    existing_item["rating"] = item.rating
-    existing_item["thumbnail"] = item.thumbnail
-    
     return {"message": "Item updated successfully", "item": existing_item}
 
 @app.delete("/api/list/{item_id}")
 def delete_list_item(item_id: int):
     """Delete an item from My List"""
-    global my_list
-    item = next((i for i in my_list if i["id"] == item_id), None)
-    if not item:
+    if not list_store.delete(item_id):
         raise HTTPException(status_code=404, detail="Item not found")
     
-    my_list = [i for i in my_list if i["id"] != item_id]
     return {"message": "Item deleted successfully"}
 
 @app.get("/api/categories")
 def get_categories():
-    """Get all available categories"""
-    categories = list(set([item["category"] for item in my_list]))
-    return {"categories": categories}
+    """Get all available categories with item counts, sorted by name"""
+    counts = list_store.categories()
+    return {"categories": list(counts), "counts": counts}
 
 @app.get("/api/ml/status")
 async def ml_status():
     """Check ML service status"""
-    return ml_engine.get_catalog_info()
+    return {**ml_engine.get_catalog_info(), "something_else_queues": replacement_queues.stats()}
 
+def _base_url(http_request: Request) -> str:
+    return (PUBLIC_BASE_URL or str(http_request.base_url)).rstrip("/")
+
+def _proxied_posters(recommendations: List[Dict], base_url: str) -> List[Dict]:
+    """
+    Point recommendations at the poster proxy instead of the origin posters
+    
+    Args:
+        recommendations: Recommendation dicts (left untouched; they may be shared)
+        base_url: Public base URL of this backend
+    
+    Returns:
+        Copies with poster set to the tile-sized variant, poster_srcset listing every
+        width and poster_original keeping the origin URL
+    """
+    if poster_cache is None:
+        return recommendations
+    
+    out = []
+    for rec in recommendations:
+        key = poster_cache.register(rec.get("poster"))
+        if key is None:
+            out.append(rec)
+            continue
+        url = f"{base_url}/api/posters/{key}"
+        out.append({
+            **rec,
+            "poster": f"{url}/{POSTER_TILE_WIDTH}",
+            "poster_srcset": ", ".join(f"{url}/{w} {w}w" for w in poster_cache.widths),
+            "poster_original": rec["poster"],
+        })
+    return out
+
+# The recommendation endpoints make blocking FF1000 calls, so they are plain `def`
+# endpoints and run on the threadpool; concurrent requests for the same tile can then
+# overlap and share one FF1000 call (see RecommendationEngine._call_predict)
 @app.post("/api/more-like-this", response_model=List[RecommendationResponse])
-async def more_like_this(request: MoreLikeThisRequest):
+def more_like_this(request: MoreLikeThisRequest, http_request: Request):
     """
     Get recommendations similar to the seed title
     Used for the "More Like This" tile action
@@ -240,34 +413,76 @@ async def more_like_this(request: MoreLikeThisRequest):
             limit=request.limit
         )
         
-        return recommendations
+        return _proxied_posters(recommendations, _base_url(http_request))
         
     except Exception as e:
         logger.error(f"Error in more_like_this: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/more-like-this/rail", response_model=List[MoreLikeThisTile])
+def more_like_this_rail(request: MoreLikeThisRailRequest, http_request: Request):
+    """
+    Get "More Like This" recommendations for every tile of a rail in one call
+    
+    One batched FF1000 request ranks all seeds; recommendations are deduplicated
+    across tiles so no title shows up twice on the rail. Tiles come back in seed order.
+    """
+    seeds = [seed.model_dump() for seed in request.seeds]
+    try:
+        tiles = ml_engine.get_more_like_this_rail(seeds, limit=request.limit)
+    except Exception as e:
+        logger.error(f"Error in more_like_this_rail: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    base_url = _base_url(http_request)
+    return [
+        MoreLikeThisTile(
+            seed_title=seed["title"],
+            seed_item_id=seed["item_id"],
+            recommendations=_proxied_posters(recommendations, base_url)
+        )
+        for seed, recommendations in zip(seeds, tiles)
+    ]
+
 @app.post("/api/something-else", response_model=RecommendationResponse)
-async def something_else(request: SomethingElseRequest):
+def something_else(request: SomethingElseRequest, http_request: Request, response: Response):
     """
     Get a different recommendation to replace the current title
     Used for the "Something Else" tile action
     
     Supports progressive diversity: higher diversity_level values
     result in more varied recommendations less related to the seed.
+    With a session_id, the tile's candidates are prefetched on the first click and
+    later clicks are served from the session's queue without calling FF1000.
+    X-Session-Reset: 1 tells the client the session does not hold everything it
+    excluded before (new, expired or trimmed), so it should send its full lists again.
     """
     try:
-        recommendation = ml_engine.get_something_else(
-            current_title=request.current_title,
-            current_item_id=request.current_item_id,
-            diversity_level=request.diversity_level,
-            exclude_item_ids=request.exclude_item_ids,
-            exclude_titles=request.exclude_titles
-        )
+        if request.session_id:
+            recommendation = ml_engine.get_something_else_queued(
+                replacement_queues,
+                request.session_id,
+                current_title=request.current_title,
+                current_item_id=request.current_item_id,
+                diversity_level=request.diversity_level,
+                exclude_item_ids=request.exclude_item_ids,
+                exclude_titles=request.exclude_titles
+            )
+        else:
+            recommendation = ml_engine.get_something_else(
+                current_title=request.current_title,
+                current_item_id=request.current_item_id,
+                diversity_level=request.diversity_level,
+                exclude_item_ids=request.exclude_item_ids,
+                exclude_titles=request.exclude_titles
+            )
         
+        if request.session_id and replacement_queues.take_reset(request.session_id):
+            response.headers["X-Session-Reset"] = "1"
         if not recommendation:
             raise HTTPException(status_code=404, detail="No recommendations found")
         
-        return recommendation
+        return _proxied_posters([recommendation], _base_url(http_request))[0]
         
     except HTTPException:
         raise
@@ -275,6 +490,106 @@ async def something_else(request: SomethingElseRequest):
         logger.error(f"Error in something_else: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _rail_page(cursor: str, page_size: int, base_url: str) -> RailPage:
+    """Serve one page from a cached ranking, or 410 if the ranking expired"""
+    resolved = rail_cache.resolve(cursor)
+    if resolved is None:
+        raise HTTPException(status_code=410, detail="Cursor expired; start the rail again")
+    ranking, offset = resolved
+    items, has_more = ranking.page(offset, page_size)
+    return RailPage(
+        items=_proxied_posters(items, base_url),
+        next_cursor=rail_cache.cursor(ranking, offset + len(items)) if has_more else None
+    )
+
+@app.post("/api/rails", response_model=RailPage)
+def start_rail(request: RailRequest, http_request: Request):
+    """
+    Start an infinite-scroll recommendation rail
+    
+    Scores the seeds once and caches the ranking; returns the first page and a cursor
+    for the next one (GET /api/rails/page or /api/rails/stream).
+    """
+    candidates = ml_engine.get_rail_candidates(request.model, request.seed_item_ids, depth=RAIL_DEPTH)
+    if candidates is None:
+        raise HTTPException(status_code=503, detail="Recommendations are unavailable")
+    
+    ranking = rail_cache.add(candidates, ml_engine.rail_filter(request.seed_item_ids, request.exclude_item_ids))
+    return _rail_page(rail_cache.cursor(ranking, 0), request.page_size, _base_url(http_request))
+
+@app.get("/api/rails/page", response_model=RailPage)
+def rail_page(http_request: Request, cursor: str, page_size: int = Query(20, ge=1, le=100)):
+    """Get the next page of a rail from its cached ranking (no rescoring)"""
+    return _rail_page(cursor, page_size, _base_url(http_request))
+
+@app.get("/api/rails/stream")
+def stream_rail(
+    http_request: Request,
+    cursor: str,
+    page_size: int = Query(20, ge=1, le=100),
+    max_pages: int = Query(10, ge=1, le=100),
+    format: Literal["ndjson", "sse"] = "ndjson"
+):
+    """
+    Stream the following pages of a rail, one NDJSON line or SSE event per page
+    
+    Every page carries its own next_cursor, so a client that disconnects can resume
+    with GET /api/rails/page.
+    """
+    base_url = _base_url(http_request)
+    first = _rail_page(cursor, page_size, base_url)
+    
+    def pages() -> Iterator[str]:
+        page = first
+        for i in range(max_pages):
+            body = json.dumps(page.model_dump())
+            yield f"data: {body}\n\n" if format == "sse" else body + "\n"
+            if page.next_cursor is None or i == max_pages - 1:
+                return
+            try:
+                page = _rail_page(page.next_cursor, page_size, base_url)
+            except HTTPException:
+                return
+    
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(pages(), media_type=media_type)
+
+@app.get("/api/posters/{key}/{variant}")
+def get_poster(key: str, variant: str, http_request: Request):
+    """
+    Serve a resized poster from the disk cache, fetching and resizing it on first use
+    
+    variant is a width ("200"), negotiated to WebP when the client accepts it, or a
+    width with an explicit format ("200.webp", "200.jpg").
+    """
+    width, _, fmt = variant.partition(".")
+    negotiated = not fmt
+    if negotiated:
+        fmt = "webp" if "image/webp" in http_request.headers.get("accept", "") else "jpg"
+    if (poster_cache is None or not POSTER_KEY.match(key) or fmt not in FORMATS
+            or not width.isdigit() or int(width) not in poster_cache.widths):
+        raise HTTPException(status_code=404, detail="Unknown poster")
+    
+    try:
+        path, hit = poster_cache.get(key, int(width), fmt)
+    except PosterUnavailable as e:
+        # Degrade to the full-size origin poster rather than a broken tile
+        logger.warning(f"Poster {key} unavailable: {e}")
+        request_timing.POSTER_REQUESTS.labels("fallback").inc()
+        return RedirectResponse(poster_cache.source(key), status_code=302, headers={"Cache-Control": "no-store"})
+    if path is None:
+        request_timing.POSTER_REQUESTS.labels("not_found").inc()
+        raise HTTPException(status_code=404, detail="Unknown poster")
+    
+    request_timing.POSTER_REQUESTS.labels("hit" if hit else "miss").inc()
+    headers = {"Cache-Control": POSTER_CACHE_CONTROL}
+    if negotiated:
+        headers["Vary"] = "Accept"
+    response = FileResponse(path, media_type=FORMATS[fmt], headers=headers, stat_result=os.stat(path))
+    if http_request.headers.get("if-none-match") == response.headers["etag"]:
+        return Response(status_code=304, headers={**headers, "ETag": response.headers["etag"]})
+    return response
+
 # Run the application
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
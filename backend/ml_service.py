@@ -3,88 +3,310 @@ ML Recommendation Service
 Integrates with FF1000 recommendation models
 """
 import logging
+import os
+import threading
+import time
 import requests
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
 import random
 
+import request_timing
+from circuit_breaker import CircuitBreaker, OPEN
+from replacement_queues import ReplacementQueues, TileQueue
+from single_flight import SingleFlight
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 logger = logging.getLogger(__name__)
 
+# Prefer FF1000's binary response format when msgpack is installed
+PREDICT_ACCEPT = "application/msgpack, application/json;q=0.9" if msgpack else "application/json"
+
+# FF1000 health: probed in the background; while unhealthy the circuit is open and
+# calls fall back immediately instead of waiting out the predict timeout
+HEALTH_PROBE_SECONDS = float(os.getenv("FF1000_HEALTH_PROBE_SECONDS", "5"))
+PREDICT_TIMEOUT_SECONDS = float(os.getenv("FF1000_TIMEOUT_SECONDS", "5"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("FF1000_CIRCUIT_FAILURES", "3"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("FF1000_CIRCUIT_RESET_SECONDS", "10"))
+
+# FF1000 rejects a predict limit above this
+FF1000_MAX_LIMIT = 1000
+
 
 class RecommendationEngine:
     """Wrapper for FF1000 recommendation models"""
     
-    def __init__(self, ff1000_base_url: str = "http://localhost:8080"):
+    def __init__(self, ff1000_base_url: str = "http://localhost:8080", probe: bool = True):
         self.base_url = ff1000_base_url
-        self.is_available = self._check_health()
+        self.breaker = CircuitBreaker(
+            failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=CIRCUIT_RESET_SECONDS,
+            on_state_change=self._on_circuit_change
+        )
         
         # Cache for item ID to title mapping
         self.item_cache: Dict[str, str] = {}
         
-        if self.is_available:
-            logger.info("FF1000 recommendation service is available")
+        # In-flight FF1000 predict calls, keyed by (model, items, limit, fields)
+        self._in_flight = SingleFlight()
+        
+        # Health is checked off the startup path: the first probe runs on the prober
+        # thread, and until it fails requests are let through
+        self._prober = None
+        if probe:
+            self._prober = threading.Thread(target=self._probe_forever, name="ff1000-health", daemon=True)
+            self._prober.start()
+    
+    @property
+    def is_available(self) -> bool:
+        """True unless the circuit is open; a half-open circuit admits a single trial call"""
+        return self.breaker.state != OPEN
+    
+    @staticmethod
+    def _on_circuit_change(previous: str, state: str):
+        request_timing.FF1000_CIRCUIT_OPEN.set(1 if state == OPEN else 0)
+        if state == OPEN:
+            logger.warning(f"FF1000 circuit {previous} -> {state}: using fallback recommendations")
         else:
-            logger.warning("FF1000 recommendation service is NOT available - using fallback")
+            logger.info(f"FF1000 circuit {previous} -> {state}")
+    
+    def _probe_forever(self):
+        """
+        Probe FF1000 liveness on a fixed interval and drive the circuit breaker
+        
+        A dead FF1000 opens the circuit at once; a live one only lets an open circuit
+        try a call (half-open), since liveness says nothing about predict calls timing out.
+        """
+        while True:
+            if self._check_health():
+                self.breaker.allow_trial()
+            else:
+                self.breaker.trip()
+            time.sleep(HEALTH_PROBE_SECONDS)
     
     def _check_health(self) -> bool:
-        """Check if FF1000 service is healthy"""
+        """
+        Check if the FF1000 process is up
+        
+        Liveness rather than /ready: FF1000 keeps serving predictions while it swaps in a
+        new catalog, and predict calls answer for themselves while the models load.
+        """
         try:
             response = requests.get(f"{self.base_url}/health", timeout=2)
             return response.status_code == 200
         except Exception as e:
-            logger.error(f"FF1000 health check failed: {e}")
+            logger.debug(f"FF1000 health check failed: {e}")
             return False
     
-    def _call_predict(self, model_name: str, item_ids: List[str], limit: int = 10) -> Optional[List[Dict]]:
-        """Call FF1000 predict endpoint"""
+    @staticmethod
+    def _decode_response(response: requests.Response) -> Dict:
+        """Decode an FF1000 response body according to its Content-Type"""
+        if msgpack and response.headers.get("Content-Type", "").startswith("application/msgpack"):
+            return msgpack.unpackb(response.content, raw=False)
+        return response.json()
+    
+    def _call_predict(
+        self,
+        model_name: str,
+        item_ids: List[str],
+        limit: int = 10,
+        fields: Optional[List[str]] = None
+    ) -> Optional[List[Dict]]:
+        """
+        Call FF1000 predict endpoint
+        
+        Args:
+            model_name: FF1000 model to call (similarity, rfy, nfm)
+            item_ids: Seed item IDs
+            limit: Number of ranked items FF1000 should return
+            fields: Optional subset of FF1000 result columns to request
+                    (e.g. ["item_ids"] when only the ids are needed); None requests all
+            
+        Returns:
+            List of recommendation dicts, or None on error
+        """
+        # Identical calls already in flight (a trending tile rendering for many users at
+        # once) share that call's result instead of each hitting FF1000
+        key = (model_name, tuple(item_ids), limit, tuple(fields) if fields is not None else None)
+        start = time.perf_counter()
+        recommendations, shared = self._in_flight.do(
+            key, lambda: self._fetch_predictions(model_name, item_ids, limit, fields)
+        )
+        if not shared:
+            return recommendations
+        
+        request_timing.record_coalesced_call(model_name, time.perf_counter() - start)
+        # Callers filter and return these dicts; give each its own copies
+        return [dict(rec) for rec in recommendations] if recommendations is not None else None
+    
+    def _call_predict_batch(
+        self,
+        model_name: str,
+        batch: List[List[str]],
+        limit: int = 10,
+        fields: Optional[List[str]] = None
+    ) -> Optional[List[List[Dict]]]:
+        """
+        Call FF1000's batch predict endpoint: several seed lists ranked in one call
+        
+        Args:
+            model_name: FF1000 model to call (similarity, rfy, nfm)
+            batch: One list of seed item IDs per ranking
+            limit: Number of ranked items FF1000 should return per ranking
+            fields: Optional subset of FF1000 result columns to request
+            
+        Returns:
+            One list of recommendation dicts per seed list, or None on error
+        """
+        key = ("batch", model_name, tuple(map(tuple, batch)), limit, tuple(fields) if fields is not None else None)
+        start = time.perf_counter()
+        results, shared = self._in_flight.do(
+            key, lambda: self._fetch_batch_predictions(model_name, batch, limit, fields)
+        )
+        if not shared:
+            return results
+        
+        request_timing.record_coalesced_call(model_name, time.perf_counter() - start)
+        return [[dict(rec) for rec in recs] for recs in results] if results is not None else None
+    
+    def _fetch_predictions(
+        self,
+        model_name: str,
+        item_ids: List[str],
+        limit: int,
+        fields: Optional[List[str]]
+    ) -> Optional[List[Dict]]:
+        """Make one FF1000 predict call (see _call_predict) and build the recommendation dicts"""
+        payload = {"items": item_ids, "limit": limit}
+        if fields is not None:
+            payload["fields"] = fields
+        
+        predictions = self._post_predict(model_name, f"/predict/{model_name}", payload)
+        if predictions:
+            # Get the first prediction result
+            return self._to_recommendations(predictions[0], limit)
+        return None
+    
+    def _fetch_batch_predictions(
+        self,
+        model_name: str,
+        batch: List[List[str]],
+        limit: int,
+        fields: Optional[List[str]]
+    ) -> Optional[List[List[Dict]]]:
+        """Make one FF1000 batch predict call (see _call_predict_batch)"""
+        payload = {"batch": batch, "limit": limit}
+        if fields is not None:
+            payload["fields"] = fields
+        
+        predictions = self._post_predict(model_name, f"/predict/{model_name}/batch", payload)
+        if predictions is None or len(predictions) != len(batch):
+            return None
+        return [self._to_recommendations(result, limit) for result in predictions]
+    
+    def _post_predict(self, model_name: str, path: str, payload: Dict) -> Optional[List[Dict]]:
+        """
+        POST a predict request to FF1000 through the circuit breaker
+        
+        Args:
+            model_name: FF1000 model (for metrics)
+            path: Endpoint path
+            payload: JSON body
+            
+        Returns:
+            FF1000's "predictions" list, or None on error or while the circuit is open
+        """
+        if not self.breaker.allow_request():
+            request_timing.record_ff1000_call(model_name, "circuit_open", 0.0)
+            return None
+        
+        start = time.perf_counter()
         try:
             response = requests.post(
-                f"{self.base_url}/predict/{model_name}",
-                json={"items": item_ids},
-                timeout=5
+                f"{self.base_url}{path}",
+                json=payload,
+                headers={
+                    "Accept": PREDICT_ACCEPT,
+                    # FF1000 refuses work it cannot finish before we stop waiting. A budget
+                    # rather than an absolute time, so the two hosts' clocks need not agree
+                    "X-Request-Timeout-Ms": f"{PREDICT_TIMEOUT_SECONDS * 1000:.0f}"
+                },
+                timeout=(1.0, PREDICT_TIMEOUT_SECONDS)
             )
-            
+            # Decoded first, so an undecodable body counts as one failed call below
+            predictions = None
             if response.status_code == 200:
-                data = response.json()
-                predictions = data.get("predictions", [])
-                
-                if predictions:
-                    # Get the first prediction result
-                    result = predictions[0]
-                    item_ids_result = result.get("item_ids", [])[:limit]
-                    titles = result.get("titles", [])[:limit]
-                    scores = result.get("scores", [])[:limit]
-                    
-                    # Build list of recommendations
-                    recommendations = []
-                    posters = result.get("posters", [])[:limit]
-                    premiere_years = result.get("premiere_years", [])[:limit]
-                    
-                    for i, (item_id, title, score) in enumerate(zip(item_ids_result, titles, scores)):
-                        rec = {
-                            "item_id": item_id,
-                            "title": title,
-                            "score": float(score),
-                            "rank": i + 1
-                        }
-                        # Add poster if available
-                        if i < len(posters) and posters[i]:
-                            rec["poster"] = posters[i]
-                        # Add premiere year if available
-                        if i < len(premiere_years) and premiere_years[i] is not None:
-                            rec["year"] = int(premiere_years[i])
-                        recommendations.append(rec)
-                        # Cache the mapping
-                        self.item_cache[item_id] = title
-                    
-                    return recommendations
+                predictions = self._decode_response(response).get("predictions", [])
+            shed = response.status_code == 503 and "X-Load-Shed" in response.headers
+            if shed:
+                outcome = "shed"
+            elif response.status_code == 200:
+                outcome = "degraded" if "X-Degraded-To" in response.headers else "ok"
+            else:
+                outcome = f"http_{response.status_code}"
+            request_timing.record_ff1000_call(
+                model_name,
+                outcome,
+                time.perf_counter() - start,
+                response.headers.get("Server-Timing")
+            )
+            # Client errors say nothing about FF1000's health; neither does load shedding,
+            # which is FF1000 answering quickly on purpose (the request falls back below)
+            if response.status_code >= 500 and not shed:
+                self.breaker.record_failure()
             else:
-                logger.error(f"FF1000 API error: {response.status_code} - {response.text}")
+                self.breaker.record_success()
+            
+            if shed:
+                logger.warning(f"FF1000 shed {path} ({response.headers['X-Load-Shed']}), using fallback")
                 return None
+            if response.status_code == 200:
+                return predictions
+            logger.error(f"FF1000 API error: {response.status_code} - {response.text}")
+            return None
                 
         except Exception as e:
+            # Network errors and undecodable bodies alike: every call records an outcome,
+            # or a half-open trial call would keep the trial slot forever
+            request_timing.record_ff1000_call(model_name, type(e).__name__, time.perf_counter() - start)
+            self.breaker.record_failure()
             logger.error(f"Error calling FF1000: {e}")
             return None
     
+    def _to_recommendations(self, result: Dict, limit: int) -> List[Dict]:
+        """Build recommendation dicts from one FF1000 prediction (column arrays)"""
+        item_ids_result = result.get("item_ids", [])[:limit]
+        titles = result.get("titles", [])[:limit]
+        scores = result.get("scores", [])[:limit]
+        
+        # Build list of recommendations
+        recommendations = []
+        posters = result.get("posters", [])[:limit]
+        premiere_years = result.get("premiere_years", [])[:limit]
+        
+        for i, item_id in enumerate(item_ids_result):
+            rec = {"item_id": item_id}
+            # Columns left out via `fields` are simply not set
+            if i < len(titles):
+                rec["title"] = titles[i]
+                # Cache the mapping
+                self.item_cache[item_id] = titles[i]
+            if i < len(scores) and scores[i] is not None:
+                rec["score"] = float(scores[i])
+            rec["rank"] = i + 1
+            # Add poster if available
+            if i < len(posters) and posters[i]:
+                rec["poster"] = posters[i]
+            # Add premiere year if available
+            if i < len(premiere_years) and premiere_years[i] is not None:
+                rec["year"] = int(premiere_years[i])
+            recommendations.append(rec)
+        
+        return recommendations
+    
     def get_more_like_this(self, seed_title: str, seed_item_id: Optional[str] = None, limit: int = 2) -> List[Dict]:
         """
         Get similar items using the similarity model
@@ -118,6 +340,94 @@ class RecommendationEngine:
         
         return self._fallback_more_like_this(seed_title, limit)
     
+    def get_more_like_this_rail(self, seeds: List[Dict], limit: int = 2) -> List[List[Dict]]:
+        """
+        Get "More Like This" recommendations for every tile of a rail at once
+        
+        All seeds are ranked in one batched FF1000 call. The recommendations are then
+        dealt to the tiles round-robin by rank, so no title appears twice on the rail
+        (or repeats one of its seeds) and no tile claims every close match first.
+        
+        Args:
+            seeds: One {"title", "item_id"} dict per tile, in rail order
+            limit: Recommendations per tile
+            
+        Returns:
+            One list of recommendations per seed, in the same order
+        """
+        candidates: List[List[Dict]] = [[] for _ in seeds]
+        known = [i for i, seed in enumerate(seeds) if seed.get("item_id")]
+        if self.is_available and known:
+            # Deep enough for each tile to fill up after the title filter and after the
+            # other tiles have taken their picks
+            depth = min(limit * 3 + 1 + limit * (len(seeds) - 1), FF1000_MAX_LIMIT)
+            results = self._call_predict_batch("similarity", [[seeds[i]["item_id"]] for i in known], limit=depth)
+            for i, recommendations in zip(known, results or []):
+                candidates[i] = [r for r in recommendations if self._is_valid_title(r["title"])]
+        
+        # Tiles FF1000 could not serve (no item id, FF1000 down) get the fallback
+        for i, seed in enumerate(seeds):
+            if not candidates[i]:
+                candidates[i] = self._fallback_more_like_this(seed["title"], limit=limit * len(seeds))
+        
+        taken_ids = {seed["item_id"] for seed in seeds if seed.get("item_id")}
+        taken_titles = {seed["title"].lower() for seed in seeds}
+        tiles: List[List[Dict]] = [[] for _ in seeds]
+        positions = [0] * len(seeds)
+        for _ in range(limit):
+            for i, recommendations in enumerate(candidates):
+                while positions[i] < len(recommendations):
+                    rec = recommendations[positions[i]]
+                    positions[i] += 1
+                    if rec["item_id"] in taken_ids or rec["title"].lower() in taken_titles:
+                        continue
+                    taken_ids.add(rec["item_id"])
+                    taken_titles.add(rec["title"].lower())
+                    tiles[i].append(rec)
+                    break
+        
+        return tiles
+    
+    def get_rail_candidates(self, model_name: str, seed_item_ids: List[str], depth: int = 500) -> Optional[List[Dict]]:
+        """
+        Score a whole rail in one FF1000 call, unfiltered, for paginated rails
+        
+        Args:
+            model_name: FF1000 model to rank with (similarity, rfy)
+            seed_item_ids: Seed item IDs
+            depth: How many ranked candidates to fetch; bounds how deep the rail scrolls
+            
+        Returns:
+            Ranked candidate dicts, or None if FF1000 is unavailable or the call failed
+        """
+        if not self.is_available:
+            return None
+        return self._call_predict(model_name, seed_item_ids, limit=depth)
+    
+    def rail_filter(self, seed_item_ids: List[str], exclude_item_ids: Optional[List[str]] = None) -> Callable[[Dict], bool]:
+        """
+        Build the validity filter for a rail's candidates, applied lazily page by page
+        
+        Args:
+            seed_item_ids: Seed item IDs (never recommended back)
+            exclude_item_ids: Item IDs the frontend already shows
+            
+        Returns:
+            Predicate that is True for candidates the rail may show
+        """
+        excluded = set(seed_item_ids) | set(exclude_item_ids or [])
+        seen_titles = set()
+        
+        def keep(candidate: Dict) -> bool:
+            title = candidate.get("title") or ""
+            # The catalog can hold the same title under several ids; show it once per rail
+            if candidate["item_id"] in excluded or title.lower() in seen_titles or not self._is_valid_title(title):
+                return False
+            seen_titles.add(title.lower())
+            return True
+        
+        return keep
+    
     @staticmethod
     def _is_asl_version(title: str) -> bool:
         """Check if a title is an ASL version"""
@@ -203,21 +513,13 @@ class RecommendationEngine:
         similar_item_ids = set()
         
         # Always filter similarity - "Something Else" means DIFFERENT!
-        # Level 1-2: Filter top 5 similar items (good starting point)
-        # Level 3-4: Filter top 5 similar items (consistent diversity)
-        # Level 5-6: Filter top 3 similar items (more variety)
-        # Level 7+: Filter top 2 similar items (maximum variety)
-        if diversity_level <= 2:
-            similarity_limit = 5   # Good starting point
-        elif diversity_level <= 4:
-            similarity_limit = 5   # Consistent diversity
-        elif diversity_level <= 6:
-            similarity_limit = 3   # More variety
-        else:
-            similarity_limit = 2    # Maximum variety
+        similarity_limit, start, end = self._something_else_band(diversity_level)
         
         try:
-            similarity_results = self._call_predict("similarity", [current_item_id], limit=similarity_limit)
+            # Only the ids are needed to build the exclusion set
+            similarity_results = self._call_predict(
+                "similarity", [current_item_id], limit=similarity_limit, fields=["item_ids"]
+            )
             if similarity_results:
                 similar_item_ids = {r["item_id"] for r in similarity_results}
                 logger.info(f"Diversity level {diversity_level}: Filtering out top {len(similar_item_ids)} similar items")
@@ -252,18 +554,8 @@ class RecommendationEngine:
             
             # Pick from MIDDLE of recommendations for "Something Else" to feel different
             # Skip the very top (too similar) but stay in quality range
-            if diversity_level <= 2:
-                # Level 1-2: Pick from positions 10-45 (skip top 10, get different content)
-                start_idx = min(10, len(filtered) - 1)
-                end_idx = min(45, len(filtered))
-            elif diversity_level <= 4:
-                # Level 3-4: Pick from positions 20-65 (more variety)
-                start_idx = min(20, len(filtered) - 1)
-                end_idx = min(65, len(filtered))
-            else:
-                # Level 5+: Pick from positions 30-90 (maximum variety)
-                start_idx = min(30, len(filtered) - 1)
-                end_idx = min(90, len(filtered))
+            start_idx = min(start, len(filtered) - 1)
+            end_idx = min(end, len(filtered))
             
             if end_idx > start_idx:
                 choice = random.choice(filtered[start_idx:end_idx])
@@ -278,6 +570,133 @@ class RecommendationEngine:
         
         return self._fallback_something_else(current_title)
     
+    @staticmethod
+    def _something_else_band(diversity_level: int) -> Tuple[int, int, int]:
+        """
+        How a diversity level picks its "Something Else"
+        
+        Returns:
+            (similarity_limit, start, end): the top `similarity_limit` similar items are
+            filtered out, and the pick comes from positions start..end of the filtered
+            RFY results
+        """
+        # Level 1-2: Filter top 5 similar items, pick from positions 10-45 (good starting point)
+        # Level 3-4: Filter top 5 similar items, pick from positions 20-65 (consistent diversity)
+        # Level 5-6: Filter top 3 similar items, pick from positions 30-90 (more variety)
+        # Level 7+: Filter top 2 similar items, pick from positions 30-90 (maximum variety)
+        if diversity_level <= 2:
+            return 5, 10, 45
+        elif diversity_level <= 4:
+            return 5, 20, 65
+        elif diversity_level <= 6:
+            return 3, 30, 90
+        return 2, 30, 90
+    
+    def _build_replacement_queue(self, seed_item_id: str) -> Optional[TileQueue]:
+        """
+        Score a tile's seed once and order its candidates for every diversity band
+        
+        Each band's order is what get_something_else would pick from: its shuffled pick
+        window first, then the rest of the filtered RFY results (the tail, then the head).
+        Candidates a session has already seen or excluded are skipped when popped.
+        
+        Args:
+            seed_item_id: Item ID of the title the tile showed when the queue was built
+            
+        Returns:
+            The queue, or None if FF1000 had no RFY results for the seed
+        """
+        recommendations = self._call_predict("rfy", [seed_item_id], limit=200)
+        if not recommendations:
+            return None
+        
+        bands = {self._something_else_band(level) for level in (1, 3, 5, 7)}
+        similar_ids: List[str] = []
+        try:
+            similar = self._call_predict(
+                "similarity", [seed_item_id], limit=max(band[0] for band in bands), fields=["item_ids"]
+            )
+            similar_ids = [r["item_id"] for r in similar or []]
+        except Exception as e:
+            logger.warning(f"Could not get similarity results for filtering: {e}")
+        
+        valid = [r for r in recommendations if self._is_valid_title(r["title"])]
+        orders = {}
+        for band in bands:
+            similarity_limit, start, end = band
+            similar_item_ids = set(similar_ids[:similarity_limit])
+            filtered = [r for r in valid if r["item_id"] not in similar_item_ids]
+            window = filtered[start:end]
+            random.shuffle(window)
+            orders[band] = window + filtered[end:] + filtered[:start]
+        return TileQueue(seed_item_id, orders)
+    
+    def get_something_else_queued(
+        self,
+        queues: ReplacementQueues,
+        session_id: str,
+        current_title: str,
+        current_item_id: Optional[str] = None,
+        diversity_level: int = 1,
+        exclude_item_ids: Optional[List[str]] = None,
+        exclude_titles: Optional[List[str]] = None
+    ) -> Optional[Dict]:
+        """
+        Get a different recommendation from the session's prefetched queue for the tile
+        
+        The first click on a tile scores it once (see _build_replacement_queue); later
+        clicks on that tile, whichever title it shows by then, pop the next candidate
+        without calling FF1000. Everything the session was served or asked to exclude is
+        remembered, so the exclusion lists only need to carry what is new.
+        
+        Args:
+            queues: Replacement queues of all sessions
+            session_id: Client-generated id of the user's session
+            current_title: The current title to replace
+            current_item_id: Optional item ID if known
+            diversity_level: How diverse the recommendation should be (see get_something_else)
+            exclude_item_ids: Item IDs to exclude from recommendations
+            exclude_titles: Titles to exclude from recommendations
+            
+        Returns:
+            A single recommendation dict or None
+        """
+        if not current_item_id:
+            logger.warning(f"No item_id provided for '{current_title}', using fallback")
+            request_timing.SOMETHING_ELSE_QUEUE.labels("fallback").inc()
+            return self._fallback_something_else(current_title)
+        
+        band = self._something_else_band(diversity_level)
+        session = queues.session(session_id)
+        try:
+            # One click at a time per session: a second click on a tile whose queue is
+            # being built waits for it instead of scoring the tile again
+            with session.lock:
+                session.exclude(exclude_item_ids or [], exclude_titles or [])
+                session.exclude([current_item_id], [current_title])
+                
+                queue = session.queue_for(current_item_id)
+                choice = queue.pop(band, session.keep) if queue is not None else None
+                outcome = "hit"
+                if choice is None and self.is_available and (queue is None or queue.seed_item_id != current_item_id):
+                    # Not queued yet, or this band ran dry: start over from what the tile shows
+                    queue = self._build_replacement_queue(current_item_id)
+                    if queue is not None:
+                        session.add_queue(queue)
+                        choice = queue.pop(band, session.keep)
+                    outcome = "built"
+                if choice is None:
+                    request_timing.SOMETHING_ELSE_QUEUE.labels("fallback").inc()
+                    return self._fallback_something_else(current_title)
+                
+                session.served(queue, choice)
+        finally:
+            queues.update(session)
+        
+        request_timing.SOMETHING_ELSE_QUEUE.labels(outcome).inc()
+        logger.info(f"Selected '{choice['title']}' as 'Something Else' for '{current_title}' ({outcome})")
+        return dict(choice)
+    
     def _fallback_more_like_this(self, seed_title: str, limit: int = 2) -> List[Dict]:
         """Fallback when ML service is unavailable"""
         # Mock similar titles (without poster URLs since these are fallback)
@@ -328,6 +747,7 @@ class RecommendationEngine:
         """Get information about the catalog"""
         return {
             "is_available": self.is_available,
+            "circuit": self.breaker.state,
             "base_url": self.base_url,
             "cached_items": len(self.item_cache)
         }
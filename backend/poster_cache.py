@@ -0,0 +1,270 @@
+"""
+Poster Cache - Tile-sized poster variants served from a local disk cache
+Each poster is fetched from its origin once, resized to every configured width and
+encoded as WebP and JPEG; the files are kept on disk and the cache is bounded by total
+bytes, evicting the least recently served posters first
+"""
+import hashlib
+import io
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from PIL import Image
+
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {"webp": "image/webp", "jpg": "image/jpeg"}
+SOURCE = "source"  # origin URL of the poster, next to its variants
+
+
+class PosterUnavailable(Exception):
+    """The origin image could not be fetched or decoded"""
+
+
+class PosterCache:
+    """
+    Size-bounded on-disk LRU of resized posters
+
+    Layout: <cache_dir>/images/<key>/source holds the origin URL of a poster handed out,
+    <cache_dir>/images/<key>/<width>.<format> its variants. A poster is one LRU entry
+    from registration on, so origin URLs are bounded and evicted with the variants.
+    Only posters registered by this backend can be served, so the proxy cannot be
+    pointed at arbitrary URLs.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int,
+        widths: List[int],
+        quality: int = 80,
+        fetch_timeout: float = 5.0,
+        max_source_bytes: int = 10 * 1024 * 1024,
+        retry_after: float = 60.0
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.widths = sorted(widths)
+        self.quality = quality
+        self.fetch_timeout = fetch_timeout
+        self.max_source_bytes = max_source_bytes
+        self.retry_after = retry_after
+        self._images_dir = os.path.join(cache_dir, "images")
+        os.makedirs(self._images_dir, exist_ok=True)
+        # Origin URLs used to live in an unbounded directory of their own
+        shutil.rmtree(os.path.join(cache_dir, "sources"), ignore_errors=True)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> bytes on disk, LRU first
+        self._total_bytes = 0
+        self._failed: Dict[str, float] = {}  # key -> when its origin last failed
+        self._flight = SingleFlight()
+        self._scan()
+
+    def _scan(self):
+        """Rebuild the LRU from disk; a directory's mtime is its last use"""
+        entries = []
+        for key in os.listdir(self._images_dir):
+            path = os.path.join(self._images_dir, key)
+            if ".tmp-" in key:
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+                entries.append((os.stat(path).st_mtime, key, size))
+            except OSError:
+                continue
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()[:32]
+
+    def register(self, url: str) -> Optional[str]:
+        """
+        Make a poster servable through the proxy
+
+        Args:
+            url: Origin poster URL
+
+        Returns:
+            The poster key, or None for URLs the proxy does not fetch (non-HTTP)
+        """
+        if not url or not url.startswith(("http://", "https://")):
+            return None
+        key = self.key_for(url)
+        with self._lock:
+            known = key in self._entries
+            if known:
+                self._entries.move_to_end(key)
+        if known:
+            return key
+        target = os.path.join(self._images_dir, key)
+        self._write_source(target, url)
+        self._account(key, target)
+        return key
+
+    @staticmethod
+    def _write_source(target: str, url: str):
+        os.makedirs(target, exist_ok=True)
+        path = os.path.join(target, SOURCE)
+        if not os.path.exists(path):
+            tmp = f"{path}.tmp-{uuid.uuid4().hex}"
+            with open(tmp, "w") as f:
+                f.write(url)
+            os.replace(tmp, path)
+
+    def source(self, key: str) -> Optional[str]:
+        """Origin URL of a registered poster (registered here or by another worker)"""
+        try:
+            with open(os.path.join(self._images_dir, key, SOURCE)) as f:
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key: str, width: int, fmt: str) -> Tuple[Optional[str], bool]:
+        """
+        Path of a resized poster, fetching and resizing it on first use
+
+        Args:
+            key: Poster key from register()
+            width: One of the configured widths
+            fmt: "webp" or "jpg"
+
+        Returns:
+            (path, hit): path is None for an unknown key; hit is False when the poster
+            had to be fetched (or was rendered by another worker)
+
+        Raises:
+            PosterUnavailable: The origin image could not be fetched or decoded
+        """
+        path = os.path.join(self._images_dir, key, f"{width}.{fmt}")
+        with self._lock:
+            hit = key in self._entries
+            if hit:
+                self._entries.move_to_end(key)
+        if hit and os.path.exists(path):
+            try:
+                os.utime(os.path.dirname(path))
+            except OSError:
+                pass
+            return path, True
+
+        url = self.source(key)
+        if url is None:
+            return None, False
+        # A failing origin is not retried on every request for the same poster
+        failed_at = self._failed.get(key)
+        if failed_at is not None and time.monotonic() - failed_at < self.retry_after:
+            raise PosterUnavailable(f"{url} failed less than {self.retry_after:.0f}s ago")
+        # Concurrent misses for one poster share a single fetch-and-resize
+        try:
+            self._flight.do(key, lambda: self._fill(key, url))
+        except PosterUnavailable:
+            self._failed[key] = time.monotonic()
+            raise
+        self._failed.pop(key, None)
+        return path, False
+
+    def _fetch(self, url: str) -> bytes:
+        try:
+            with requests.get(url, timeout=self.fetch_timeout, stream=True) as response:
+                response.raise_for_status()
+                body = io.BytesIO()
+                for chunk in response.iter_content(64 * 1024):
+                    body.write(chunk)
+                    if body.tell() > self.max_source_bytes:
+                        raise PosterUnavailable(f"{url} is larger than {self.max_source_bytes} bytes")
+                return body.getvalue()
+        except requests.RequestException as e:
+            raise PosterUnavailable(f"{url}: {e}") from e
+
+    def _render(self, source: bytes) -> List[Tuple[str, bytes]]:
+        """Every (filename, encoded bytes) variant of one source image"""
+        try:
+            image = Image.open(io.BytesIO(source))
+            # JPEG sources decode straight at a reduced scale when much larger than needed
+            largest = self.widths[-1]
+            image.draft("RGB", (largest, largest * image.height // max(image.width, 1)))
+            image = image.convert("RGB")
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            raise PosterUnavailable(f"cannot decode poster: {e}") from e
+
+        variants = []
+        for width in self.widths:
+            # Never upscale: small sources are re-encoded at their own size
+            w = min(width, image.width)
+            resized = image.resize((w, max(1, round(image.height * w / image.width))), Image.LANCZOS)
+            for fmt, pil_format in (("webp", "WEBP"), ("jpg", "JPEG")):
+                out = io.BytesIO()
+                resized.save(out, pil_format, quality=self.quality, optimize=fmt == "jpg")
+                variants.append((f"{width}.{fmt}", out.getvalue()))
+        return variants
+
+    def _missing_variants(self, target: str) -> List[str]:
+        return [
+            f"{width}.{fmt}" for width in self.widths for fmt in FORMATS
+            if not os.path.exists(os.path.join(target, f"{width}.{fmt}"))
+        ]
+
+    def _fill(self, key: str, url: str):
+        # Renders whatever variants are missing: all of them on first use, the new ones
+        # after the configured widths changed. Each file is written under a temporary
+        # name and renamed into place, so readers (and other workers sharing the
+        # directory) never see a partial file.
+        target = os.path.join(self._images_dir, key)
+        missing = self._missing_variants(target)
+        if missing:
+            variants = self._render(self._fetch(url))
+            self._write_source(target, url)  # evicted since the source was read
+            for name, data in variants:
+                if name in missing:
+                    tmp = os.path.join(target, f"{name}.tmp-{uuid.uuid4().hex}")
+                    with open(tmp, "wb") as f:
+                        f.write(data)
+                    os.replace(tmp, os.path.join(target, name))
+            logger.info(f"Cached poster {key} ({len(missing)} variants)")
+        self._account(key, target)
+
+    def _account(self, key: str, target: str):
+        """Count a poster's files towards the bound as its most recent entry, then evict"""
+        try:
+            size = sum(entry.stat().st_size for entry in os.scandir(target))
+        except OSError:
+            return  # evicted in the meantime
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used posters until the cache fits (always keeps the newest)"""
+        evicted = []
+        with self._lock:
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                key, size = self._entries.popitem(last=False)
+                self._total_bytes -= size
+                evicted.append(key)
+        for key in evicted:
+            shutil.rmtree(os.path.join(self._images_dir, key), ignore_errors=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "posters": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "widths": self.widths,
+            }
@@ -0,0 +1,106 @@
+"""
+Profiling - Opt-in per-request stack sampling
+Lets a single live request be profiled to see whether time goes to FF1000 calls,
+regex filtering or JSON encoding
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+
+from collections import Counter
+
+
+# Off unless the operator opts in; the per-request flag alone does nothing
+ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+PROFILE_DIR = os.environ.get("PROFILE_DIR")
+INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "1"))
+
+
+_switch_lock = threading.Lock()
+_active = 0
+_saved_switch_interval = None
+
+
+def _raise_sampling_priority(interval: float):
+    """Shorten the GIL switch interval while any profile is running, so the sampler gets to run"""
+    global _active, _saved_switch_interval
+    with _switch_lock:
+        if _active == 0:
+            _saved_switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(min(_saved_switch_interval, interval))
+        _active += 1
+
+
+def _restore_sampling_priority():
+    """Restore the switch interval once the last running profile stops"""
+    global _active
+    with _switch_lock:
+        _active -= 1
+        if _active == 0:
+            sys.setswitchinterval(_saved_switch_interval)
+
+
+def requested(request) -> bool:
+    """Check whether profiling is allowed and this request asked for it"""
+    return ENABLED and (request.headers.get("X-Profile") == "1" or request.query_params.get("profile") == "1")
+
+
+class StackSampler:
+    """
+    Sampling profiler producing collapsed stacks (flamegraph.pl / speedscope input)
+    
+    Every thread is sampled, since endpoints run on the event loop or in the
+    threadpool, so requests running at the same time show up too.
+    """
+
+    def __init__(self, interval_ms: float = INTERVAL_MS):
+        self.interval = interval_ms / 1000.0
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        _raise_sampling_priority(self.interval)
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        _restore_sampling_priority()
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Render the counted stacks, most frequent first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+def save(sampler: StackSampler, label: str) -> str:
+    """Write the collapsed stacks to PROFILE_DIR and return the file path"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{label}-{uuid.uuid4().hex[:8]}.collapsed"
+    path = os.path.join(PROFILE_DIR, name)
+    with open(path, "w") as f:
+        f.write(sampler.collapsed())
+    return path
@@ -0,0 +1,105 @@
+"""
+Rail Cache - Short-lived ranked candidate lists for paginated recommendation rails
+A rail is scored once by FF1000; later pages are sliced from the cached ranking and
+filtered lazily, so scrolling deeper costs O(page) instead of a full rescore
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class Ranking:
+    """One scored candidate list plus the prefix of it that has passed the filter so far"""
+
+    def __init__(self, candidates: List[Dict], keep: Callable[[Dict], bool], ttl_seconds: float):
+        self.ranking_id = secrets.token_urlsafe(12)
+        self.expires_at = time.monotonic() + ttl_seconds
+        self._candidates = candidates
+        self._keep = keep
+        self._lock = threading.Lock()
+
+        # Candidates that passed the filter, in rank order, and how far we have scanned
+        self._accepted: List[Dict] = []
+        self._scanned = 0
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def page(self, offset: int, size: int) -> Tuple[List[Dict], bool]:
+        """
+        Get one page of filtered recommendations
+
+        Args:
+            offset: Number of filtered items already served
+            size: Page size
+
+        Returns:
+            (items, has_more); only as many candidates are filtered as the page needs,
+            plus one look-ahead item to know whether another page exists
+        """
+        with self._lock:
+            while len(self._accepted) <= offset + size and self._scanned < len(self._candidates):
+                candidate = self._candidates[self._scanned]
+                self._scanned += 1
+                if self._keep(candidate):
+                    self._accepted.append(candidate)
+
+            return self._accepted[offset:offset + size], len(self._accepted) > offset + size
+
+
+class RankingCache:
+    """Bounded LRU of rankings with a TTL, addressed by opaque page cursors"""
+
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._rankings: "OrderedDict[str, Ranking]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, candidates: List[Dict], keep: Callable[[Dict], bool]) -> Ranking:
+        """Cache a freshly scored candidate list, evicting expired and least recently used rankings"""
+        ranking = Ranking(candidates, keep, self.ttl_seconds)
+        with self._lock:
+            for ranking_id in [k for k, r in self._rankings.items() if r.expired]:
+                del self._rankings[ranking_id]
+            self._rankings[ranking.ranking_id] = ranking
+            while len(self._rankings) > self.max_entries:
+                self._rankings.popitem(last=False)
+        return ranking
+
+    def get(self, ranking_id: str) -> Optional[Ranking]:
+        with self._lock:
+            ranking = self._rankings.get(ranking_id)
+            if ranking is None:
+                return None
+            if ranking.expired:
+                del self._rankings[ranking_id]
+                return None
+            self._rankings.move_to_end(ranking_id)
+            return ranking
+
+    @staticmethod
+    def cursor(ranking: Ranking, offset: int) -> str:
+        return f"{ranking.ranking_id}.{offset}"
+
+    def resolve(self, cursor: str) -> Optional[Tuple[Ranking, int]]:
+        """
+        Look up the ranking and offset a cursor points at
+
+        Returns:
+            (ranking, offset), or None if the cursor is malformed or its ranking expired
+        """
+        ranking_id, _, offset = cursor.rpartition(".")
+        if not ranking_id or not offset.isdigit():
+            return None
+        ranking = self.get(ranking_id)
+        if ranking is None:
+            return None
+        return ranking, int(offset)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rankings)
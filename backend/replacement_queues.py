@@ -0,0 +1,188 @@
+"""
+Replacement Queues - Session-scoped prefetched "Something Else" candidates
+The first "Something Else" click on a tile scores its seed once and keeps the candidates
+in pick order for every diversity band; later clicks on the same tile pop the next
+candidate the session has not seen yet, without calling FF1000. Sessions expire after a
+sliding TTL and are bounded by the number of candidates and exclusions they hold in total
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+
+class TileQueue:
+    """One tile's candidates, in pick order for each diversity band"""
+
+    def __init__(self, seed_item_id: str, orders: Dict[Hashable, List[Dict]]):
+        self.seed_item_id = seed_item_id
+        self._orders = {band: deque(candidates) for band, candidates in orders.items()}
+        self.size = sum(len(candidates) for candidates in self._orders.values())
+
+    def pop(self, band: Hashable, keep: Callable[[Dict], bool]) -> Optional[Dict]:
+        """
+        Pop the next candidate of a band that passes `keep`
+
+        Candidates failing `keep` (already served, or excluded since) are dropped on the
+        way, so a click costs O(1) amortised.
+
+        Returns:
+            The candidate, or None when the band is exhausted
+        """
+        queue = self._orders.get(band)
+        while queue:
+            candidate = queue.popleft()
+            self.size -= 1
+            if keep(candidate):
+                return candidate
+        return None
+
+
+class Session:
+    """What one user session has been shown, and its tiles' queues"""
+
+    def __init__(self, session_id: str, max_tiles: int, max_exclusions: int = 2000):
+        self.session_id = session_id
+        self.max_tiles = max_tiles
+        self.max_exclusions = max_exclusions
+        self.expires_at = 0.0
+        self.accounted = 0  # size last counted towards the store's total
+        # Set while the client may have sent exclusions this session no longer holds:
+        # it was just started (first click, or the previous one expired or was evicted)
+        # or it forgot its oldest exclusions
+        self.reset = True
+        self.lock = threading.Lock()
+        # Insertion-ordered, so the oldest exclusions are forgotten first beyond max_exclusions
+        self.excluded_item_ids: Dict[str, None] = {}
+        self.excluded_titles: Dict[str, None] = {}
+        self._queues: "OrderedDict[str, TileQueue]" = OrderedDict()  # by tile seed, LRU first
+        self._tile_of: Dict[str, str] = {}  # served item_id -> seed of the queue it came from
+
+    @property
+    def size(self) -> int:
+        """Queued candidates plus remembered exclusions"""
+        queued = sum(queue.size for queue in self._queues.values())
+        return queued + len(self.excluded_item_ids) + len(self.excluded_titles)
+
+    def exclude(self, item_ids=(), titles=()):
+        """Never serve these again in this session (up to max_exclusions of each)"""
+        self._remember(self.excluded_item_ids, (item_id for item_id in item_ids if item_id))
+        self._remember(self.excluded_titles, (title.lower() for title in titles if title))
+
+    def _remember(self, excluded: Dict[str, None], keys: Iterable[str]):
+        for key in keys:
+            excluded.pop(key, None)
+            excluded[key] = None
+        while len(excluded) > self.max_exclusions:
+            del excluded[next(iter(excluded))]
+            self.reset = True
+
+    def keep(self, candidate: Dict) -> bool:
+        return (candidate["item_id"] not in self.excluded_item_ids
+                and candidate["title"].lower() not in self.excluded_titles)
+
+    def queue_for(self, item_id: str) -> Optional[TileQueue]:
+        """The queue of the tile currently showing `item_id`, if this session filled it"""
+        seed = self._tile_of.get(item_id, item_id)
+        queue = self._queues.get(seed)
+        if queue is not None:
+            self._queues.move_to_end(seed)
+        return queue
+
+    def add_queue(self, queue: TileQueue):
+        """Keep a freshly built queue, dropping the least recently used tile's beyond max_tiles"""
+        self._queues.pop(queue.seed_item_id, None)
+        self._queues[queue.seed_item_id] = queue
+        while len(self._queues) > self.max_tiles:
+            seed, _ = self._queues.popitem(last=False)
+            self._tile_of = {item_id: s for item_id, s in self._tile_of.items() if s != seed}
+
+    def served(self, queue: TileQueue, candidate: Dict):
+        """Record a candidate shown on the tile, so the next click there continues the queue"""
+        self.exclude([candidate["item_id"]], [candidate["title"]])
+        self._tile_of[candidate["item_id"]] = queue.seed_item_id
+
+
+class ReplacementQueues:
+    """
+    Sessions by id: LRU with a sliding TTL, bounded in sessions and in the candidates
+    and exclusions they hold
+
+    Entries are counted per session when it calls update() after a request, so bounding
+    them costs O(tiles of that session) rather than a scan of every session.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 900.0,
+        max_sessions: int = 10000,
+        max_tiles_per_session: int = 24,
+        max_candidates: int = 500000,
+        max_exclusions_per_session: int = 2000
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_tiles_per_session = max_tiles_per_session
+        self.max_candidates = max_candidates
+        self.max_exclusions_per_session = max_exclusions_per_session
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._total = 0  # queued candidates and exclusions, as of each session's last update()
+        self._lock = threading.Lock()
+
+    def session(self, session_id: str) -> Session:
+        """Get a live session (extending its TTL), or start a new one under this id"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.expires_at <= now:
+                if session is not None:
+                    self._total -= session.accounted
+                session = Session(session_id, self.max_tiles_per_session, self.max_exclusions_per_session)
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            session.expires_at = now + self.ttl_seconds
+            self._evict(now)
+        return session
+
+    def update(self, session: Session):
+        """Count a session's entries after a request changed them, evicting if over the bound"""
+        size = session.size
+        with self._lock:
+            if self._sessions.get(session.session_id) is session:
+                self._total += size - session.accounted
+                session.accounted = size
+            self._evict(time.monotonic())
+
+    def take_reset(self, session_id: str) -> bool:
+        """Whether a live session lost exclusions since last asked (see Session.reset)"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            return False
+        reset, session.reset = session.reset, False
+        return reset
+
+    def _evict(self, now: float):
+        # Sessions are LRU-ordered and share one TTL, so expired ones are at the front.
+        # The most recent session is always kept, even if it alone is over the bound.
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.expires_at > now and len(self._sessions) <= self.max_sessions and (
+                self._total <= self.max_candidates or len(self._sessions) == 1
+            ):
+                break
+            self._sessions.popitem(last=False)
+            self._total -= session.accounted
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "held_entries": self._total,
+                "max_sessions": self.max_sessions,
+                "max_candidates": self.max_candidates,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
@@ -0,0 +1,118 @@
+"""
+Request Timing - Per-request stage timings, Server-Timing headers and Prometheus metrics
+"""
+import json
+import logging
+import re
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Latencies range from sub-millisecond list reads to multi-second FF1000 calls
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_SECONDS = Histogram(
+    "backend_request_seconds", "HTTP request latency", ["method", "route", "status"], buckets=BUCKETS
+)
+FF1000_CALL_SECONDS = Histogram(
+    "backend_ff1000_call_seconds", "Round-trip latency of FF1000 calls", ["model", "outcome"], buckets=BUCKETS
+)
+FF1000_STAGE_SECONDS = Histogram(
+    "backend_ff1000_stage_seconds", "FF1000 stage latency as reported in its Server-Timing header",
+    ["model", "stage"], buckets=BUCKETS
+)
+FF1000_COALESCED_CALLS = Counter(
+    "backend_ff1000_coalesced_calls_total", "FF1000 predict calls answered by an identical call already in flight",
+    ["model"]
+)
+FF1000_CIRCUIT_OPEN = Gauge(
+    "backend_ff1000_circuit_open", "1 while the FF1000 circuit breaker is open (calls fall back immediately)"
+)
+POSTER_REQUESTS = Counter(
+    "backend_poster_requests_total", "Poster proxy requests by outcome (hit, miss, fallback, not_found)", ["outcome"]
+)
+SOMETHING_ELSE_QUEUE = Counter(
+    "backend_something_else_queue_total",
+    "Queued \"Something Else\" clicks by outcome (hit, built, fallback)", ["outcome"]
+)
+
+# Timings collected for the request being handled. The middleware installs a fresh
+# list per request; the endpoint (and anything it calls) appends to that same list.
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+_SERVER_TIMING_ENTRY = re.compile(r"^\s*([\w.+-]+)\s*(?:;.*?dur=([\d.]+))?")
+
+
+def start_request() -> List[Tuple[str, float]]:
+    """Install and return an empty timing list for the current request"""
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+
+def record(name: str, seconds: float):
+    """Record a stage duration for the current request (no-op outside a request)"""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def parse_server_timing(header: Optional[str]) -> List[Tuple[str, float]]:
+    """
+    Parse a Server-Timing header into (name, seconds) pairs
+
+    Entries without a duration are skipped.
+    """
+    entries = []
+    for part in (header or "").split(","):
+        match = _SERVER_TIMING_ENTRY.match(part)
+        if match and match.group(2):
+            entries.append((match.group(1), float(match.group(2)) / 1000))
+    return entries
+
+
+def format_server_timing(timings: List[Tuple[str, float]]) -> str:
+    """Format (name, seconds) pairs as a Server-Timing header value"""
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings)
+
+
+def record_ff1000_call(model_name: str, outcome: str, seconds: float, server_timing: Optional[str] = None):
+    """
+    Record one FF1000 round-trip and pass FF1000's own stage timings through
+
+    Args:
+        model_name: FF1000 model that was called
+        outcome: "ok", "degraded" (rfy served by similarity), "shed" (refused by FF1000's
+            admission control) or a short error label
+        seconds: Round-trip duration as seen by the backend
+        server_timing: FF1000's Server-Timing response header, if any
+    """
+    FF1000_CALL_SECONDS.labels(model_name, outcome).observe(seconds)
+    record(f"ff1000-{model_name}", seconds)
+
+    for stage, stage_seconds in parse_server_timing(server_timing):
+        if stage == "total":
+            continue
+        FF1000_STAGE_SECONDS.labels(model_name, stage).observe(stage_seconds)
+        record(f"ff1000-{model_name}-{stage}", stage_seconds)
+
+
+def record_coalesced_call(model_name: str, seconds: float):
+    """Record a predict call that waited on an identical in-flight call instead of calling FF1000"""
+    FF1000_COALESCED_CALLS.labels(model_name).inc()
+    record(f"ff1000-{model_name}-coalesced", seconds)
+
+
+def finish_request(method: str, route: str, status: int, timings: List[Tuple[str, float]], total: float):
+    """Observe request metrics and write one structured log line"""
+    REQUEST_SECONDS.labels(method, route, str(status)).observe(total)
+    logger.info("request_timing %s", json.dumps({
+        "method": method,
+        "route": route,
+        "status": status,
+        "total_ms": round(total * 1000, 3),
+        "stages_ms": [[name, round(seconds * 1000, 3)] for name, seconds in timings],
+    }))
@@ -0,0 +1,58 @@
+"""
+Single Flight - Coalesce concurrent identical calls into one
+The first caller for a key runs the call; callers that arrive while it is in flight
+wait for it and share its result (or its exception) instead of repeating the work
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """Per-key in-flight call registry (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once per key at a time
+
+        Args:
+            key: Identity of the call; equal keys share one execution
+            fn: The call to make
+
+        Returns:
+            (result, shared): shared is True when the result came from another caller's call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Forget the key before waking the followers, so a caller arriving now starts
+            # a fresh call instead of reading a finished one
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Nothing listens here: recommendation calls fail fast and fall back to the mock titles
+os.environ.setdefault("FF1000_BASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("POSTER_PROXY", "0")
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)
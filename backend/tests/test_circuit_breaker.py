@@ -0,0 +1,48 @@
+import time
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def test_opens_after_consecutive_failures_and_refuses_calls():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+
+
+def test_half_open_admits_one_trial_whose_outcome_decides():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.02)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow_request() and breaker.allow_request()
+
+
+def test_successful_probe_only_moves_open_to_half_open():
+    changes = []
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60,
+                             on_state_change=lambda previous, state: changes.append(state))
+    breaker.allow_trial()
+    assert breaker.state == CLOSED
+
+    breaker.trip()
+    breaker.allow_trial()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+    breaker.allow_trial()  # probes never close the circuit, nor free the trial slot
+    assert breaker.state == HALF_OPEN and not breaker.allow_request()
+    assert changes == [OPEN, HALF_OPEN]
@@ -0,0 +1,50 @@
+def _items(n, category="Bulk"):
+    return [{"title": f"Bulk {i}", "category": category} for i in range(n)]
+
+
+def test_bulk_add_returns_one_result_per_item(client):
+    before = client.get("/api/list").json()["count"]
+    response = client.post("/api/list/bulk", json={"items": _items(3)})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["added"] == 3
+    assert [r["index"] for r in body["results"]] == [0, 1, 2]
+    assert [r["item"]["title"] for r in body["results"]] == ["Bulk 0", "Bulk 1", "Bulk 2"]
+    assert len({r["item"]["id"] for r in body["results"]}) == 3
+    assert client.get("/api/list").json()["count"] == before + 3
+
+
+def test_bulk_add_accepts_the_limit_and_rejects_one_more(client):
+    before = client.get("/api/list").json()["count"]
+    assert client.post("/api/list/bulk", json={"items": _items(1001)}).status_code == 422
+    assert client.get("/api/list").json()["count"] == before
+
+    response = client.post("/api/list/bulk", json={"items": _items(1000, "Limit")})
+    assert response.status_code == 200 and response.json()["added"] == 1000
+    ids = [r["item"]["id"] for r in response.json()["results"]]
+    assert client.post("/api/list/bulk-delete", json={"ids": ids}).json()["deleted"] == 1000
+
+
+def test_one_invalid_item_rejects_the_whole_batch(client):
+    before = client.get("/api/list").json()["count"]
+    items = _items(3)
+    del items[1]["category"]
+    response = client.post("/api/list/bulk", json={"items": items})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"][:3] == ["body", "items", 1]
+    assert client.get("/api/list").json()["count"] == before
+
+
+def test_bulk_delete_reports_missing_and_repeated_ids(client):
+    added = client.post("/api/list/bulk", json={"items": _items(2)}).json()["results"]
+    first, second = (r["item"]["id"] for r in added)
+    response = client.post("/api/list/bulk-delete", json={"ids": [first, 999999, first, second]})
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status"] for r in body["results"]] == ["deleted", "not_found", "not_found", "deleted"]
+    assert body["deleted"] == 2
+    assert client.get(f"/api/list/{first}").status_code == 404
+
+
+def test_bulk_delete_rejects_more_than_the_limit(client):
+    assert client.post("/api/list/bulk-delete", json={"ids": list(range(1001))}).status_code == 422
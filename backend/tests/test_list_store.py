@@ -0,0 +1,63 @@
+from list_store import ListStore
+
+
+def _item(title, category):
+    return {"title": title, "category": category}
+
+
+def test_category_filter_is_served_in_insertion_order():
+    store = ListStore([_item("A", "Drama"), _item("B", "Comedy"), _item("C", "Drama")])
+    assert [item["title"] for item in store.items(category="Drama")] == ["A", "C"]
+    assert [item["title"] for item in store.items()] == ["A", "B", "C"]
+    assert store.items(category="Horror") == []
+
+
+def test_counts_are_sorted_and_follow_every_write():
+    store = ListStore()
+    first = store.add(_item("A", "Drama"))
+    store.add(_item("B", "Comedy"))
+    store.add(_item("C", "Drama"))
+    assert store.categories() == {"Comedy": 1, "Drama": 2}
+    assert list(store.categories()) == ["Comedy", "Drama"]
+
+    store.update(first["id"], _item("A", "Action"))
+    assert store.categories() == {"Action": 1, "Comedy": 1, "Drama": 1}
+    assert [item["title"] for item in store.items(category="Action")] == ["A"]
+
+    store.delete(first["id"])
+    assert store.categories() == {"Comedy": 1, "Drama": 1}
+    assert store.items(category="Action") == []
+
+
+def test_an_emptied_category_disappears():
+    store = ListStore([_item("A", "Drama")])
+    (item,) = store.items()
+    store.update(item["id"], _item("A", "Comedy"))
+    assert store.categories() == {"Comedy": 1}
+    store.delete(item["id"])
+    assert store.categories() == {}
+
+
+def test_update_in_the_same_category_keeps_the_index():
+    store = ListStore([_item("A", "Drama"), _item("B", "Drama")])
+    first = store.items()[0]
+    store.update(first["id"], _item("A2", "Drama"))
+    assert [item["title"] for item in store.items(category="Drama")] == ["A2", "B"]
+    assert store.categories() == {"Drama": 2}
+
+
+def test_seeded_ids_are_kept_and_new_ids_follow_them():
+    store = ListStore([{"id": 7, **_item("A", "Drama")}])
+    assert store.add(_item("B", "Drama"))["id"] == 8
+    assert store.delete(7) and not store.delete(7)
+    assert store.categories() == {"Drama": 1}
+
+
+def test_categories_endpoint_uses_the_index(client):
+    response = client.get("/api/categories").json()
+    assert response["categories"] == sorted(response["categories"])
+    assert list(response["counts"]) == response["categories"]
+    for category, count in response["counts"].items():
+        listed = client.get("/api/list", params={"category": category}).json()
+        assert listed["count"] == count
+        assert {item["category"] for item in listed["items"]} == {category}
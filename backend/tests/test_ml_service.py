@@ -0,0 +1,63 @@
+import requests
+
+from circuit_breaker import HALF_OPEN, OPEN
+from ml_service import RecommendationEngine
+
+
+class _Response:
+    status_code = 200
+    headers = {"Content-Type": "application/json"}
+    text = "not json"
+
+    def json(self):
+        raise ValueError("not json")
+
+
+def _half_open_engine():
+    engine = RecommendationEngine("http://ff1000.invalid", probe=False)
+    engine.breaker.trip()
+    engine.breaker.allow_trial()
+    assert engine.breaker.state == HALF_OPEN
+    return engine
+
+
+def test_undecodable_trial_response_does_not_wedge_the_breaker(monkeypatch):
+    engine = _half_open_engine()
+    monkeypatch.setattr(requests, "post", lambda *args, **kwargs: _Response())
+    assert engine._call_predict("similarity", ["id1"], limit=2) is None
+    assert engine.breaker.state == OPEN
+
+    engine.breaker.allow_trial()
+    assert engine.breaker.allow_request()
+
+
+def test_predict_calls_carry_a_relative_timeout(monkeypatch):
+    sent = {}
+
+    def post(url, json, headers, timeout):
+        sent.update(headers)
+        raise requests.ConnectionError("down")
+
+    engine = RecommendationEngine("http://ff1000.invalid", probe=False)
+    monkeypatch.setattr(requests, "post", post)
+    assert engine._call_predict("similarity", ["id1"], limit=2) is None
+    assert "X-Request-Deadline" not in sent
+    assert float(sent["X-Request-Timeout-Ms"]) > 0
+
+
+def test_projected_predictions_leave_out_the_missing_columns(monkeypatch):
+    sent = {}
+
+    class _Projected(_Response):
+        def json(self):
+            return {"predictions": [{"item_ids": ["a", "b", "c"]}]}
+
+    def post(url, json, headers, timeout):
+        sent.update(json)
+        return _Projected()
+
+    engine = RecommendationEngine("http://ff1000.invalid", probe=False)
+    monkeypatch.setattr(requests, "post", post)
+    recommendations = engine._call_predict("similarity", ["id1"], limit=2, fields=["item_ids"])
+    assert sent == {"items": ["id1"], "limit": 2, "fields": ["item_ids"]}
+    assert recommendations == [{"item_id": "a", "rank": 1}, {"item_id": "b", "rank": 2}]
@@ -0,0 +1,81 @@
+import main
+from circuit_breaker import OPEN
+from ml_service import RecommendationEngine
+
+
+def _rec(n, title=None):
+    return {"item_id": f"id-{n}", "title": title or f"Title {n}", "score": 1.0, "poster": None}
+
+
+def _engine(monkeypatch, results):
+    # results maps a seed item id to its ranked similarity list; calls are recorded
+    engine = RecommendationEngine("http://ff1000.invalid", probe=False)
+    engine.calls = []
+
+    def predict_batch(model_name, batch, limit):
+        engine.calls.append((model_name, batch, limit))
+        return None if results is None else [list(results[seeds[0]]) for seeds in batch]
+
+    monkeypatch.setattr(engine, "_call_predict_batch", predict_batch)
+    return engine
+
+
+def _ids(tiles):
+    return [[rec["item_id"] for rec in tile] for tile in tiles]
+
+
+def test_tiles_share_one_call_and_never_repeat_a_title(monkeypatch):
+    # Both seeds rank the same neighbours; each other's seed and a retitled duplicate too
+    shared = [_rec(1), _rec(2), _rec(3), _rec(4), _rec(5)]
+    engine = _engine(monkeypatch, {
+        "a": [_rec("b", "Seed B"), *shared],
+        "b": [_rec(99, "title 1"), *shared],
+    })
+    seeds = [{"title": "Seed A", "item_id": "a"}, {"title": "Seed B", "item_id": "b"}]
+    tiles = engine.get_more_like_this_rail(seeds, limit=2)
+
+    assert len(engine.calls) == 1 and engine.calls[0][1] == [["a"], ["b"]]
+    assert _ids(tiles) == [["id-1", "id-3"], ["id-2", "id-4"]]
+
+
+def test_invalid_titles_are_skipped(monkeypatch):
+    engine = _engine(monkeypatch, {"a": [_rec(1, "Title 1 Trailer"), _rec(2), _rec(3)]})
+    tiles = engine.get_more_like_this_rail([{"title": "Seed A", "item_id": "a"}], limit=2)
+    assert _ids(tiles) == [["id-2", "id-3"]]
+
+
+def test_seeds_without_an_id_fall_back_without_duplicates(monkeypatch):
+    engine = _engine(monkeypatch, {"a": [_rec(1), _rec(2)]})
+    seeds = [{"title": "Seed A", "item_id": "a"}, {"title": "Barbie", "item_id": None}]
+    tiles = engine.get_more_like_this_rail(seeds, limit=2)
+
+    assert engine.calls[0][1] == [["a"]]
+    assert _ids(tiles)[0] == ["id-1", "id-2"]
+    assert len(tiles[1]) == 2 and all(rec["item_id"].startswith("mock-") for rec in tiles[1])
+    assert "Barbie" not in {rec["title"] for rec in tiles[1]}
+
+
+def test_failed_or_skipped_ff1000_call_falls_back_for_every_tile(monkeypatch):
+    seeds = [{"title": f"Seed {n}", "item_id": n} for n in "abc"]
+    failed = _engine(monkeypatch, None)
+    tiles = failed.get_more_like_this_rail(seeds, limit=3)
+    titles = [rec["title"] for tile in tiles for rec in tile]
+    assert [len(tile) for tile in tiles] == [3, 3, 3]
+    assert len(set(titles)) == len(titles)
+
+    open_circuit = _engine(monkeypatch, {})
+    open_circuit.breaker.trip()
+    assert open_circuit.breaker.state == OPEN
+    assert all(len(tile) == 2 for tile in open_circuit.get_more_like_this_rail(seeds, limit=2))
+    assert open_circuit.calls == []
+
+
+def test_rail_endpoint_returns_tiles_in_seed_order(client, monkeypatch):
+    engine = _engine(monkeypatch, {"a": [_rec(1), _rec(2)], "b": [_rec(1), _rec(3)]})
+    monkeypatch.setattr(main, "ml_engine", engine)
+    seeds = [{"title": "Seed A", "item_id": "a"}, {"title": "Seed B", "item_id": "b"}]
+    response = client.post("/api/more-like-this/rail", json={"seeds": seeds, "limit": 1})
+    assert response.status_code == 200
+    assert [(tile["seed_item_id"], [r["item_id"] for r in tile["recommendations"]]) for tile in response.json()] == [
+        ("a", ["id-1"]), ("b", ["id-3"]),
+    ]
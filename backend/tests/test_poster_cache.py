@@ -0,0 +1,91 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from poster_cache import PosterCache, PosterUnavailable
+
+URL = "https://posters.example.com/1.jpg"
+
+
+def _jpeg(width=600, height=900):
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(out, "JPEG")
+    return out.getvalue()
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    calls = []
+
+    def fetch(self, url):
+        calls.append(url)
+        return _jpeg()
+
+    monkeypatch.setattr(PosterCache, "_fetch", fetch)
+    return calls
+
+
+def _cache(tmp_path, widths, max_bytes=10 * 1024 * 1024):
+    return PosterCache(str(tmp_path), max_bytes=max_bytes, widths=widths)
+
+
+def test_miss_renders_every_variant_then_hits(tmp_path, fetches):
+    cache = _cache(tmp_path, [200, 400])
+    key = cache.register(URL)
+    path, hit = cache.get(key, 200, "webp")
+    assert not hit and os.path.exists(path)
+    assert sorted(os.listdir(os.path.dirname(path))) == ["200.jpg", "200.webp", "400.jpg", "400.webp", "source"]
+    assert Image.open(cache.get(key, 400, "jpg")[0]).width == 400
+    assert cache.get(key, 200, "jpg")[1] and fetches == [URL]
+
+
+def test_new_width_on_an_existing_cache_dir_renders_the_missing_variants(tmp_path, fetches):
+    key = _cache(tmp_path, [200]).register(URL)
+    _cache(tmp_path, [200]).get(key, 200, "webp")
+
+    cache = _cache(tmp_path, [200, 300])
+    path, hit = cache.get(key, 300, "jpg")
+    assert not hit and Image.open(path).width == 300
+    assert cache.get(key, 300, "webp")[1]
+    assert len(fetches) == 2
+
+
+def test_unknown_key_and_failing_origin(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, [200])
+    assert cache.get("0" * 32, 200, "jpg") == (None, False)
+
+    def fail(self, url):
+        raise PosterUnavailable(url)
+
+    monkeypatch.setattr(PosterCache, "_fetch", fail)
+    key = cache.register(URL)
+    with pytest.raises(PosterUnavailable):
+        cache.get(key, 200, "jpg")
+    with pytest.raises(PosterUnavailable, match="less than"):
+        cache.get(key, 200, "jpg")
+
+
+def test_evicts_least_recently_used_posters(tmp_path, fetches):
+    cache = _cache(tmp_path, [200], max_bytes=1000)
+    first = cache.register(URL)
+    second = cache.register("https://posters.example.com/2.jpg")
+    assert cache.stats()["posters"] == 2
+    cache.get(first, 200, "jpg")
+    cache.get(second, 200, "jpg")
+    assert cache.stats()["posters"] == 1
+    assert not os.path.exists(os.path.join(str(tmp_path), "images", first))
+    assert cache.source(first) is None and cache.get(first, 200, "jpg") == (None, False)
+
+
+def test_registered_sources_are_bounded_by_the_cache(tmp_path):
+    cache = _cache(tmp_path, [200], max_bytes=2000)
+    keys = [cache.register(f"https://posters.example.com/{i}.jpg") for i in range(500)]
+    assert cache.stats()["bytes"] <= 2000
+    assert len(os.listdir(os.path.join(str(tmp_path), "images"))) == cache.stats()["posters"] < 500
+    assert cache.source(keys[-1]) == "https://posters.example.com/499.jpg"
+    assert cache.source(keys[0]) is None
+
+    reopened = _cache(tmp_path, [200], max_bytes=2000)
+    assert reopened.stats()["posters"] == cache.stats()["posters"]
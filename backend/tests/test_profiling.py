@@ -0,0 +1,12 @@
+import profiling
+
+
+def test_profiled_response_keeps_server_timing_and_cors(client, monkeypatch):
+    monkeypatch.setattr(profiling, "ENABLED", True)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", None)
+    response = client.post("/api/something-else", json={"current_title": "Barbie"},
+                           headers={"X-Profile": "1", "Origin": "http://localhost:5173"})
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.headers["X-Profile-Original-Status"] == "200"
+    assert "total;dur=" in response.headers["Server-Timing"]
+    assert response.headers["Access-Control-Allow-Origin"] == "http://localhost:5173"
@@ -0,0 +1,31 @@
+import time
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def rail(client, monkeypatch):
+    candidates = [{"item_id": f"id-{i}", "title": f"Title {i}", "score": 1.0 - i / 100, "year": 2000} for i in range(5)]
+    monkeypatch.setattr(main.ml_engine, "get_rail_candidates", lambda model, seeds, depth: list(candidates))
+    return client.post("/api/rails", json={"seed_item_ids": ["id-0"], "page_size": 2}).json()
+
+
+def test_pages_follow_the_cursor(client, rail):
+    assert [item["item_id"] for item in rail["items"]] == ["id-1", "id-2"]
+    page = client.get("/api/rails/page", params={"cursor": rail["next_cursor"], "page_size": 2}).json()
+    assert [item["item_id"] for item in page["items"]] == ["id-3", "id-4"]
+    assert page["next_cursor"] is None
+
+
+def test_expired_cursor_is_gone(client, rail, monkeypatch):
+    later = time.monotonic() + main.rail_cache.ttl_seconds + 1
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    response = client.get("/api/rails/page", params={"cursor": rail["next_cursor"]})
+    assert response.status_code == 410
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "unknown.2", "abc.-1"])
+def test_unknown_or_malformed_cursor_is_gone(client, cursor):
+    assert client.get("/api/rails/page", params={"cursor": cursor}).status_code == 410
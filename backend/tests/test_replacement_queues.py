@@ -0,0 +1,102 @@
+import time
+
+from replacement_queues import ReplacementQueues, TileQueue
+
+
+def _queue(seed, n, band=1):
+    return TileQueue(seed, {band: [{"item_id": f"{seed}-{i}", "title": f"{seed} {i}"} for i in range(n)]})
+
+
+def test_served_and_excluded_candidates_are_skipped():
+    queues = ReplacementQueues()
+    session = queues.session("s")
+    queue = _queue("a", 4)
+    session.add_queue(queue)
+    session.exclude(["a-0"], ["A 1"])
+    choice = queue.pop(1, session.keep)
+    assert choice["item_id"] == "a-2"
+    session.served(queue, choice)
+    assert queues.session("s").queue_for("a-2") is queue
+    assert queue.pop(1, session.keep)["item_id"] == "a-3"
+    assert queue.pop(1, session.keep) is None
+
+
+def test_exclusions_count_towards_the_bound():
+    queues = ReplacementQueues(max_candidates=10)
+    first = queues.session("first")
+    first.exclude([f"id-{i}" for i in range(4)], [f"title {i}" for i in range(4)])
+    queues.update(first)
+    assert queues.stats()["held_entries"] == 8
+
+    second = queues.session("second")
+    second.exclude(["x", "y", "z"])
+    queues.update(second)
+    assert len(queues) == 1 and queues.stats()["held_entries"] == 3
+
+
+def test_exclusions_per_session_are_capped_oldest_first():
+    session = ReplacementQueues(max_exclusions_per_session=3).session("s")
+    session.exclude(["a", "b", "c"])
+    session.exclude(["a", "d"])
+    assert list(session.excluded_item_ids) == ["c", "a", "d"]
+    assert session.size == 3
+
+
+def test_queued_candidates_and_sessions_are_bounded():
+    queues = ReplacementQueues(max_sessions=2, max_tiles_per_session=1)
+    session = queues.session("s")
+    session.add_queue(_queue("a", 5))
+    session.add_queue(_queue("b", 3))
+    queues.update(session)
+    assert queues.stats()["held_entries"] == 3
+
+    queues.session("t")
+    queues.session("u")
+    assert len(queues) == 2 and queues.stats()["held_entries"] == 0
+
+
+def test_idle_sessions_expire(monkeypatch):
+    queues = ReplacementQueues(ttl_seconds=60)
+    session = queues.session("s")
+    session.exclude(["a"])
+    queues.update(session)
+
+    later = time.monotonic() + 61
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    assert queues.session("s") is not session
+    stats = queues.stats()
+    assert stats["sessions"] == 1 and stats["held_entries"] == 0
+
+
+def test_request_exclusion_lists_are_capped(client):
+    response = client.post("/api/something-else", json={
+        "current_title": "Dune",
+        "exclude_item_ids": [str(i) for i in range(501)],
+    })
+    assert response.status_code == 422
+
+
+def test_reset_is_reported_for_new_expired_and_trimmed_sessions(monkeypatch):
+    queues = ReplacementQueues(ttl_seconds=60, max_exclusions_per_session=2)
+    assert not queues.take_reset("s")
+    session = queues.session("s")
+    assert queues.take_reset("s") and not queues.take_reset("s")
+
+    session.exclude(["a", "b", "c"])
+    assert queues.take_reset("s") and not queues.take_reset("s")
+
+    later = time.monotonic() + 61
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    queues.session("s")
+    assert queues.take_reset("s")
+
+
+def test_expired_session_asks_the_client_to_resend(client, monkeypatch):
+    import main
+    body = {"current_title": "Dune", "current_item_id": "id-1", "session_id": "resend"}
+    assert client.post("/api/something-else", json=body).headers["X-Session-Reset"] == "1"
+    assert "X-Session-Reset" not in client.post("/api/something-else", json=body).headers
+
+    later = time.monotonic() + main.replacement_queues.ttl_seconds + 1
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    assert client.post("/api/something-else", json=body).headers["X-Session-Reset"] == "1"
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
 import { ThemeProvider } from './theme/ThemeProvider';
 import { TileWithMetadata, Tile23WithMetadata, Rail, RemovalBanner } from './components';
 import api from './services/api';
@@ -48,6 +48,11 @@ function App() {
   const [dismissedItemIdsRail1, setDismissedItemIdsRail1] = useState(new Set());
   const [dismissedItemIdsRail2, setDismissedItemIdsRail2] = useState(new Set());
 
+  // "More Like This" results per rail, keyed by seed tile (item_id or title).
+  // The first click on a rail fetches every tile's results in one batched request
+  const moreLikeThisRail1 = useRef(new Map());
+  const moreLikeThisRail2 = useRef(new Map());
+
   // Drag and drop handlers for Rail 1
   const handleDragStartRail1 = (index) => (e) => {
     setDraggedIndexRail1(index);
@@ -118,6 +123,7 @@ function App() {
     const setTiles = railId === 1 ? setTilesRail1 : setTilesRail2;
     const tiles = railId === 1 ? tilesRail1 : tilesRail2;
     const dismissedItemIds = railId === 1 ? dismissedItemIdsRail1 : dismissedItemIdsRail2;
+    const moreLikeThis = (railId === 1 ? moreLikeThisRail1 : moreLikeThisRail2).current;
     
     // Find the seed tile
     const seedTile = tiles.find(tile => tile.id === id);
@@ -131,12 +137,15 @@ function App() {
     const existingItemIds = new Set(tiles.map(t => t.item_id).filter(Boolean));
     
     try {
-      // Call ML API to get similar recommendations (request more to account for filtering)
-      const allRecommendations = await api.getMoreLikeThis(
-        seedTile.title,
-        seedTile.item_id || null,
-        10 // Request more to ensure we get 2 unique after filtering
-      );
+      // Fetch similar recommendations for the clicked tile and every other tile on the
+      // rail not fetched yet in one request (more per tile to account for filtering)
+      const seedKey = (tile) => tile.item_id || tile.title.toLowerCase();
+      if (!moreLikeThis.has(seedKey(seedTile))) {
+        const seeds = [seedTile, ...tiles.filter(tile => tile !== seedTile && !moreLikeThis.has(seedKey(tile)))];
+        const railTiles = await api.getMoreLikeThisRail(seeds.slice(0, 50), 10);
+        railTiles.forEach((railTile, index) => moreLikeThis.set(seedKey(seeds[index]), railTile.recommendations));
+      }
+      const allRecommendations = moreLikeThis.get(seedKey(seedTile)) || [];
       
       // Filter out duplicates, ASL versions, language/audio versions, non-title content, and previously dismissed items
       const filteredRecommendations = allRecommendations.filter(rec => {
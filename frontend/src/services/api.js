@@ -5,6 +5,17 @@
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000';
 
+// One id per page load: the backend keeps this session's "Something Else" queues and
+// everything it has already shown, so repeat clicks on a tile skip FF1000
+const SESSION_ID = (globalThis.crypto && crypto.randomUUID)
+  ? crypto.randomUUID()
+  : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
+// Exclusions the backend session already holds; later calls send only what is new.
+// The backend answers X-Session-Reset when its session may have lost them
+const sentExcludedItemIds = new Set();
+const sentExcludedTitles = new Set();
+
 /**
  * Check if ML service is available
  * @returns {Promise<Object>} ML service status
@@ -56,6 +67,47 @@ export async function getMoreLikeThis(seedTitle, seedItemId = null, limit = 2) {
   }
 }
 
+/**
+ * Get "More Like This" recommendations for every tile of a rail in one request
+ * Recommendations are deduplicated across tiles, so no title appears twice on the rail.
+ * The app calls this on the first "More Like This" click on a rail and keeps the results
+ * @param {Array<{title: string, item_id: string|null}>} seeds - The rail's tiles, in order
+ * @param {number} limit - Number of recommendations per tile (default: 2)
+ * @returns {Promise<Array>} One {seed_title, seed_item_id, recommendations} per seed
+ */
+export async function getMoreLikeThisRail(seeds, limit = 2) {
+  try {
+    const response = await fetch(`${API_BASE_URL}/api/more-like-this/rail`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        seeds: seeds.map((seed) => ({ title: seed.title, item_id: seed.item_id || null })),
+        limit: limit,
+      }),
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const tiles = await response.json();
+    return tiles;
+  } catch (error) {
+    console.error('Error getting rail "More Like This" recommendations:', error);
+    // Return fallback recommendations, deduplicated across the rail
+    const used = new Set(seeds.map((seed) => seed.title.toLowerCase()));
+    return seeds.map((seed) => {
+      const recommendations = generateFallbackRecommendations(seed.title, 15)
+        .filter((rec) => !used.has(rec.title.toLowerCase()))
+        .slice(0, limit);
+      recommendations.forEach((rec) => used.add(rec.title.toLowerCase()));
+      return { seed_title: seed.title, seed_item_id: seed.item_id || null, recommendations };
+    });
+  }
+}
+
 /**
  * Get "Something Else" recommendation
  * @param {string} currentTitle - The current title to replace
@@ -72,27 +124,48 @@ export async function getSomethingElse(
   excludeItemIds = [],
   excludeTitles = []
 ) {
+  const itemIds = [...new Set(excludeItemIds)];
+  const titles = [...new Set(excludeTitles.map((title) => title.toLowerCase()))];
   try {
-    const response = await fetch(`${API_BASE_URL}/api/something-else`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({
-        current_title: currentTitle,
-        current_item_id: currentItemId,
-        diversity_level: diversityLevel,
-        exclude_item_ids: excludeItemIds,
-        exclude_titles: excludeTitles,
-      }),
-    });
+    // A second pass only when the session lost exclusions sent earlier
+    for (let attempt = 0; ; attempt++) {
+      // At most 500 of each per request; anything beyond goes with the next call
+      const newItemIds = itemIds.filter((itemId) => !sentExcludedItemIds.has(itemId)).slice(0, 500);
+      const newTitles = titles.filter((title) => !sentExcludedTitles.has(title)).slice(0, 500);
+      const response = await fetch(`${API_BASE_URL}/api/something-else`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          current_title: currentTitle,
+          current_item_id: currentItemId,
+          diversity_level: diversityLevel,
+          exclude_item_ids: newItemIds,
+          exclude_titles: newTitles,
+          session_id: SESSION_ID,
+        }),
+      });
 
-    if (!response.ok) {
-      throw new Error(`HTTP error! status: ${response.status}`);
-    }
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      // New, expired, evicted or trimmed session: it holds only what this call sent
+      const reset = response.headers.get('X-Session-Reset') === '1';
+      if (reset) {
+        sentExcludedItemIds.clear();
+        sentExcludedTitles.clear();
+      }
+      newItemIds.forEach((itemId) => sentExcludedItemIds.add(itemId));
+      newTitles.forEach((title) => sentExcludedTitles.add(title));
 
-    const recommendation = await response.json();
-    return recommendation;
+      const recommendation = await response.json();
+      const unsent = itemIds.some((itemId) => !sentExcludedItemIds.has(itemId))
+        || titles.some((title) => !sentExcludedTitles.has(title));
+      if (!reset || !unsent || attempt > 0) {
+        return recommendation;
+      }
+    }
   } catch (error) {
     console.error('Error getting "Something Else" recommendation:', error);
     // Return fallback recommendation
@@ -148,6 +221,7 @@ function generateFallbackRecommendations(seedTitle, limit = 2) {
 const api = {
   checkMLStatus,
   getMoreLikeThis,
+  getMoreLikeThisRail,
   getSomethingElse,
 };
 